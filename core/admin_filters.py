@@ -0,0 +1,48 @@
+from urllib.parse import urlencode
+
+from django.contrib import admin
+from django.core.exceptions import ValidationError
+from django.urls import reverse
+
+
+class AutocompleteFieldListFilter(admin.RelatedFieldListFilter):
+    """Related field filter searching its choices with the admin
+    autocomplete view (search fields of the related model admin), instead
+    of loading every related row in each changelist page"""
+
+    template = "admin/autocomplete_filter.html"
+
+    def field_choices(self, field, request, model_admin):
+        # Only load the selected choice (to show it)
+        if not self.lookup_val:
+            return []
+        try:
+            selected = (
+                field.remote_field.model._default_manager.filter(
+                    **{field.target_field.name: self.lookup_val}
+                )
+                .first()
+            )
+        except (ValidationError, ValueError):
+            return []
+        if selected is None:
+            return []
+        return [(getattr(selected, field.target_field.attname), str(selected))]
+
+    def has_output(self):
+        return True
+
+    @property
+    def selected_choice(self) -> tuple | None:
+        """Selected (value, label), if any"""
+        return self.lookup_choices[0] if self.lookup_choices else None
+
+    @property
+    def autocomplete_url(self) -> str:
+        """Admin autocomplete url of the field"""
+        params = {
+            "app_label": self.field.model._meta.app_label,
+            "model_name": self.field.model._meta.model_name,
+            "field_name": self.field.name,
+        }
+        return f"{reverse('admin:autocomplete')}?{urlencode(params)}"
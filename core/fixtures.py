@@ -0,0 +1,115 @@
+import hashlib
+import os
+
+from django.apps import apps
+from django.conf import settings
+from django.core import serializers
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.models import FixtureChecksum
+
+
+def get_fixture_path(label: str) -> str:
+    """Get the path of a json fixture, searched like loaddata does (app
+    fixtures folders and FIXTURE_DIRS)
+
+    Args:
+        label (str): Fixture label, like "travels/Zone"
+
+    Raises:
+        FileNotFoundError: Fixture not found
+
+    Returns:
+        str: Fixture path
+    """
+
+    fixture_dirs = [
+        os.path.join(app_config.path, "fixtures")
+        for app_config in apps.get_app_configs()
+    ] + [str(fixture_dir) for fixture_dir in settings.FIXTURE_DIRS]
+    for fixture_dir in fixture_dirs:
+        path = os.path.join(fixture_dir, f"{label}.json")
+        if os.path.isfile(path):
+            return path
+    raise FileNotFoundError(f"Fixture {label} not found")
+
+
+def load_fixture(label: str, force: bool = False) -> int | None:
+    """Load a json fixture with bulk upserts, unless it did not change
+    since it was last loaded (same checksum)
+
+    Rows are matched by primary key: existing rows are updated (their
+    auto_now dates set to now, so delta syncs get them) and missing rows
+    inserted. Rows not in the fixture are kept.
+
+    Backends that can not choose the conflict target (MySQL) match the
+    rows by any unique field, like the primary key.
+
+    Args:
+        label (str): Fixture label, like "travels/Zone"
+        force (bool): Load the fixture even if it did not change
+
+    Returns:
+        int | None: Rows loaded, or None if the fixture was skipped
+    """
+
+    with open(get_fixture_path(label), "rb") as fixture_file:
+        content = fixture_file.read()
+    checksum = hashlib.sha256(content).hexdigest()
+
+    if (
+        not force
+        and FixtureChecksum.objects.filter(label=label, checksum=checksum).exists()
+    ):
+        return None
+
+    # Group fixture objects by model
+    objects = {}
+    for deserialized in serializers.deserialize("json", content):
+        objects.setdefault(type(deserialized.object), []).append(
+            deserialized.object
+        )
+
+    # Conflict target only where supported (not with MySQL)
+    with_target = connection.features.supports_update_conflicts_with_target
+
+    now = timezone.now()
+    with transaction.atomic():
+        for model, model_objects in objects.items():
+            fields = [
+                field
+                for field in model._meta.concrete_fields
+                if not field.primary_key
+            ]
+            auto_now_fields = [
+                field for field in fields if getattr(field, "auto_now", False)
+            ]
+            for obj in model_objects:
+                for field in auto_now_fields:
+                    setattr(obj, field.attname, now)
+
+            model.objects.bulk_create(
+                model_objects,
+                update_conflicts=True,
+                unique_fields=[model._meta.pk.name] if with_target else None,
+                update_fields=[
+                    field.name
+                    for field in fields
+                    if not getattr(field, "auto_now_add", False)
+                ],
+            )
+
+        # Continue the id sequences after the loaded ids (like loaddata)
+        sequence_sql = connection.ops.sequence_reset_sql(no_style(), list(objects))
+        if sequence_sql:
+            with connection.cursor() as cursor:
+                for sql in sequence_sql:
+                    cursor.execute(sql)
+
+        FixtureChecksum.objects.update_or_create(
+            label=label, defaults={"checksum": checksum}
+        )
+
+    return sum(len(model_objects) for model_objects in objects.values())
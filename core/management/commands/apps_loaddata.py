@@ -1,14 +1,20 @@
-import os
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 
-from django.core.management.base import BaseCommand
-from django.core.management import call_command
-
-BASE_FILE = os.path.basename(__file__)
+from core.fixtures import load_fixture
+from travels.catalog import invalidate_catalog
 
 
 class Command(BaseCommand):
-    help = 'Load data for all apps'
-    
+    help = 'Load data for all apps (only the fixtures that changed)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Load every fixture, even if it did not change",
+        )
+
     def handle(self, *args, **kwargs):
         commands_data = {
             "travels": [
@@ -18,12 +24,31 @@ class Command(BaseCommand):
                 "Vehicle",
             ],
         }
-        
-        for command_category, commands in commands_data.items():
-            for command in commands:
-                try:
+
+        verbosity = kwargs["verbosity"]
+
+        # Load all the fixtures in one transaction: nothing is saved if
+        # any of them fails
+        loaded = False
+        with transaction.atomic():
+            for command_category, commands in commands_data.items():
+                for command in commands:
                     full_command = f"{command_category}/{command}"
-                    call_command("loaddata", full_command)
-                except Exception as e:
-                    print(f"Error in {BASE_FILE}: {e}")
-                    continue
\ No newline at end of file
+                    try:
+                        rows = load_fixture(full_command, force=kwargs["force"])
+                    except Exception as e:
+                        raise CommandError(
+                            f"Error loading {full_command}: {e}"
+                        ) from e
+
+                    if rows is None:
+                        if verbosity >= 2:
+                            self.stdout.write(f"Skipped {full_command} (not changed)")
+                    else:
+                        if verbosity >= 1:
+                            self.stdout.write(f"Loaded {rows} rows from {full_command}")
+                        loaded = True
+
+            # Bulk upserts send no signals
+            if loaded:
+                invalidate_catalog()
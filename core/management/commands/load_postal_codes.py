@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from travels.postal_codes import sync_postal_code_ranges
+
+
+class Command(BaseCommand):
+    help = "Build the postal code ranges from the postal code locations and their prices"
+
+    def handle(self, *args, **kwargs):
+        report = sync_postal_code_ranges()
+        print(
+            f"Postal code ranges loaded: {report['ranges']} ranges, "
+            f"{report['created']} created, {report['deleted']} deleted"
+        )
@@ -1,109 +1,49 @@
 import os
-import csv
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
-from travels import models
+from travels.importers import get_file_format, import_pricing
 
 
 BASE_FILE = os.path.basename(__file__)
 
 
 class Command(BaseCommand):
-    help = "Load pricing data from local csv file"
-
-    def clean_price(self, price: str) -> float:
-        return float(price.replace("$", "").replace(",", "").strip())
+    help = "Load pricing data from a csv or xlsx file (local pricing.csv by default)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--file",
+            default=os.path.join(os.path.dirname(__file__), "pricing.csv"),
+            help="Csv or xlsx file with the pricing.csv layout",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only show the changes, without saving them",
+        )
 
     def handle(self, *args, **kwargs):
-        
-        # Delete old pricing
-        models.Pricing.objects.all().delete()
-
-        # Get DB models
-        suburban = models.Vehicle.objects.get(name="Luxury SUV")
-        van = models.Vehicle.objects.get(name="Executive Van")
-        sprinter = models.Vehicle.objects.get(name="Sprinter")
-        oneway = models.ServiceType.objects.get(name="One Way")
-        roundtrip = models.ServiceType.objects.get(name="Round Trip")
-
-        # Read excel
-        csv_path = os.path.join(os.path.dirname(__file__), "pricing.csv")
-        with open(csv_path, "r") as csv_file:
-            csv_reader = csv.reader(csv_file)
-
-            # Get data from row
-            for row in list(csv_reader)[2:]:
-                (
-                    zone_str,
-                    location_str,
-                    suburban_oneway_price,
-                    van_oneway_price,
-                    sprinter_oneway_price,
-                    _,
-                    suburban_roundtrip_price,
-                    van_roundtrip_price,
-                    sprinter_roundtrip_price,
-                ) = row
-                zone_str = zone_str.replace("-", "").strip()
-                location_str = location_str.strip()
-                suburban_oneway_price = self.clean_price(suburban_oneway_price)
-                van_oneway_price = self.clean_price(van_oneway_price)
-                sprinter_oneway_price = self.clean_price(sprinter_oneway_price)
-                suburban_roundtrip_price = self.clean_price(
-                    suburban_roundtrip_price
-                )
-                van_roundtrip_price = self.clean_price(van_roundtrip_price)
-                sprinter_roundtrip_price = self.clean_price(
-                    sprinter_roundtrip_price
-                )
-                
-                print(f"Saving pricing for {zone_str} - {location_str}")
-                
-                # Get row models
-                zone = models.Zone.objects.get(name=zone_str)
-                location = models.Location.objects.get(name=location_str, zone=zone)
-
-                # Create one way pricing
-                models.Pricing.objects.create(
-                    location=location,
-                    vehicle=suburban,
-                    service_type=oneway,
-                    price=suburban_oneway_price,
-                )
-                
-                models.Pricing.objects.create(
-                    location=location,
-                    vehicle=van,
-                    service_type=oneway,
-                    price=van_oneway_price,
-                )
-                
-                models.Pricing.objects.create(
-                    location=location,
-                    vehicle=sprinter,
-                    service_type=oneway,
-                    price=sprinter_oneway_price,
-                )
-                
-                # Create round trip pricing
-                models.Pricing.objects.create(
-                    location=location,
-                    vehicle=suburban,
-                    service_type=roundtrip,
-                    price=suburban_roundtrip_price,
-                )
-                
-                models.Pricing.objects.create(
-                    location=location,
-                    vehicle=van,
-                    service_type=roundtrip,
-                    price=van_roundtrip_price,
+        file_format = get_file_format(kwargs["file"])
+        if file_format is None:
+            raise CommandError("The file must be a csv or xlsx file")
+
+        # Save only the changes, in a single transaction
+        with open(kwargs["file"], "rb") as file:
+            report = import_pricing(file, file_format, dry_run=kwargs["dry_run"])
+
+        if report["errors"]:
+            raise CommandError("\n".join(report["errors"]))
+
+        if report["dry_run"]:
+            for change in report["changes"]:
+                print(
+                    f"{change['action']}: {change['location']} - "
+                    f"{change['vehicle']} - {change['service_type']}: "
+                    f"{change['old_price']} -> {change['price']}"
                 )
-                
-                models.Pricing.objects.create(
-                    location=location,
-                    vehicle=sprinter,
-                    service_type=roundtrip,
-                    price=sprinter_roundtrip_price,
-                )
\ No newline at end of file
+        print(
+            f"Pricing {'checked' if report['dry_run'] else 'loaded'}: "
+            f"{report['created']} created, {report['updated']} updated, "
+            f"{report['deleted']} deleted"
+        )
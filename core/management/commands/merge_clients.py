@@ -0,0 +1,26 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from travels import models
+from travels.clients import merge_duplicate_clients
+
+BASE_FILE = os.path.basename(__file__)
+
+
+class Command(BaseCommand):
+    help = "Merge clients with the same email, moving their sales to one client"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Duplicated emails merged per transaction",
+        )
+
+    def handle(self, *args, **kwargs):
+        deleted = merge_duplicate_clients(
+            models.Client, models.Sale, batch_size=kwargs["batch_size"]
+        )
+        print(f"Merged {deleted} duplicated clients")
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FixtureChecksum',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('label', models.CharField(max_length=200, unique=True, verbose_name='Fixture')),
+                ('checksum', models.CharField(max_length=64, verbose_name='Checksum')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Fecha de actualización')),
+            ],
+            options={
+                'verbose_name': 'Checksum de fixture',
+                'verbose_name_plural': 'Checksums de fixtures',
+            },
+        ),
+    ]
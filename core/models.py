@@ -1,3 +1,22 @@
 from django.db import models
 
-# Create your models here.
+
+class FixtureChecksum(models.Model):
+    """Checksum of the last loaded version of a fixture"""
+
+    id = models.AutoField(primary_key=True)
+    label = models.CharField(max_length=200, unique=True, verbose_name="Fixture")
+    checksum = models.CharField(max_length=64, verbose_name="Checksum")
+    created_at = models.DateTimeField(
+        auto_now_add=True, verbose_name="Fecha de creación"
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True, verbose_name="Fecha de actualización"
+    )
+
+    def __str__(self):
+        return self.label
+
+    class Meta:
+        verbose_name = "Checksum de fixture"
+        verbose_name_plural = "Checksums de fixtures"
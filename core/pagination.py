@@ -1,3 +1,9 @@
+import json
+
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
 from rest_framework.pagination import PageNumberPagination
 
 
@@ -5,3 +11,49 @@ class CustomPageNumberPagination(PageNumberPagination):
     page_size = 12
     page_size_query_param = 'page-size'
     max_page_size = 1000
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator for large admin changelists: on Postgres the count is the
+    query planner row estimate (no table scan), and the exact COUNT(*) is
+    only run when the estimate is below exact_count_threshold
+    """
+
+    exact_count_threshold = 10000
+
+    def get_estimated_count(self) -> int | None:
+        """Get the planner row estimate of the query
+
+        Returns:
+            int | None: Estimated rows, or None if not available (not
+                Postgres or the plan could not be read)
+        """
+
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet):
+            return None
+        connection = connections[queryset.db]
+        if connection.vendor != "postgresql":
+            return None
+
+        try:
+            sql, params = queryset.order_by().query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+                plan = cursor.fetchone()[0]
+        except DatabaseError:
+            return None
+
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    @cached_property
+    def count(self) -> int:
+        estimated_count = self.get_estimated_count()
+        if (
+            estimated_count is not None
+            and estimated_count >= self.exact_count_threshold
+        ):
+            return estimated_count
+        return super().count
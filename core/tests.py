@@ -1,3 +1,445 @@
-from django.test import TestCase
+import io
+import os
+from unittest.mock import patch
 
-# Create your tests here.
+import requests
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import F, Q
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+from core.fixtures import load_fixture
+from core.models import FixtureChecksum
+from core.pagination import EstimatedCountPaginator
+from core.tests_base.test_models import TestTravelsModelBase
+from core.tests_base.test_views import TestApiViewsMethods
+from travels import models
+from travels.catalog import get_catalog
+from travels.importers import import_pricing
+from travels.postal_codes import (
+    POSTAL_CODE_ZONE,
+    get_location_postal_code,
+    sync_postal_code_ranges,
+)
+from travels.pricing import get_location_prices, sync_prices
+from utils.http_client import CircuitBreaker, CircuitBreakerOpen, HttpClient
+
+PRICING_CSV_PATH = os.path.join(
+    os.path.dirname(__file__), "management", "commands", "pricing.csv"
+)
+
+
+class CircuitBreakerTestCase(SimpleTestCase):
+    """Test http client circuit breaker"""
+
+    def test_open_after_failures(self):
+        """Validate circuit opens after the failure threshold"""
+
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow_request())
+
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "open")
+        self.assertFalse(breaker.allow_request())
+
+    def test_half_open_trial(self):
+        """Validate a single trial request after the reset timeout"""
+
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "half_open")
+
+        # Only one trial request
+        breaker.reset_timeout = 60
+        breaker.opened_at -= 60
+        self.assertTrue(breaker.allow_request())
+        self.assertFalse(breaker.allow_request())
+
+        # Trial success closes the circuit
+        breaker.record_success()
+        self.assertEqual(breaker.state, "closed")
+        self.assertTrue(breaker.allow_request())
+
+
+class HttpClientTestCase(SimpleTestCase):
+    """Test http client retries and circuit breaker"""
+
+    def setUp(self):
+        self.http_client = HttpClient(max_retries=2, backoff_factor=0, failure_threshold=1)
+        self.url = "https://payments.example.com/"
+
+    def get_connect_error(self) -> requests.ConnectionError:
+        """Error raised when the host refuses the connection"""
+        return requests.ConnectionError(
+            MaxRetryError(None, self.url, NewConnectionError(None, "refused"))
+        )
+
+    def test_post_retried_on_connect_error(self):
+        """Validate post is retried when the connection could not be opened"""
+
+        response = requests.Response()
+        response.status_code = 200
+        with patch.object(
+            self.http_client.session,
+            "request",
+            side_effect=[self.get_connect_error(), response],
+        ) as request:
+            self.assertEqual(self.http_client.post(self.url, json={}), response)
+        self.assertEqual(request.call_count, 2)
+        self.assertEqual(self.http_client.get_stats()["retries"], 1)
+
+    def test_post_not_retried_on_read_timeout(self):
+        """Validate post is not sent again after the host received it"""
+
+        with patch.object(
+            self.http_client.session, "request", side_effect=requests.ReadTimeout()
+        ) as request:
+            with self.assertRaises(requests.ReadTimeout):
+                self.http_client.post(self.url, json={})
+        self.assertEqual(request.call_count, 1)
+
+    def test_server_error_opens_circuit(self):
+        """Validate a not retried server error counts as a failure"""
+
+        response = requests.Response()
+        response.status_code = 500
+        with patch.object(
+            self.http_client.session, "request", return_value=response
+        ) as request:
+            self.assertEqual(self.http_client.get(self.url), response)
+        self.assertEqual(request.call_count, 1)
+
+        stats = self.http_client.get_stats()
+        self.assertEqual(stats["failures"], 1)
+        self.assertEqual(stats["circuit"]["state"], "open")
+
+    def test_fail_fast_when_open(self):
+        """Validate requests are rejected without being sent when circuit is open"""
+
+        with patch.object(
+            self.http_client.session, "request", side_effect=self.get_connect_error()
+        ) as request:
+            with self.assertRaises(requests.ConnectionError):
+                self.http_client.get(self.url)
+            self.assertEqual(request.call_count, 3)
+
+            with self.assertRaises(CircuitBreakerOpen):
+                self.http_client.get(self.url)
+            self.assertEqual(request.call_count, 3)
+
+        stats = self.http_client.get_stats()
+        self.assertEqual(stats["circuit"]["state"], "open")
+        self.assertEqual(stats["rejected"], 1)
+
+
+class HttpClientsStatsViewTestCase(TestApiViewsMethods):
+    """Test http clients stats view"""
+
+    def setUp(self):
+        super().setUp(endpoint="/api/monitoring/http-clients/")
+
+    def test_get_stats(self):
+        """Validate stripe client stats returned"""
+
+        response = self.client.get(self.endpoint)
+        self.assertEqual(response.status_code, 200)
+        stats = response.json()["data"]["stripe"]
+        self.assertEqual(stats["circuit"]["state"], "closed")
+        self.assertIn("pools", stats)
+
+
+class EstimatedCountPaginatorTestCase(TestCase):
+    """Test admin paginator with estimated counts"""
+
+    def setUp(self):
+        for index in range(3):
+            User.objects.create(username=f"user {index}")
+        self.queryset = User.objects.order_by("id")
+
+    def test_exact_count_without_estimate(self):
+        """Test exact count when there is no planner estimate (not postgres)"""
+
+        paginator = EstimatedCountPaginator(self.queryset, 2)
+        self.assertIsNone(paginator.get_estimated_count())
+        self.assertEqual(paginator.count, 3)
+        self.assertEqual(paginator.num_pages, 2)
+
+    def test_estimated_count_large_table(self):
+        """Test estimated count used above the threshold"""
+
+        paginator = EstimatedCountPaginator(self.queryset, 2)
+        with patch.object(paginator, "get_estimated_count", return_value=50000):
+            self.assertEqual(paginator.count, 50000)
+        self.assertEqual(len(paginator.page(1).object_list), 2)
+
+    def test_exact_count_small_table(self):
+        """Test exact count used below the threshold"""
+
+        paginator = EstimatedCountPaginator(self.queryset, 2)
+        with patch.object(paginator, "get_estimated_count", return_value=10):
+            self.assertEqual(paginator.count, 3)
+
+
+class LoadPricingCommandTestCase(TestTravelsModelBase):
+    """Test the pricing csv loader"""
+
+    def setUp(self):
+        call_command("apps_loaddata", verbosity=0)
+        call_command("load_pricing")
+
+    def get_price_key(self) -> tuple:
+        """Location, vehicle and service type ids of a csv price (170)"""
+
+        return (
+            models.Location.objects.get(name="Alegranza").id,
+            models.Vehicle.objects.get(name="Luxury SUV").id,
+            models.ServiceType.objects.get(name="Round Trip").id,
+        )
+
+    def test_load_pricing(self):
+        """Test every csv row is loaded with a price per vehicle and service,
+        stored as zone prices and the location prices that differ"""
+
+        prices = get_location_prices()
+        self.assertEqual(prices[self.get_price_key()], 170)
+        self.assertEqual(len(prices), len({key[0] for key in prices}) * 6)
+
+        # Most prices come from the zone
+        self.assertGreater(models.ZonePricing.objects.count(), 0)
+        self.assertLess(
+            models.Pricing.objects.count() + models.ZonePricing.objects.count(),
+            len(prices) / 2,
+        )
+
+    def test_reload_only_changes(self):
+        """Test a reload only writes the rows that differ from the csv"""
+
+        location_id, vehicle_id, service_type_id = self.get_price_key()
+        zone_pricing = models.ZonePricing.objects.get(
+            zone__location=location_id,
+            vehicle=vehicle_id,
+            service_type=service_type_id,
+        )
+        models.ZonePricing.objects.filter(id=zone_pricing.id).update(price=1)
+        extra_pricing = self.create_pricing(
+            vehicle=zone_pricing.vehicle, service_type=zone_pricing.service_type
+        )
+        other_pricing = self.create_pricing()
+
+        with CaptureQueriesContext(connection) as queries:
+            call_command("load_pricing")
+
+        zone_pricing.refresh_from_db()
+        self.assertEqual(zone_pricing.price, 170)
+        self.assertEqual(get_location_prices()[self.get_price_key()], 170)
+        self.assertFalse(models.Pricing.objects.filter(id=extra_pricing.id).exists())
+
+        # Vehicles and service types missing from the file are kept
+        self.assertTrue(models.Pricing.objects.filter(id=other_pricing.id).exists())
+        self.assertLess(len(queries), 20)
+
+    def test_batched_deletes(self):
+        """Test deleted prices are removed with bulk statements, with a
+        tombstone each"""
+
+        _, vehicle_id, service_type_id = self.get_price_key()
+        scope = Q(vehicle_id=vehicle_id, service_type_id=service_type_id)
+        deleted_ids = {
+            "zonepricing": set(
+                models.ZonePricing.objects.filter(scope).values_list("id", flat=True)
+            ),
+            "pricing": set(
+                models.Pricing.objects.filter(scope).values_list("id", flat=True)
+            ),
+        }
+        self.assertGreater(len(deleted_ids["pricing"]), 1)
+
+        with CaptureQueriesContext(connection) as queries:
+            sync_prices({}, scope)
+
+        self.assertFalse(models.ZonePricing.objects.filter(scope).exists())
+        self.assertFalse(models.Pricing.objects.filter(scope).exists())
+        for model_name, ids in deleted_ids.items():
+            self.assertEqual(
+                set(
+                    models.DeletedRecord.objects.filter(model=model_name).values_list(
+                        "object_id", flat=True
+                    )
+                ),
+                ids,
+            )
+
+        # An insert (tombstones) and a delete per table
+        statements = [
+            query["sql"].split(" ")[0]
+            for query in queries
+            if query["sql"].startswith(("INSERT", "DELETE"))
+        ]
+        self.assertEqual(sorted(statements), ["DELETE"] * 2 + ["INSERT"] * 2)
+
+    def test_dry_run(self):
+        """Test a dry run reports the changes without saving them"""
+
+        location_id, vehicle_id, service_type_id = self.get_price_key()
+        pricing = models.Pricing.objects.create(
+            location_id=location_id,
+            vehicle_id=vehicle_id,
+            service_type_id=service_type_id,
+            price=1,
+        )
+
+        with open(PRICING_CSV_PATH, "rb") as file:
+            report = import_pricing(file, "csv", dry_run=True)
+        self.assertEqual(report["errors"], [])
+        self.assertEqual(
+            (report["created"], report["updated"], report["deleted"]), (0, 1, 0)
+        )
+        self.assertEqual(report["changes"][0]["old_price"], 1)
+        self.assertEqual(report["changes"][0]["price"], 170)
+        self.assertTrue(models.Pricing.objects.filter(id=pricing.id).exists())
+
+
+class LoadPostalCodesCommandTestCase(TestTravelsModelBase):
+    """Test the postal code ranges loader"""
+
+    def setUp(self):
+        call_command("apps_loaddata", verbosity=0)
+        call_command("load_pricing")
+        call_command("load_postal_codes")
+
+    def test_load_postal_codes(self):
+        """Test consecutive postal codes with the same prices share a range,
+        with the prices of each postal code location"""
+
+        locations = models.Location.objects.filter(zone__name=POSTAL_CODE_ZONE)
+        ranges = models.PostalCodeRange.objects.all()
+        self.assertLess(ranges.count(), locations.count() / 10)
+        self.assertTrue(ranges.exclude(start=F("end")).exists())
+
+        catalog = get_catalog()
+        for location in locations:
+            code = get_location_postal_code(location.name)
+            _, _, location_ids = catalog.find_postal_code(code)
+            range_prices = [
+                catalog.location_prices[location_id] for location_id in location_ids
+            ]
+            self.assertIn(catalog.location_prices[location.id], range_prices)
+
+    def get_location_ids(self, code: str) -> list[int]:
+        """Ids of the locations of a postal code"""
+        return list(
+            models.Location.objects.filter(name__startswith=f"{code},")
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+
+    def test_sync_only_changes(self):
+        """Test a price change only splits the range of its postal code"""
+
+        location_ids = self.get_location_ids("23407")
+        kept_ids = set(
+            models.PostalCodeRange.objects.exclude(
+                start__lte="23407", end__gte="23407"
+            ).values_list("id", flat=True)
+        )
+
+        # Ranges synced after the change: a row per price for 23407
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_pricing(
+                location=models.Location.objects.get(id=location_ids[-1]),
+                vehicle=models.Vehicle.objects.first(),
+                service_type=models.ServiceType.objects.first(),
+                price=1,
+            )
+        self.assertEqual(
+            list(
+                models.PostalCodeRange.objects.filter(
+                    start__gte="23406", end__lte="23444"
+                )
+                .order_by("start", "location_id")
+                .values_list("start", "end", "location_id")
+            ),
+            [
+                ("23406", "23406", self.get_location_ids("23406")[0]),
+                ("23407", "23407", location_ids[0]),
+                ("23407", "23407", location_ids[-1]),
+                ("23440", "23444", self.get_location_ids("23440")[0]),
+            ],
+        )
+        self.assertLessEqual(
+            kept_ids, set(models.PostalCodeRange.objects.values_list("id", flat=True))
+        )
+
+        # Nothing written when nothing changed
+        report = sync_postal_code_ranges()
+        self.assertEqual((report["created"], report["deleted"]), (0, 0))
+
+
+class AppsLoaddataCommandTestCase(TestCase):
+    """Test the fixtures loader"""
+
+    def test_load_fixtures(self):
+        """Test fixtures are loaded once and skipped while not changed"""
+
+        output = io.StringIO()
+        call_command("apps_loaddata", stdout=output)
+        self.assertIn("rows from travels/Zone", output.getvalue())
+        zones_count = models.Zone.objects.count()
+        self.assertGreater(zones_count, 0)
+        self.assertGreater(models.Location.objects.count(), 0)
+        self.assertEqual(FixtureChecksum.objects.count(), 4)
+
+        # Not changed fixtures are not loaded again
+        with CaptureQueriesContext(connection) as queries:
+            call_command("apps_loaddata", verbosity=0)
+        self.assertFalse(
+            [
+                query
+                for query in queries
+                if query["sql"].startswith(("INSERT", "UPDATE"))
+            ]
+        )
+
+    def test_force_upsert(self):
+        """Test a forced load updates the existing rows without duplicates"""
+
+        output = io.StringIO()
+        call_command("apps_loaddata", stdout=output)
+        self.assertIn("rows from travels/Zone", output.getvalue())
+        zones_count = models.Zone.objects.count()
+        zone = models.Zone.objects.order_by("id").first()
+        models.Zone.objects.filter(id=zone.id).update(name="Changed zone")
+
+        call_command("apps_loaddata", force=True, verbosity=0)
+        self.assertEqual(models.Zone.objects.count(), zones_count)
+        updated_zone = models.Zone.objects.get(id=zone.id)
+        self.assertEqual(updated_zone.name, zone.name)
+        self.assertEqual(updated_zone.created_at, zone.created_at)
+        self.assertGreater(updated_zone.updated_at, zone.updated_at)
+
+        # New rows continue after the loaded ids
+        self.assertGreater(models.Zone.objects.create(name="New zone").id, zone.id)
+
+    def test_fixture_error(self):
+        """Test a fixture error stops the command without saving anything"""
+
+        def load_fixture_error(label, force=False):
+            if label == "travels/Zone":
+                raise FileNotFoundError(f"Fixture {label} not found")
+            return load_fixture(label, force)
+
+        with patch(
+            "core.management.commands.apps_loaddata.load_fixture",
+            side_effect=load_fixture_error,
+        ):
+            with self.assertRaisesMessage(CommandError, "travels/Zone"):
+                call_command("apps_loaddata", verbosity=0)
+
+        # Fixtures loaded before the error are rolled back
+        self.assertFalse(models.ServiceType.objects.exists())
+        self.assertFalse(FixtureChecksum.objects.exists())
@@ -1,7 +1,9 @@
 from time import sleep
 
 from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from core.tests_base.test_views import TestSeleniumBase
 
@@ -63,6 +65,38 @@ class TestAdminBase(TestCase):
         # Check if the search text is in the response content
         self.assertContains(response, search_text)
 
+    def validate_constant_queries(
+        self, endpoint: str, create_row, page_sizes: tuple = (1, 10)
+    ):
+        """ Validate the changelist query count does not grow with the
+        number of rows shown in the page
+
+        Args:
+            endpoint (str): Changelist endpoint
+            create_row (callable): Function that creates a row of the list
+            page_sizes (tuple): Rows shown in each page load
+        """
+
+        queries_counts = {}
+        rows = 0
+        for page_size in page_sizes:
+            # Create rows up to the page size
+            while rows < page_size:
+                create_row()
+                rows += 1
+
+            # Get page and count queries
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(endpoint)
+            self.assertEqual(response.status_code, 200)
+            queries_counts[page_size] = len(queries)
+
+        self.assertEqual(
+            len(set(queries_counts.values())),
+            1,
+            msg=f"Queries by page size in {endpoint}: {queries_counts}",
+        )
+
 
 class TestAdminSeleniumBase(TestAdminBase, TestSeleniumBase):
     """ Base class to test admin with selenium (login and setup) """
@@ -124,7 +124,7 @@ class TestTravelsModelBase(TestCase):
         self,
         name: str = "test client {x}",
         last_name: str = "test last name {x}",
-        email: str = "test@test.com",
+        email: str = "test{x}@test.com",
         phone: str = "1234567890",
     ):
         """Create a client
@@ -1,10 +1,12 @@
 from time import sleep
 
 from django.test import LiveServerTestCase
+from django.test.utils import CaptureQueriesContext
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.db import connection
 
-from rest_framework.test import APITestCase
+from rest_framework.test import APITestCase, APITransactionTestCase
 from rest_framework import status
 
 from selenium import webdriver
@@ -100,6 +102,48 @@ class TestApiViewsMethods(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
+class TestCachedApiViewsBase(APITransactionTestCase):
+    """Base class for testing api views that keep data between requests,
+    in memory or in cache (transaction test case, so the data is kept)"""
+
+    def setUp(self, endpoint: str = "/api/"):
+        """Login and save the endpoint
+
+        Args:
+            endpoint (str): Endpoint to test
+        """
+
+        # Create user and login
+        username = "test_user"
+        password = "test_pass"
+        User.objects.create_superuser(
+            username=username,
+            email="test@gmail.com",
+            password=password,
+        )
+        self.client.login(username=username, password=password)
+
+        self.endpoint = endpoint
+
+    def get_travels_queries(self, params: dict = None) -> tuple[dict, list]:
+        """Get the endpoint data and the queries to travels tables used to
+        get it
+
+        Args:
+            params (dict): Query params
+
+        Returns:
+            tuple:
+                dict: Response json
+                list: Queries to travels tables
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.endpoint, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        travels_queries = [query for query in queries if "travels_" in query["sql"]]
+        return response.json(), travels_queries
+
+
 class TestSeleniumBase(LiveServerTestCase):
     """Base class to test admin with selenium (login and setup)"""
 
@@ -1,3 +1,28 @@
-from django.shortcuts import render
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-# Create your views here.
+from utils.http_client import get_clients_stats
+from utils.stripe import get_stripe_client
+
+
+class HttpClientsStatsView(APIView):
+    """
+    API endpoint to monitor the shared http clients (connection pools,
+    retries and circuit breakers) of the current worker
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        # Register the stripe client, even before the first payment link
+        get_stripe_client()
+
+        return Response(
+            {
+                "status": "success",
+                "message": "Http clients stats retrieved successfully",
+                "data": get_clients_stats(),
+            },
+            status=status.HTTP_200_OK,
+        )
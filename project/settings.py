@@ -29,6 +29,13 @@ STRIPE_API_USER = os.getenv("STRIPE_API_USER")
 STRIPE_API_IMAGE = os.getenv("STRIPE_API_IMAGE")
 STRIPE_COLLECT_PHONE = os.getenv("STRIPE_COLLECT_PHONE") == "True"
 STRIPE_COLLECT_BILLING_ADDRESS = os.getenv("STRIPE_COLLECT_BILLING_ADDRESS") == "True"
+STRIPE_API_CONNECT_TIMEOUT = float(os.getenv("STRIPE_API_CONNECT_TIMEOUT", 3))
+STRIPE_API_READ_TIMEOUT = float(os.getenv("STRIPE_API_READ_TIMEOUT", 15))
+STRIPE_API_MAX_RETRIES = int(os.getenv("STRIPE_API_MAX_RETRIES", 2))
+STRIPE_API_BREAKER_THRESHOLD = int(os.getenv("STRIPE_API_BREAKER_THRESHOLD", 5))
+STRIPE_API_BREAKER_RESET_TIMEOUT = float(
+    os.getenv("STRIPE_API_BREAKER_RESET_TIMEOUT", 30)
+)
 
 print(f"DEBUG: {DEBUG}")
 print(f"STORAGE_AWS: {STORAGE_AWS}")
@@ -128,6 +135,34 @@ else:
     }
 
 
+# Background tasks (run right away when testing)
+TASKS_ALWAYS_EAGER = os.getenv("TASKS_ALWAYS_EAGER", str(IS_TESTING)) == "True"
+TASKS_MAX_WORKERS = int(os.getenv("TASKS_MAX_WORKERS", 4))
+
+# Seconds before a pending payment link is generated again (its task can be
+# lost when the process restarts)
+PAYMENT_LINK_PENDING_TIMEOUT = int(os.getenv("PAYMENT_LINK_PENDING_TIMEOUT", 120))
+
+# Seconds without progress before a pending or running export or pricing
+# import is marked as failed (its task is lost when the process dies)
+BACKGROUND_JOB_TIMEOUT = int(os.getenv("BACKGROUND_JOB_TIMEOUT", 900))
+
+
+# Cache
+# The catalog version is saved in the database and cached for
+# CATALOG_VERSION_TTL seconds: the longest a process can serve a catalog
+# changed by another process (a shared backend makes it immediate)
+CATALOG_VERSION_TTL = int(os.getenv("CATALOG_VERSION_TTL", 5))
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
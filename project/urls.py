@@ -1,11 +1,12 @@
 from django.views.generic import RedirectView
 from django.conf import settings
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf.urls.static import static
 
 from rest_framework import routers
 
+from core import views as core_views
 from travels import views as travels_views
 
 
@@ -16,6 +17,7 @@ router.register(r"postal-codes", travels_views.PostalCodeViewSet, basename="post
 router.register(r"vehicles", travels_views.VehicleViewSet, basename="vehicles")
 router.register(r"service-types", travels_views.ServiceTypeViewSet, basename="service-types")
 router.register(r"pricing", travels_views.PricingViewSet, basename="pricing")
+router.register(r"zone-pricing", travels_views.ZonePricingViewSet, basename="zone-pricing")
 
 
 urlpatterns = [
@@ -28,13 +30,34 @@ urlpatterns = [
         name="login-redirect-admin",
     ),
     # API URLs
+    path("api/catalog/", travels_views.CatalogView.as_view(), name="catalog"),
+    path(
+        "api/catalog/changes/",
+        travels_views.CatalogChangesView.as_view(),
+        name="catalog-changes",
+    ),
+    re_path(
+        r"^api/exports/(?P<kind>sales|transfers)/$",
+        travels_views.FlatExportView.as_view(),
+        name="flat-export",
+    ),
     path("api/", include(router.urls)),
     # path(
     #     "api/validate-vip-code/",
     #     travels_views.VipCodeValidationView.as_view(),
     #     name="validate-vip-code",
     # ),
+    path(
+        "api/monitoring/http-clients/",
+        core_views.HttpClientsStatsView.as_view(),
+        name="monitoring-http-clients",
+    ),
     path("api/sales/", travels_views.SaleViewSet.as_view(), name="sales"),
+    path(
+        "api/sales/payment-link/",
+        travels_views.SalePaymentLinkView.as_view(),
+        name="sale-payment-link",
+    ),
     path(
         "api/sales/done/",
         travels_views.SaleDoneView.as_view(),
@@ -1,17 +1,46 @@
-import io
+import json
 import os
 
-import openpyxl
-from openpyxl.styles import numbers
-from openpyxl.utils import get_column_letter
-
-from django.conf import settings
 from django.contrib import admin, messages
-from django.http import FileResponse
+from django.core.exceptions import PermissionDenied
+from django.db.models import Q
+from django.http import FileResponse, Http404
+from django.template.response import TemplateResponse
+from django.shortcuts import get_object_or_404, redirect
+from django.urls import path, reverse
 from django.utils import timezone
-from django.utils.html import format_html
+from django.utils.html import format_html, format_html_join
+from django.views.decorators.http import require_POST
+
+from core.admin_filters import AutocompleteFieldListFilter
+from core.admin_search import IndexedSearchMixin
+from core.pagination import EstimatedCountPaginator
+from travels import exports, models, pricing
+from travels.tasks import fail_stale_jobs, run_export_job, run_pricing_import
+from utils.tasks import enqueue
+
+
+class FlatExportMixin:
+    """Csv and ndjson export actions (all the filtered rows when "select
+    all" is used in the changelist)"""
+
+    flat_export_kind = None
 
-from travels import models
+    def export_to_csv(self, request, queryset):
+        """Export the selected rows to csv"""
+        return exports.get_flat_export_response(
+            self.flat_export_kind, queryset, "csv"
+        )
+
+    def export_to_ndjson(self, request, queryset):
+        """Export the selected rows to ndjson"""
+        return exports.get_flat_export_response(
+            self.flat_export_kind, queryset, "ndjson"
+        )
+
+    # Labels for custom fields
+    export_to_csv.short_description = "Exportar a CSV"
+    export_to_ndjson.short_description = "Exportar a NDJSON"
 
 
 @admin.register(models.Zone)
@@ -26,6 +55,8 @@ class ZoneAdmin(admin.ModelAdmin):
 @admin.register(models.Location)
 class LocationAdmin(admin.ModelAdmin):
     list_display = ("name", "zone", "updated_at")
+    list_select_related = ("zone",)
+    autocomplete_fields = ("zone",)
     list_filter = ("zone", "created_at", "updated_at")
     search_fields = ("name",)
     readonly_fields = ("created_at", "updated_at")
@@ -39,6 +70,8 @@ class ClientAdmin(admin.ModelAdmin):
     search_fields = ("name", "last_name", "email", "phone")
     readonly_fields = ("created_at", "updated_at")
     ordering = ("name",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(models.VipCode)
@@ -54,13 +87,20 @@ class VipCodeAdmin(admin.ModelAdmin):
 class VehicleAdmin(admin.ModelAdmin):
     list_display = ("name", "passengers", "updated_at")
     list_filter = ("created_at", "updated_at")
+    search_fields = ("name",)
     readonly_fields = ("created_at", "updated_at")
     ordering = ("name",)
 
 
 @admin.register(models.Sale)
-class SaleAdmin(admin.ModelAdmin):
-    actions = ("export_to_excel",)
+class SaleAdmin(IndexedSearchMixin, FlatExportMixin, admin.ModelAdmin):
+    flat_export_kind = "sales"
+    actions = (
+        "export_to_excel",
+        "export_to_excel_background",
+        "export_to_csv",
+        "export_to_ndjson",
+    )
     list_display = (
         "stripe_code",
         "client",
@@ -75,12 +115,13 @@ class SaleAdmin(admin.ModelAdmin):
         "created_at",
         "updated_at",
     )
+    list_select_related = ("client", "vehicle", "service_type", "location")
     list_filter = (
-        "client",
+        ("client", AutocompleteFieldListFilter),
         # "vip_code",
         "vehicle",
         "service_type",
-        "location",
+        ("location", AutocompleteFieldListFilter),
         "passengers",
         "paid",
         "created_at",
@@ -88,13 +129,18 @@ class SaleAdmin(admin.ModelAdmin):
     search_fields = (
         "client__name",
         "client__email",
+        "client__last_name",
         "vehicle__name",
         # "vip_code__value",
-        "total",
     )
+    search_uuid_fields = ("stripe_code",)
+    search_number_fields = ("total",)
+    autocomplete_fields = ("client", "vehicle", "service_type", "location")
     readonly_fields = ("stripe_code", "created_at", "updated_at")
     ordering = ("-created_at",)
-    
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
     # CUSTOM FIELDS
     def custom_links(self, obj):
         """Create custom Imprimir and Ver buttons"""
@@ -106,10 +152,7 @@ class SaleAdmin(admin.ModelAdmin):
     def export_to_excel(self, request, queryset):
         """Export the selected sales to Excel"""
 
-        date_columns = {8, 12}
-        time_columns = {11, 15}
-
-        if not queryset:
+        if not queryset.exists():
             self.message_user(
                 request,
                 "Seleccione al menos una venta para exportar.",
@@ -117,8 +160,7 @@ class SaleAdmin(admin.ModelAdmin):
             )
             return
 
-        template_path = os.path.join(settings.BASE_DIR, "utils", "export-template.xlsx")
-        if not os.path.exists(template_path):
+        if not os.path.exists(exports.EXPORT_TEMPLATE_PATH):
             self.message_user(
                 request,
                 "No se encontró la plantilla de exportación.",
@@ -126,57 +168,18 @@ class SaleAdmin(admin.ModelAdmin):
             )
             return
 
-        workbook = openpyxl.load_workbook(template_path)
-        sheet = workbook.active
-        queryset = queryset.select_related("client", "vehicle").prefetch_related(
-            "transfer_set"
-        )
-
-        current_row = 6
-        for sale in queryset:
-            arrival = sale.transfer_set.filter(type="arrival").first()
-            departure = sale.transfer_set.filter(type="departure").first()
-
-            row = [
-                sale.client.last_name,
-                sale.client.name,
-                sale.client.email,
-                sale.client.phone,
-                sale.location.name,  # Hotel
-                sale.vehicle.name,
-                sale.passengers,
-                arrival.date if arrival else None,
-                arrival.airline if arrival else "",
-                arrival.flight_number if arrival else "",
-                arrival.hour if arrival else None,
-                departure.date if departure else None,
-                departure.airline if departure else "",
-                departure.flight_number if departure else "",
-                departure.hour if departure else None,
-            ]
-
-            for col_index, value in enumerate(row, start=1):
-                cell = sheet.cell(row=current_row, column=col_index, value=value)
-                if value is not None:
-                    if col_index in date_columns:
-                        cell.number_format = numbers.FORMAT_DATE_YYYYMMDD2
-                    elif col_index in time_columns:
-                        cell.number_format = numbers.FORMAT_DATE_TIME4
-            current_row += 1
-
-        for col in range(1, sheet.max_column + 1):
-            max_length = 0
-            for row in range(1, sheet.max_row + 1):
-                cell_value = sheet.cell(row=row, column=col).value
-                if cell_value is None:
-                    continue
-                max_length = max(max_length, len(str(cell_value)))
-            if max_length:
-                sheet.column_dimensions[get_column_letter(col)].width = max_length * 2
-
-        output = io.BytesIO()
-        workbook.save(output)
-        output.seek(0)
+        output = exports.write_sales_workbook(exports.iter_sales_rows(queryset))
+        return self.get_excel_response(output)
+
+    def get_queryset(self, request):
+        # Sale.__str__ uses the client and vehicle (autocomplete results),
+        # the changelist skips list_select_related if select_related is set
+        return super().get_queryset(request).select_related(
+            *self.list_select_related
+        )
+
+    def get_excel_response(self, output) -> FileResponse:
+        """Download response of an exported workbook file"""
 
         filename = (
             "marco-cabo-transportaciones-"
@@ -186,33 +189,125 @@ class SaleAdmin(admin.ModelAdmin):
             output,
             as_attachment=True,
             filename=filename,
-            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            content_type=exports.EXPORT_CONTENT_TYPE,
         )
 
         return response
-    
+
+    def get_urls(self):
+        urls = [
+            path(
+                "export-new/",
+                self.admin_site.admin_view(require_POST(self.export_new_view)),
+                name="travels_sale_export_new",
+            ),
+        ]
+        return urls + super().get_urls()
+
+    def export_new_view(self, request):
+        """Export to Excel (POST) the sales created or updated since the
+        last export of the user to the destination ("destination" field,
+        "excel" by default), using the (updated_at, id) of the last exported sale as
+        a keyset cursor, so no sale is exported twice"""
+
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+
+        # Get sales changed since the last export
+        destination = request.POST.get("destination", "excel")
+        watermark = models.ExportWatermark.objects.filter(
+            user=request.user, destination=destination
+        ).first()
+        until = timezone.now()
+        queryset = models.Sale.objects.filter(updated_at__lte=until)
+        if watermark:
+            queryset = queryset.filter(
+                Q(updated_at__gt=watermark.exported_until)
+                | Q(updated_at=watermark.exported_until, id__gt=watermark.exported_id)
+            )
+
+        last_sale = (
+            queryset.order_by("-updated_at", "-id").values("updated_at", "id").first()
+        )
+        if last_sale is None:
+            self.message_user(
+                request,
+                "No hay ventas nuevas desde la última exportación.",
+                level=messages.INFO,
+            )
+            return redirect("admin:travels_sale_changelist")
+
+        output = exports.write_sales_workbook(
+            exports.iter_sales_rows(queryset.order_by("updated_at", "id"))
+        )
+
+        # Next export starts after the last exported sale (only once the
+        # workbook was written)
+        models.ExportWatermark.objects.update_or_create(
+            user=request.user,
+            destination=destination,
+            defaults={
+                "exported_until": last_sale["updated_at"],
+                "exported_id": last_sale["id"],
+            },
+        )
+
+        return self.get_excel_response(output)
+
+    def export_to_excel_background(self, request, queryset):
+        """Export the selected sales to Excel in a background job"""
+
+        sale_ids = list(queryset.values_list("id", flat=True))
+        if not sale_ids:
+            self.message_user(
+                request,
+                "Seleccione al menos una venta para exportar.",
+                level=messages.INFO,
+            )
+            return
+
+        job = models.ExportJob.objects.create(
+            user=request.user, sale_ids=sale_ids, total=len(sale_ids)
+        )
+        enqueue(run_export_job, job.id)
+
+        self.message_user(
+            request,
+            format_html(
+                'Exportación en proceso, descárguela desde <a href="{}">{}</a>.',
+                reverse("admin:travels_exportjob_changelist"),
+                models.ExportJob._meta.verbose_name_plural,
+            ),
+            level=messages.SUCCESS,
+        )
+
     # Labels for custom fields
     custom_links.short_description = "Acciones"
     export_to_excel.short_description = "Exportar a Excel"
+    export_to_excel_background.short_description = "Exportar a Excel (en segundo plano)"
 
 
 @admin.register(models.ServiceType)
 class ServiceTypeAdmin(admin.ModelAdmin):
     list_display = ("name", "updated_at")
     list_filter = ("created_at", "updated_at")
+    search_fields = ("name",)
     readonly_fields = ("created_at", "updated_at")
     ordering = ("name",)
 
 
 @admin.register(models.Transfer)
-class TransferAdmin(admin.ModelAdmin):
+class TransferAdmin(IndexedSearchMixin, FlatExportMixin, admin.ModelAdmin):
+    flat_export_kind = "transfers"
+    actions = ("export_dispatch", "export_to_csv", "export_to_ndjson")
     list_display = ("date", "hour", "type", "sale", "updated_at")
+    list_select_related = ("sale__client", "sale__vehicle", "sale__location")
     list_filter = (
         "type",
-        "sale",
-        "sale__client",
+        ("sale", AutocompleteFieldListFilter),
+        ("sale__client", AutocompleteFieldListFilter),
         "sale__vehicle",
-        "sale__location",
+        ("sale__location", AutocompleteFieldListFilter),
         "created_at",
         "updated_at",
     )
@@ -223,8 +318,30 @@ class TransferAdmin(admin.ModelAdmin):
         "sale__vehicle__name",
         # "sale__vip_code__value",
     )
+    search_uuid_fields = ("sale__stripe_code",)
+    autocomplete_fields = ("sale",)
     readonly_fields = ("created_at", "updated_at")
     ordering = ("-created_at",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def export_dispatch(self, request, queryset):
+        """Export the selected transfers to a workbook with a sheet per date"""
+
+        output = exports.write_dispatch_workbook(queryset)
+        filename = (
+            "marco-cabo-despacho-"
+            f"{timezone.localtime().strftime('%Y%m%d_%H%M%S')}.xlsx"
+        )
+        return FileResponse(
+            output,
+            as_attachment=True,
+            filename=filename,
+            content_type=exports.EXPORT_CONTENT_TYPE,
+        )
+
+    # Labels for custom fields
+    export_dispatch.short_description = "Exportar hoja de despacho"
 
 
 @admin.register(models.Pricing)
@@ -236,7 +353,15 @@ class PricingAdmin(admin.ModelAdmin):
         "price",
         "updated_at",
     )
-    list_filter = ("location", "vehicle", "service_type", "created_at", "updated_at")
+    list_select_related = ("location", "vehicle", "service_type")
+    list_filter = (
+        ("location", AutocompleteFieldListFilter),
+        "vehicle",
+        "service_type",
+        "created_at",
+        "updated_at",
+    )
+    autocomplete_fields = ("location", "vehicle", "service_type")
     search_fields = (
         "location__name",
         "vehicle__name",
@@ -244,4 +369,354 @@ class PricingAdmin(admin.ModelAdmin):
         "price",
     )
     readonly_fields = ("created_at", "updated_at")
-    ordering = ("location__name", "vehicle__name", "service_type__name")
\ No newline at end of file
+    ordering = ("location__name", "vehicle__name", "service_type__name")
+
+    def get_urls(self):
+        urls = [
+            path(
+                "grid/",
+                self.admin_site.admin_view(self.grid_view),
+                name="travels_pricing_grid",
+            ),
+        ]
+        return urls + super().get_urls()
+
+    def grid_view(self, request):
+        """Edit the prices as a grid of locations by vehicle and service
+        type (?zone to only show a zone), or change them by a percentage"""
+
+        if not self.has_change_permission(request):
+            raise PermissionDenied
+
+        zone = None
+        zone_id = request.GET.get("zone")
+        if zone_id:
+            if not zone_id.isdigit():
+                raise Http404
+            zone = get_object_or_404(models.Zone, id=zone_id)
+
+        if request.method == "POST":
+            if request.POST.get("action") == "adjust":
+                self.adjust_grid_prices(request, zone)
+            else:
+                self.save_grid_prices(request)
+            return redirect(request.get_full_path())
+
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "Editor de precios",
+            "grid": pricing.get_price_grid(zone),
+            "zones": models.Zone.objects.order_by("name"),
+            "zone": zone,
+        }
+        return TemplateResponse(
+            request, "admin/travels/pricing/grid.html", context
+        )
+
+    def save_grid_prices(self, request):
+        """Save the changed cells sent by the grid, as a json object in the
+        "prices" field: zone prices (zone-<zone>-<vehicle>-<service type>
+        keys) and location prices (price-<location>-<vehicle>-<service
+        type> keys)"""
+
+        try:
+            cells = json.loads(request.POST.get("prices", "{}"))
+        except ValueError:
+            cells = None
+        if not isinstance(cells, dict):
+            self.message_user(
+                request,
+                "Precios inválidos. No se guardaron los cambios.",
+                level=messages.ERROR,
+            )
+            return
+
+        prices = {"zone": {}, "price": {}}
+        for key, value in cells.items():
+            prefix, _, ids = key.partition("-")
+            value = str(value).strip()
+            if prefix not in prices or not value:
+                continue
+            try:
+                price_key = tuple(int(key_id) for key_id in ids.split("-"))
+                price = float(value)
+            except ValueError:
+                price_key = None
+            if (
+                price_key is None
+                or len(price_key) != 3
+                or not 0 <= price < float("inf")
+            ):
+                self.message_user(
+                    request,
+                    f"Precio inválido: {value}. No se guardaron los cambios.",
+                    level=messages.ERROR,
+                )
+                return
+            prices[prefix][price_key] = price
+
+        updated = pricing.update_prices(prices["zone"], prices["price"])
+        self.message_user(
+            request, f"Se actualizaron {updated} precios.", level=messages.SUCCESS
+        )
+
+    def adjust_grid_prices(self, request, zone: models.Zone = None):
+        """Change by a percentage every price of the grid (of the zone)"""
+
+        try:
+            percentage = float(request.POST.get("percentage", ""))
+        except ValueError:
+            percentage = None
+        if percentage is None or not -100 < percentage < float("inf"):
+            self.message_user(
+                request, "Porcentaje inválido.", level=messages.ERROR
+            )
+            return
+
+        updated = pricing.adjust_prices(percentage, zone)
+        self.message_user(
+            request, f"Se actualizaron {updated} precios.", level=messages.SUCCESS
+        )
+
+
+@admin.register(models.ZonePricing)
+class ZonePricingAdmin(admin.ModelAdmin):
+    list_display = (
+        "zone",
+        "vehicle",
+        "service_type",
+        "price",
+        "updated_at",
+    )
+    list_select_related = ("zone", "vehicle", "service_type")
+    list_filter = ("zone", "vehicle", "service_type", "created_at", "updated_at")
+    autocomplete_fields = ("zone", "vehicle", "service_type")
+    search_fields = (
+        "zone__name",
+        "vehicle__name",
+        "service_type__name",
+    )
+    readonly_fields = ("created_at", "updated_at")
+    ordering = ("zone__name", "vehicle__name", "service_type__name")
+
+
+@admin.register(models.PostalCodeRange)
+class PostalCodeRangeAdmin(admin.ModelAdmin):
+    list_display = ("start", "end", "location", "updated_at")
+    list_select_related = ("location",)
+    autocomplete_fields = ("location",)
+    list_filter = ("created_at", "updated_at")
+    search_fields = ("start", "end", "location__name")
+    readonly_fields = ("created_at", "updated_at")
+    ordering = ("start", "location__name")
+
+
+@admin.register(models.ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "user",
+        "status",
+        "progress",
+        "download_link",
+        "created_at",
+        "updated_at",
+    )
+    list_select_related = ("user",)
+    list_filter = ("status", "created_at")
+    exclude = ("sale_ids",)
+    readonly_fields = (
+        "user",
+        "status",
+        "progress",
+        "download_link",
+        "error",
+        "created_at",
+        "updated_at",
+    )
+    ordering = ("-created_at",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        fail_stale_jobs(models.ExportJob)
+        return super().changelist_view(request, extra_context)
+
+    def get_urls(self):
+        urls = [
+            path(
+                "<int:job_id>/download/",
+                self.admin_site.admin_view(self.download_view),
+                name="travels_exportjob_download",
+            ),
+        ]
+        return urls + super().get_urls()
+
+    def download_view(self, request, job_id):
+        """Download the workbook of a finished export"""
+
+        job = get_object_or_404(models.ExportJob, id=job_id)
+        if not self.has_view_permission(request, job) or not job.file:
+            raise Http404
+
+        return FileResponse(
+            job.file.open("rb"),
+            as_attachment=True,
+            filename=os.path.basename(job.file.name),
+            content_type=exports.EXPORT_CONTENT_TYPE,
+        )
+
+    # CUSTOM FIELDS
+    def progress(self, obj):
+        """Processed sales of the total"""
+        percentage = int(obj.processed * 100 / obj.total) if obj.total else 100
+        return f"{obj.processed} / {obj.total} ({percentage}%)"
+
+    def download_link(self, obj):
+        """Download button of finished exports"""
+        if obj.status != "done" or not obj.file:
+            return "-"
+        return format_html(
+            '<a class="btn btn-secondary my-1" href="{}">Descargar</a>',
+            reverse("admin:travels_exportjob_download", args=[obj.id]),
+        )
+
+    # Labels for custom fields
+    progress.short_description = "Progreso"
+    download_link.short_description = "Archivo"
+
+
+@admin.register(models.PricingImport)
+class PricingImportAdmin(admin.ModelAdmin):
+    actions = ("apply_imports",)
+    list_display = (
+        "id",
+        "user",
+        "file",
+        "dry_run",
+        "status",
+        "summary",
+        "created_at",
+        "updated_at",
+    )
+    list_select_related = ("user",)
+    list_filter = ("status", "dry_run", "created_at")
+    fields = (
+        "file",
+        "spec",
+        "dry_run",
+        "user",
+        "status",
+        "summary",
+        "changes",
+        "error",
+        "created_at",
+        "updated_at",
+    )
+    readonly_fields = (
+        "user",
+        "status",
+        "summary",
+        "changes",
+        "error",
+        "created_at",
+        "updated_at",
+    )
+    ordering = ("-created_at",)
+
+    def get_readonly_fields(self, request, obj=None):
+        # Imports can not be changed once uploaded
+        if obj is not None:
+            return ("file", "spec", "dry_run") + self.readonly_fields
+        return self.readonly_fields
+
+    def changelist_view(self, request, extra_context=None):
+        fail_stale_jobs(models.PricingImport)
+        return super().changelist_view(request, extra_context)
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            obj.user = request.user
+        super().save_model(request, obj, form, change)
+        if not change:
+            enqueue(run_pricing_import, obj.id)
+
+    def apply_imports(self, request, queryset):
+        """Import again, saving the changes, the selected dry runs"""
+
+        pricing_imports = list(queryset.filter(dry_run=True, status="done"))
+        for pricing_import in pricing_imports:
+            applied_import = models.PricingImport.objects.create(
+                user=request.user,
+                file=pricing_import.file.name,
+                spec=pricing_import.spec,
+                dry_run=False,
+            )
+            enqueue(run_pricing_import, applied_import.id)
+
+        self.message_user(
+            request,
+            f"Se aplicarán {len(pricing_imports)} importaciones en segundo plano.",
+            level=messages.SUCCESS,
+        )
+
+    # CUSTOM FIELDS
+    def summary(self, obj):
+        """Number of prices created, updated and deleted"""
+        if not obj.report:
+            return "-"
+        return (
+            f"{obj.report['rows']} filas: {obj.report['created']} nuevos, "
+            f"{obj.report['updated']} actualizados, "
+            f"{obj.report['deleted']} eliminados"
+        )
+
+    def changes(self, obj):
+        """Table of the changed prices"""
+        if not obj.report or not obj.report["changes"]:
+            return "-"
+        return format_html(
+            '<table class="table table-sm">'
+            "<tr><th>Cambio</th><th>Ubicación</th><th>Vehículo</th>"
+            "<th>Tipo de Servicio</th><th>Precio anterior</th><th>Precio</th></tr>"
+            "{}</table>",
+            format_html_join(
+                "",
+                "<tr><td>{}</td><td>{}</td><td>{}</td><td>{}</td><td>{}</td>"
+                "<td>{}</td></tr>",
+                (
+                    (
+                        self.change_labels[change["action"]],
+                        change["location"],
+                        change["vehicle"],
+                        change["service_type"],
+                        "-" if change["old_price"] is None else change["old_price"],
+                        "-" if change["price"] is None else change["price"],
+                    )
+                    for change in obj.report["changes"]
+                ),
+            ),
+        )
+
+    change_labels = {
+        "create": "Nuevo",
+        "update": "Actualizado",
+        "delete": "Eliminado",
+    }
+
+    # Labels for custom fields
+    apply_imports.short_description = "Aplicar importaciones simuladas"
+    summary.short_description = "Resumen"
+    changes.short_description = "Cambios"
+
+
+@admin.register(models.ExportWatermark)
+class ExportWatermarkAdmin(admin.ModelAdmin):
+    list_display = ("user", "destination", "exported_until", "updated_at")
+    list_select_related = ("user",)
+    list_filter = ("destination", "updated_at")
+    search_fields = ("user__username", "destination")
+    readonly_fields = ("created_at", "updated_at")
+    ordering = ("user__username", "destination")
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class TravelsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "travels"
+
+    def ready(self):
+        # Connect signals
+        from travels import signals  # noqa: F401
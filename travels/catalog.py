@@ -0,0 +1,591 @@
+import bisect
+import gzip
+import hashlib
+import json
+import threading
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from travels import models
+
+CATALOG_VERSION_KEY = "travels:catalog-version"
+
+# Per process snapshot, rebuilt when the shared catalog version changes
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+class Catalog:
+    """In-memory snapshot of the catalog tables (zones, locations, vehicles,
+    service types, pricing and postal code ranges), loaded once per version
+
+    Prices are resolved once per snapshot: the zone default prices are
+    expanded to the locations of the zone, and replaced by the location
+    prices (Pricing rows) where they exist
+    """
+
+    def __init__(self, version: str):
+        self.version = version
+
+        # Load catalog tables
+        self.zones = {
+            zone["id"]: zone
+            for zone in models.Zone.objects.values("id", "name").order_by("id")
+        }
+        self.locations = {
+            location["id"]: location
+            for location in models.Location.objects.values(
+                "id", "name", "zone_id"
+            ).order_by("id")
+        }
+        self.vehicles = {
+            vehicle["id"]: vehicle
+            for vehicle in models.Vehicle.objects.values(
+                "id", "name", "passengers"
+            ).order_by("id")
+        }
+        self.service_types = {
+            service_type["id"]: service_type
+            for service_type in models.ServiceType.objects.values(
+                "id", "name"
+            ).order_by("id")
+        }
+
+        # Zone default prices: (zone_id, vehicle_id, service_type_id) -> price
+        # (and its id)
+        self.zone_prices = {}
+        self.zone_pricing_ids = {}
+        for (
+            zone_pricing_id,
+            zone_id,
+            vehicle_id,
+            service_type_id,
+            price,
+        ) in models.ZonePricing.objects.values_list(
+            "id", "zone_id", "vehicle_id", "service_type_id", "price"
+        ).order_by("id"):
+            key = (zone_id, vehicle_id, service_type_id)
+            self.zone_prices[key] = price
+            self.zone_pricing_ids[key] = zone_pricing_id
+
+        # Location prices: (location_id, vehicle_id, service_type_id) -> id
+        # and price
+        self.overrides = {
+            (location_id, vehicle_id, service_type_id): (pricing_id, price)
+            for (
+                pricing_id,
+                location_id,
+                vehicle_id,
+                service_type_id,
+                price,
+            ) in models.Pricing.objects.values_list(
+                "id", "location_id", "vehicle_id", "service_type_id", "price"
+            ).order_by("id")
+        }
+
+        # Pricing matrix: (location_id, vehicle_id, service_type_id) -> price
+        self.prices = resolve_prices(
+            self.zone_prices,
+            {key: price for key, (_, price) in self.overrides.items()},
+            get_zone_locations(
+                (location_id, location["zone_id"])
+                for location_id, location in self.locations.items()
+            ),
+        )
+
+        # Location prices, same shape as PricingSerializer
+        self.pricing = []
+        for key in sorted(self.overrides):
+            location_id, vehicle_id, service_type_id = key
+            pricing_id, price = self.overrides[key]
+            self.pricing.append(
+                {
+                    "id": pricing_id,
+                    "location": {
+                        "id": location_id,
+                        "name": self.locations[location_id]["name"],
+                    },
+                    **self._get_price_row(vehicle_id, service_type_id, price),
+                }
+            )
+
+        # Zone prices, same shape as ZonePricingSerializer
+        self.zone_pricing = []
+        for key in sorted(self.zone_prices):
+            zone_id, vehicle_id, service_type_id = key
+            self.zone_pricing.append(
+                {
+                    "id": self.zone_pricing_ids[key],
+                    "zone": {"id": zone_id, "name": self.zones[zone_id]["name"]},
+                    **self._get_price_row(
+                        vehicle_id, service_type_id, self.zone_prices[key]
+                    ),
+                }
+            )
+
+        # Pricing rows by location, and resolved prices of each location
+        # (its own price or the zone price)
+        self.location_pricing = {}
+        for row in self.pricing:
+            self.location_pricing.setdefault(row["location"]["id"], []).append(row)
+        self.location_prices = {}
+        for key in sorted(self.prices):
+            location_id, vehicle_id, service_type_id = key
+            self.location_prices.setdefault(location_id, []).append(
+                self._get_price_row(vehicle_id, service_type_id, self.prices[key])
+            )
+
+        # Postal code ranges with their location ids, sorted by start
+        # (binary search index)
+        ranges = {}
+        for start, end, location_id in models.PostalCodeRange.objects.values_list(
+            "start", "end", "location_id"
+        ).order_by("start", "location_id"):
+            ranges.setdefault((start, end), []).append(location_id)
+        self.postal_code_ranges = [
+            (start, end, location_ids)
+            for (start, end), location_ids in sorted(ranges.items())
+        ]
+        self.postal_code_starts = [start for start, _, _ in self.postal_code_ranges]
+
+    def _get_price_row(
+        self, vehicle_id: int, service_type_id: int, price: float
+    ) -> dict:
+        """Vehicle, service type and price fields of a pricing row"""
+        vehicle = self.vehicles[vehicle_id]
+        return {
+            "vehicle": {
+                "id": vehicle_id,
+                "name": vehicle["name"],
+                "passengers": vehicle["passengers"],
+            },
+            "service_type": {
+                "id": service_type_id,
+                "name": self.service_types[service_type_id]["name"],
+            },
+            "price": price,
+        }
+
+    @cached_property
+    def blob(self) -> "CatalogBlob":
+        """Pre-serialized and compressed catalog, built once per snapshot"""
+
+        # Nest locations in zones
+        zones = {
+            zone_id: {"id": zone["id"], "name": zone["name"], "locations": []}
+            for zone_id, zone in self.zones.items()
+        }
+        for location in self.locations.values():
+            zones[location["zone_id"]]["locations"].append(
+                {"id": location["id"], "name": location["name"]}
+            )
+
+        data = {
+            "status": "success",
+            "message": "Catalog retrieved successfully",
+            "data": {
+                "zones": list(zones.values()),
+                "vehicles": list(self.vehicles.values()),
+                "service_types": list(self.service_types.values()),
+                # [zone_id, vehicle_id, service_type_id, price]
+                "zone_pricing": [
+                    [zone_id, vehicle_id, service_type_id, price]
+                    for (
+                        zone_id,
+                        vehicle_id,
+                        service_type_id,
+                    ), price in self.zone_prices.items()
+                ],
+                # [location_id, vehicle_id, service_type_id, price], used
+                # instead of the zone price of the location
+                "pricing": [
+                    [location_id, vehicle_id, service_type_id, price]
+                    for (
+                        location_id,
+                        vehicle_id,
+                        service_type_id,
+                    ), (_, price) in self.overrides.items()
+                ],
+                # [start, end, [location_id, ...]], sorted by start
+                "postal_codes": [
+                    [start, end, location_ids]
+                    for start, end, location_ids in self.postal_code_ranges
+                ],
+            },
+        }
+        return CatalogBlob(json.dumps(data, separators=(",", ":")).encode())
+
+    @cached_property
+    def pricing_matrix(self) -> dict:
+        """Full pricing matrix, built once per snapshot"""
+        return self.get_pricing_matrix()
+
+    def get_pricing_matrix(
+        self,
+        location: int = None,
+        vehicle: int = None,
+        service_type: int = None,
+    ) -> dict:
+        """Get the pricing in a columnar layout: id -> name dicts for
+        locations, vehicles and service types, and a dense price array
+        where prices[l][v][s] is the price of the l-th location, v-th
+        vehicle and s-th service type (None when there is no pricing)
+
+        Args:
+            location (int): Location id filter
+            vehicle (int): Vehicle id filter
+            service_type (int): Service type id filter
+
+        Returns:
+            dict: locations, vehicles, service_types and prices
+        """
+
+        keys = [
+            key
+            for key in self.prices
+            if (location is None or key[0] == location)
+            and (vehicle is None or key[1] == vehicle)
+            and (service_type is None or key[2] == service_type)
+        ]
+
+        # Axes of the matrix, ordered by id
+        location_ids = sorted({key[0] for key in keys})
+        vehicle_ids = sorted({key[1] for key in keys})
+        service_type_ids = sorted({key[2] for key in keys})
+        location_indexes = {
+            location_id: index for index, location_id in enumerate(location_ids)
+        }
+        vehicle_indexes = {
+            vehicle_id: index for index, vehicle_id in enumerate(vehicle_ids)
+        }
+        service_type_indexes = {
+            service_type_id: index
+            for index, service_type_id in enumerate(service_type_ids)
+        }
+
+        # Fill prices
+        prices = [
+            [[None] * len(service_type_ids) for _ in vehicle_ids]
+            for _ in location_ids
+        ]
+        for key in keys:
+            location_id, vehicle_id, service_type_id = key
+            prices[location_indexes[location_id]][vehicle_indexes[vehicle_id]][
+                service_type_indexes[service_type_id]
+            ] = self.prices[key]
+
+        return {
+            "locations": {
+                location_id: self.locations[location_id]["name"]
+                for location_id in location_ids
+            },
+            "vehicles": {
+                vehicle_id: self.vehicles[vehicle_id]["name"]
+                for vehicle_id in vehicle_ids
+            },
+            "service_types": {
+                service_type_id: self.service_types[service_type_id]["name"]
+                for service_type_id in service_type_ids
+            },
+            "prices": prices,
+        }
+
+    def get_price(
+        self, location_id: int, vehicle_id: int, service_type_id: int
+    ) -> float | None:
+        """Get the price of a location, vehicle and service type
+
+        Args:
+            location_id (int): Location id
+            vehicle_id (int): Vehicle id
+            service_type_id (int): Service type id
+
+        Returns:
+            float | None: Price, or None if there is no pricing for the combination
+        """
+        return self.prices.get((location_id, vehicle_id, service_type_id))
+
+    def filter_pricing(
+        self,
+        location: int = None,
+        vehicle: int = None,
+        service_type: int = None,
+    ) -> list[dict]:
+        """Get the rendered location pricing rows matching the given ids
+
+        Args:
+            location (int): Location id filter
+            vehicle (int): Vehicle id filter
+            service_type (int): Service type id filter
+
+        Returns:
+            list[dict]: Rendered pricing rows, ordered by location, vehicle
+                and service type id
+        """
+        if location is None and vehicle is None and service_type is None:
+            return self.pricing
+
+        rows = self.pricing
+        if location is not None:
+            rows = self.location_pricing.get(location, [])
+        return [
+            row
+            for row in rows
+            if (vehicle is None or row["vehicle"]["id"] == vehicle)
+            and (service_type is None or row["service_type"]["id"] == service_type)
+        ]
+
+    def filter_zone_pricing(
+        self,
+        zone: int = None,
+        vehicle: int = None,
+        service_type: int = None,
+    ) -> list[dict]:
+        """Get the rendered zone pricing rows matching the given ids
+
+        Args:
+            zone (int): Zone id filter
+            vehicle (int): Vehicle id filter
+            service_type (int): Service type id filter
+
+        Returns:
+            list[dict]: Rendered zone pricing rows, ordered by zone, vehicle
+                and service type id
+        """
+        if zone is None and vehicle is None and service_type is None:
+            return self.zone_pricing
+
+        return [
+            row
+            for row in self.zone_pricing
+            if (zone is None or row["zone"]["id"] == zone)
+            and (vehicle is None or row["vehicle"]["id"] == vehicle)
+            and (service_type is None or row["service_type"]["id"] == service_type)
+        ]
+
+    def find_postal_code(self, code: str) -> tuple | None:
+        """Find the range of a postal code (binary search by start)
+
+        Args:
+            code (str): Postal code (5 digits)
+
+        Returns:
+            tuple | None: (start, end, location ids) range, or None if no
+                range has the postal code
+        """
+
+        index = bisect.bisect_right(self.postal_code_starts, code) - 1
+        if index < 0:
+            return None
+        postal_code_range = self.postal_code_ranges[index]
+        if code > postal_code_range[1]:
+            return None
+        return postal_code_range
+
+
+class CatalogBlob:
+    """Catalog json bytes, its gzip version and its content hash (etag)"""
+
+    def __init__(self, content: bytes):
+        self.content = content
+        self.compressed = gzip.compress(content, compresslevel=9, mtime=0)
+        self.etag = f'"{hashlib.sha256(content).hexdigest()}"'
+
+
+def get_zone_locations(locations) -> dict[int, list[int]]:
+    """Group location ids by zone
+
+    Args:
+        locations (iterable): (location id, zone id) pairs
+
+    Returns:
+        dict[int, list[int]]: Location ids by zone id
+    """
+
+    zone_locations = {}
+    for location_id, zone_id in locations:
+        zone_locations.setdefault(zone_id, []).append(location_id)
+    return zone_locations
+
+
+def resolve_prices(
+    zone_prices: dict, location_prices: dict, zone_locations: dict
+) -> dict:
+    """Get the price of each location: its own price, or the default
+    price of its zone
+
+    Args:
+        zone_prices (dict): Price by (zone id, vehicle id, service type id)
+        location_prices (dict): Price by (location id, vehicle id,
+            service type id)
+        zone_locations (dict): Location ids by zone id
+
+    Returns:
+        dict: Price by (location id, vehicle id, service type id)
+    """
+
+    prices = {}
+    for (zone_id, vehicle_id, service_type_id), price in zone_prices.items():
+        for location_id in zone_locations.get(zone_id, ()):
+            prices[(location_id, vehicle_id, service_type_id)] = price
+    prices.update(location_prices)
+    return prices
+
+
+def compress_prices(prices: dict, zone_locations: dict) -> tuple[dict, dict]:
+    """Split the prices of each location in zone default prices and the
+    location prices that differ from them (inverse of resolve_prices)
+
+    A zone gets a default price for a vehicle and service type only when
+    all its locations have a price for them (the most common one)
+
+    Args:
+        prices (dict): Price by (location id, vehicle id, service type id)
+        zone_locations (dict): Location ids by zone id
+
+    Returns:
+        tuple[dict, dict]: Zone prices and location prices
+    """
+
+    location_zones = {
+        location_id: zone_id
+        for zone_id, location_ids in zone_locations.items()
+        for location_id in location_ids
+    }
+
+    # Group prices by zone, vehicle and service type
+    groups = {}
+    location_prices = {}
+    for key, price in prices.items():
+        location_id, vehicle_id, service_type_id = key
+        zone_id = location_zones.get(location_id)
+        if zone_id is None:
+            location_prices[key] = price
+            continue
+        groups.setdefault((zone_id, vehicle_id, service_type_id), {})[
+            location_id
+        ] = price
+
+    zone_prices = {}
+    for zone_key, group in groups.items():
+        zone_id, vehicle_id, service_type_id = zone_key
+        if len(group) == len(zone_locations[zone_id]):
+            # Most common price (the lowest one on ties)
+            counts = Counter(group.values())
+            default = min(counts, key=lambda price: (-counts[price], price))
+            zone_prices[zone_key] = default
+        else:
+            default = None
+
+        for location_id, price in group.items():
+            if price != default:
+                location_prices[(location_id, vehicle_id, service_type_id)] = price
+
+    return zone_prices, location_prices
+
+
+def get_catalog_version() -> str:
+    """Get the catalog version, saved in the database (shared by every
+    process) and cached for CATALOG_VERSION_TTL seconds"""
+
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        catalog_version, _ = models.CatalogVersion.objects.get_or_create(
+            id=1, defaults={"version": uuid.uuid4().hex}
+        )
+        version = catalog_version.version
+        cache.set(CATALOG_VERSION_KEY, version, settings.CATALOG_VERSION_TTL)
+    return version
+
+
+def get_catalog() -> Catalog:
+    """Get the catalog snapshot of the current process, loading it
+    again only when the catalog version changed
+    """
+    global _catalog
+
+    version = get_catalog_version()
+
+    # Snapshots loaded inside a transaction could include rows that are
+    # rolled back later, so they are not kept
+    if connection.in_atomic_block:
+        return Catalog(version)
+
+    catalog = _catalog
+    if catalog is not None and catalog.version == version:
+        return catalog
+
+    with _catalog_lock:
+        if _catalog is None or _catalog.version != version:
+            _catalog = Catalog(version)
+        return _catalog
+
+
+def _bump_catalog_version():
+    version = uuid.uuid4().hex
+    if not models.CatalogVersion.objects.filter(id=1).update(
+        version=version, updated_at=timezone.now()
+    ):
+        models.CatalogVersion.objects.create(id=1, version=version)
+    cache.set(CATALOG_VERSION_KEY, version, settings.CATALOG_VERSION_TTL)
+
+
+def invalidate_catalog():
+    """Invalidate the catalog snapshot of every process
+
+    The version is changed right away (so the current process never reads
+    stale data) and again after commit, so snapshots loaded by other
+    threads before the transaction finished are discarded too. Other
+    processes (workers, management commands) see the new version once
+    their cached version expires (CATALOG_VERSION_TTL).
+    """
+    _bump_catalog_version()
+    transaction.on_commit(_bump_catalog_version)
+
+
+def delete_catalog_rows(model, ids, batch_size: int = 500) -> int:
+    """Delete catalog rows with bulk DELETE statements, instead of the
+    post_delete signals of each row: the tombstones (for delta syncs) are
+    saved in bulk and the catalog is invalidated once, explicitly
+
+    Only for tables that no other row references (nothing to cascade)
+
+    Args:
+        model (Model): Catalog model
+        ids (iterable): Ids of the rows to delete
+        batch_size (int): Rows per insert and delete statement
+
+    Returns:
+        int: Number of rows deleted
+    """
+
+    ids = list(ids)
+    if not ids:
+        return 0
+
+    models.DeletedRecord.objects.bulk_create(
+        [
+            models.DeletedRecord(model=model._meta.model_name, object_id=row_id)
+            for row_id in ids
+        ],
+        batch_size=batch_size,
+    )
+    deleted = 0
+    table = connection.ops.quote_name(model._meta.db_table)
+    column = connection.ops.quote_name(model._meta.pk.column)
+    with connection.cursor() as cursor:
+        for index in range(0, len(ids), batch_size):
+            batch = ids[index : index + batch_size]
+            placeholders = ", ".join(["%s"] * len(batch))
+            cursor.execute(
+                f"DELETE FROM {table} WHERE {column} IN ({placeholders})", batch
+            )
+            deleted += cursor.rowcount
+    invalidate_catalog()
+    return deleted
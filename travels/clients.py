@@ -0,0 +1,85 @@
+from django.db import transaction
+from django.db.models import Case, Count, F, Min, Value, When
+from django.db.models.functions import Lower, Trim
+
+
+def normalize_email(email: str) -> str:
+    """Normalize an email to match clients (trimmed and lower case)"""
+    return email.strip().lower()
+
+
+def merge_duplicate_clients(client_model, sale_model, batch_size: int = 500) -> int:
+    """Merge clients with the same normalized email into the oldest one:
+    sales are moved to it, its missing last name and phone are filled from
+    the newest duplicates, then the duplicates are deleted and the emails
+    normalized
+
+    Migration 0041 runs a frozen copy of this merge (keep them in sync)
+
+    Args:
+        client_model (Model): Client model
+        sale_model (Model): Sale model
+        batch_size (int): Duplicated emails merged per transaction
+
+    Returns:
+        int: Number of clients deleted
+    """
+
+    email_key = Lower(Trim("email"))
+
+    # Get duplicated emails (with the client to keep)
+    duplicated = list(
+        client_model.objects.annotate(email_key=email_key)
+        .values("email_key")
+        .annotate(clients=Count("id"), keep_id=Min("id"))
+        .filter(clients__gt=1)
+        .values_list("email_key", "keep_id")
+        .order_by("email_key")
+    )
+
+    deleted = 0
+    for start in range(0, len(duplicated), batch_size):
+        keep_ids = dict(duplicated[start : start + batch_size])
+
+        with transaction.atomic():
+            clients = (
+                client_model.objects.annotate(email_key=email_key)
+                .filter(email_key__in=keep_ids.keys())
+                .order_by("id")
+            )
+
+            # Map duplicates to the client to keep, filling its missing data
+            keep_clients = {}
+            duplicates = {}
+            for client in clients:
+                keep_id = keep_ids[client.email_key]
+                if client.id == keep_id:
+                    keep_clients[keep_id] = client
+                    continue
+                duplicates[client.id] = keep_id
+                keep_client = keep_clients[keep_id]
+                keep_client.last_name = client.last_name or keep_client.last_name
+                keep_client.phone = client.phone or keep_client.phone
+
+            # Move sales to the clients kept (single update)
+            sale_model.objects.filter(client_id__in=duplicates.keys()).update(
+                client_id=Case(
+                    *[
+                        When(client_id=duplicate_id, then=Value(keep_id))
+                        for duplicate_id, keep_id in duplicates.items()
+                    ]
+                )
+            )
+
+            client_model.objects.bulk_update(
+                keep_clients.values(), ["last_name", "phone"]
+            )
+            client_model.objects.filter(id__in=duplicates.keys()).delete()
+            deleted += len(duplicates)
+
+    # Normalize the remaining emails
+    client_model.objects.annotate(email_key=email_key).exclude(
+        email=F("email_key")
+    ).update(email=email_key)
+
+    return deleted
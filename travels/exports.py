@@ -0,0 +1,466 @@
+import csv
+import functools
+import os
+import pickle
+import tempfile
+from copy import copy
+
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import numbers
+from openpyxl.utils import get_column_letter
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from travels import models
+
+EXPORT_TEMPLATE_PATH = os.path.join(settings.BASE_DIR, "utils", "export-template.xlsx")
+EXPORT_CONTENT_TYPE = (
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+)
+
+# Flat exports: model and (header, lookup) columns, joined in one query
+FLAT_EXPORTS = {
+    "sales": (
+        models.Sale,
+        (
+            ("id", "id"),
+            ("stripe_code", "stripe_code"),
+            ("created_at", "created_at"),
+            ("updated_at", "updated_at"),
+            ("paid", "paid"),
+            ("total", "total"),
+            ("passengers", "passengers"),
+            ("details", "details"),
+            ("client_name", "client__name"),
+            ("client_last_name", "client__last_name"),
+            ("client_email", "client__email"),
+            ("client_phone", "client__phone"),
+            ("zone", "location__zone__name"),
+            ("location", "location__name"),
+            ("vehicle", "vehicle__name"),
+            ("service_type", "service_type__name"),
+        ),
+    ),
+    "transfers": (
+        models.Transfer,
+        (
+            ("id", "id"),
+            ("type", "type"),
+            ("date", "date"),
+            ("hour", "hour"),
+            ("airline", "airline"),
+            ("flight_number", "flight_number"),
+            ("created_at", "created_at"),
+            ("updated_at", "updated_at"),
+            ("sale_id", "sale_id"),
+            ("sale_stripe_code", "sale__stripe_code"),
+            ("sale_paid", "sale__paid"),
+            ("passengers", "sale__passengers"),
+            ("client_name", "sale__client__name"),
+            ("client_last_name", "sale__client__last_name"),
+            ("client_email", "sale__client__email"),
+            ("client_phone", "sale__client__phone"),
+            ("zone", "sale__location__zone__name"),
+            ("location", "sale__location__name"),
+            ("vehicle", "sale__vehicle__name"),
+            ("service_type", "sale__service_type__name"),
+        ),
+    ),
+}
+FLAT_EXPORT_CONTENT_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+# Template layout: headers in rows 1 to 5, styled data rows from row 6
+HEADER_ROWS = 5
+DATA_COLUMNS = 15
+DATE_COLUMNS = {8, 12}
+TIME_COLUMNS = {11, 15}
+
+
+def get_sale_row(sale) -> list:
+    """Get the export row of a sale (transfers from the prefetch cache)
+
+    Args:
+        sale (Sale): Sale with client, vehicle, location and transfers loaded
+
+    Returns:
+        list: Row values
+    """
+
+    transfers = {}
+    for transfer in sale.transfer_set.all():
+        transfers.setdefault(transfer.type, transfer)
+    arrival = transfers.get("arrival")
+    departure = transfers.get("departure")
+
+    return [
+        sale.client.last_name,
+        sale.client.name,
+        sale.client.email,
+        sale.client.phone,
+        sale.location.name,  # Hotel
+        sale.vehicle.name,
+        sale.passengers,
+        arrival.date if arrival else None,
+        arrival.airline if arrival else "",
+        arrival.flight_number if arrival else "",
+        arrival.hour if arrival else None,
+        departure.date if departure else None,
+        departure.airline if departure else "",
+        departure.flight_number if departure else "",
+        departure.hour if departure else None,
+    ]
+
+
+def with_export_relations(queryset):
+    """Load the sale relations used by the export rows (single joined
+    query, plus a transfers query per chunk)"""
+    return queryset.select_related("client", "vehicle", "location").prefetch_related(
+        "transfer_set"
+    )
+
+
+def iter_sales_rows(queryset, chunk_size: int = 2000):
+    """Iterate the export rows of the sales, loaded in chunks from a
+    single joined query (plus one transfers query per chunk)
+
+    Args:
+        queryset (QuerySet): Sales to export
+        chunk_size (int): Sales loaded per chunk
+
+    Yields:
+        list: Row values
+    """
+
+    for sale in with_export_relations(queryset).iterator(chunk_size=chunk_size):
+        yield get_sale_row(sale)
+
+
+def get_transfer_row(transfer) -> list:
+    """Get the dispatch row of a transfer (arrival or departure columns
+    filled by its type)
+
+    Args:
+        transfer (Transfer): Transfer with sale client, vehicle and
+            location loaded
+
+    Returns:
+        list: Row values
+    """
+
+    sale = transfer.sale
+    flight = [transfer.date, transfer.airline, transfer.flight_number, transfer.hour]
+    empty = [None, "", "", None]
+    is_arrival = transfer.type == "arrival"
+
+    return [
+        sale.client.last_name,
+        sale.client.name,
+        sale.client.email,
+        sale.client.phone,
+        sale.location.name,  # Hotel
+        sale.vehicle.name,
+        sale.passengers,
+        *(flight if is_arrival else empty),
+        *(empty if is_arrival else flight),
+    ]
+
+
+@functools.lru_cache(maxsize=None)
+def get_export_template():
+    """Get the export template sheet, parsed once per process (shared by
+    all the exports, only read)"""
+    return openpyxl.load_workbook(EXPORT_TEMPLATE_PATH).active
+
+
+def _copy_style(source, target):
+    target.font = copy(source.font)
+    target.fill = copy(source.fill)
+    target.border = copy(source.border)
+    target.alignment = copy(source.alignment)
+    target.protection = copy(source.protection)
+    target.number_format = source.number_format
+
+
+def _get_header_lengths(template) -> list[int]:
+    """Get the values length of each template header column (by index)"""
+
+    max_lengths = [0] * (template.max_column + 1)
+    for row in template.iter_rows(max_row=HEADER_ROWS):
+        for cell in row:
+            if cell.value is not None:
+                max_lengths[cell.column] = max(
+                    max_lengths[cell.column], len(str(cell.value))
+                )
+    return max_lengths
+
+
+def _measure_row(max_lengths: list[int], row: list):
+    """Update the columns values length with a row"""
+
+    for col_index, value in enumerate(row, start=1):
+        if value is not None:
+            max_lengths[col_index] = max(max_lengths[col_index], len(str(value)))
+
+
+def _write_sheet(workbook, title: str, rows, max_lengths: list[int]):
+    """Add a write only sheet with the template headers and the rows
+
+    Args:
+        workbook (Workbook): Write only workbook
+        title (str): Sheet title
+        rows (iterable): Row values
+        max_lengths (list[int]): Values length of each column (by index),
+            used to size the columns
+    """
+
+    template = get_export_template()
+    sheet = workbook.create_sheet(title)
+
+    # Column widths (template width if the column has no values)
+    for col_index in range(1, template.max_column + 1):
+        letter = get_column_letter(col_index)
+        if max_lengths[col_index]:
+            sheet.column_dimensions[letter].width = max_lengths[col_index] * 2
+        elif letter in template.column_dimensions:
+            sheet.column_dimensions[letter].width = template.column_dimensions[
+                letter
+            ].width
+
+    # Data rows use the height of the first template data row (sheet
+    # default, so no dimension is kept per row); headers keep theirs
+    data_row = HEADER_ROWS + 1
+    data_height = template.row_dimensions[data_row].height
+    if data_height:
+        sheet.sheet_format.defaultRowHeight = data_height
+        sheet.sheet_format.customHeight = True
+
+    # Template headers
+    for row in template.iter_rows(max_row=HEADER_ROWS):
+        row_index = row[0].row
+        sheet.row_dimensions[row_index].height = (
+            template.row_dimensions[row_index].height
+            or template.sheet_format.defaultRowHeight
+        )
+        cells = []
+        for template_cell in row:
+            cell = WriteOnlyCell(sheet, value=template_cell.value)
+            if template_cell.has_style:
+                _copy_style(template_cell, cell)
+            cells.append(cell)
+        sheet.append(cells)
+
+    # Styles of the data cells (copied once per column): empty cells
+    # keep the template style, dates and times use fixed formats
+    empty_styles = []
+    value_styles = []
+    for col_index in range(1, DATA_COLUMNS + 1):
+        cell = WriteOnlyCell(sheet)
+        _copy_style(template.cell(row=data_row, column=col_index), cell)
+        empty_styles.append(copy(cell._style))
+        if col_index in DATE_COLUMNS:
+            cell.number_format = numbers.FORMAT_DATE_YYYYMMDD2
+        elif col_index in TIME_COLUMNS:
+            cell.number_format = numbers.FORMAT_DATE_TIME4
+        value_styles.append(copy(cell._style))
+
+    # Data rows
+    for row in rows:
+        cells = []
+        for col_index, value in enumerate(row):
+            cell = WriteOnlyCell(sheet, value=value)
+            cell._style = copy(
+                empty_styles[col_index] if value is None else value_styles[col_index]
+            )
+            cells.append(cell)
+        sheet.append(cells)
+
+
+def _save_workbook(workbook):
+    """Save a workbook to a temporary file, returned at position 0"""
+
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+
+def _iter_staged(staged):
+    """Iterate the rows pickled in a file"""
+
+    while True:
+        try:
+            yield pickle.load(staged)
+        except EOFError:
+            return
+
+
+def write_sales_workbook(rows):
+    """Write the sales export workbook (template headers and the rows) to
+    a temporary file, keeping memory use flat
+
+    Rows are staged in a temporary file while the column widths are
+    measured, since write only sheets need the widths before any row
+
+    Args:
+        rows (iterable): Export rows (see iter_sales_rows)
+
+    Returns:
+        file: Temporary file with the workbook, at position 0
+    """
+
+    max_lengths = _get_header_lengths(get_export_template())
+
+    # Stage rows, measuring widths
+    with tempfile.TemporaryFile() as staged:
+        for row in rows:
+            _measure_row(max_lengths, row)
+            pickle.dump(row, staged, pickle.HIGHEST_PROTOCOL)
+        staged.seek(0)
+
+        workbook = openpyxl.Workbook(write_only=True)
+        _write_sheet(
+            workbook, get_export_template().title, _iter_staged(staged), max_lengths
+        )
+        return _save_workbook(workbook)
+
+
+def write_dispatch_workbook(queryset):
+    """Write the dispatch workbook: a sheet per service date with its
+    transfers sorted by time, from a single ordered query
+
+    Only the transfers of one date are kept in memory (to size the
+    columns of its sheet before writing it)
+
+    Args:
+        queryset (QuerySet): Transfers to export
+
+    Returns:
+        file: Temporary file with the workbook, at position 0
+    """
+
+    header_lengths = _get_header_lengths(get_export_template())
+    workbook = openpyxl.Workbook(write_only=True)
+
+    queryset = queryset.select_related(
+        "sale__client", "sale__location", "sale__vehicle"
+    ).order_by("date", "hour", "id")
+
+    current_date = None
+    rows = []
+    max_lengths = None
+    for transfer in queryset.iterator(chunk_size=2000):
+
+        # Write the sheet of the previous date
+        if transfer.date != current_date:
+            if rows:
+                _write_sheet(
+                    workbook, current_date.strftime("%Y-%m-%d"), rows, max_lengths
+                )
+            current_date = transfer.date
+            rows = []
+            max_lengths = list(header_lengths)
+
+        row = get_transfer_row(transfer)
+        _measure_row(max_lengths, row)
+        rows.append(row)
+
+    if rows:
+        _write_sheet(workbook, current_date.strftime("%Y-%m-%d"), rows, max_lengths)
+
+    return _save_workbook(workbook)
+
+
+def iter_keyset(queryset, lookups: list[str], chunk_size: int = 2000):
+    """Iterate the values of a queryset ordered by id, loading each chunk
+    with a "id > last id" query (keyset pagination), so the cost of a
+    chunk does not grow with the rows already exported
+
+    Args:
+        queryset (QuerySet): Rows to export
+        lookups (list[str]): Values to load (id must be the first one)
+        chunk_size (int): Rows loaded per query
+
+    Yields:
+        tuple: Row values
+    """
+
+    queryset = queryset.order_by("id").values_list(*lookups)
+    last_id = None
+    while True:
+        chunk = queryset if last_id is None else queryset.filter(id__gt=last_id)
+        rows = list(chunk[:chunk_size])
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last_id = rows[-1][0]
+
+
+class _Echo:
+    """File-like object returning the written value (csv streaming)"""
+
+    def write(self, value):
+        return value
+
+
+def stream_flat_export(
+    kind: str, queryset, file_format: str, chunk_size: int = 2000
+):
+    """Stream the rows of a sales or transfers queryset as csv (with a
+    header row) or ndjson (one json object per line)
+
+    Args:
+        kind (str): FLAT_EXPORTS key ("sales" or "transfers")
+        queryset (QuerySet): Rows to export
+        file_format (str): "csv" or "ndjson"
+        chunk_size (int): Rows loaded per query
+
+    Yields:
+        str: Export lines
+    """
+
+    _, columns = FLAT_EXPORTS[kind]
+    headers = [header for header, _ in columns]
+    rows = iter_keyset(queryset, [lookup for _, lookup in columns], chunk_size)
+
+    if file_format == "csv":
+        writer = csv.writer(_Echo())
+        yield writer.writerow(headers)
+        for row in rows:
+            yield writer.writerow(row)
+    else:
+        encoder = DjangoJSONEncoder(separators=(",", ":"))
+        for row in rows:
+            yield encoder.encode(dict(zip(headers, row))) + "\n"
+
+
+def get_flat_export_response(
+    kind: str, queryset, file_format: str
+) -> StreamingHttpResponse:
+    """Get a streaming download response of a csv or ndjson export
+
+    Args:
+        kind (str): FLAT_EXPORTS key ("sales" or "transfers")
+        queryset (QuerySet): Rows to export
+        file_format (str): "csv" or "ndjson"
+
+    Returns:
+        StreamingHttpResponse: Export download
+    """
+
+    filename = (
+        f"marco-cabo-{kind}-"
+        f"{timezone.localtime().strftime('%Y%m%d_%H%M%S')}.{file_format}"
+    )
+    response = StreamingHttpResponse(
+        stream_flat_export(kind, queryset, file_format),
+        content_type=FLAT_EXPORT_CONTENT_TYPES[file_format],
+    )
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,224 @@
+import csv
+import io
+import os
+
+import openpyxl
+from django.db.models import Q
+
+from travels import models
+from travels.pricing import diff_prices, sync_prices
+
+PRICING_FILE_FORMATS = ("csv", "xlsx")
+
+# Layout of core/management/commands/pricing.csv (column indexes from 0)
+DEFAULT_PRICING_SPEC = {
+    "header_rows": 2,
+    "zone_column": 0,
+    "location_column": 1,
+    "price_columns": [
+        {"column": 2, "vehicle": "Luxury SUV", "service_type": "One Way"},
+        {"column": 3, "vehicle": "Executive Van", "service_type": "One Way"},
+        {"column": 4, "vehicle": "Sprinter", "service_type": "One Way"},
+        {"column": 6, "vehicle": "Luxury SUV", "service_type": "Round Trip"},
+        {"column": 7, "vehicle": "Executive Van", "service_type": "Round Trip"},
+        {"column": 8, "vehicle": "Sprinter", "service_type": "Round Trip"},
+    ],
+}
+
+# Changes listed in the report (the counts include every change)
+MAX_REPORT_CHANGES = 500
+
+
+def get_file_format(file_name: str) -> str | None:
+    """Get the pricing file format from its extension
+
+    Args:
+        file_name (str): File name
+
+    Returns:
+        str | None: "csv" or "xlsx", or None if not supported
+    """
+
+    file_format = os.path.splitext(file_name)[1].lower().lstrip(".")
+    return file_format if file_format in PRICING_FILE_FORMATS else None
+
+
+def iter_file_rows(file, file_format: str):
+    """Read the rows of a csv or xlsx file one by one
+
+    Args:
+        file (file): Binary file
+        file_format (str): "csv" or "xlsx"
+
+    Yields:
+        tuple: Cell values of a row
+    """
+
+    if file_format == "csv":
+        text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+        try:
+            yield from csv.reader(text)
+        finally:
+            # Keep the binary file open for the caller
+            text.detach()
+    elif file_format == "xlsx":
+        workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+        try:
+            yield from workbook.active.iter_rows(values_only=True)
+        finally:
+            workbook.close()
+    else:
+        raise ValueError(f"Unsupported file format: {file_format}")
+
+
+def get_cell(row: tuple, column: int):
+    return row[column] if column < len(row) else None
+
+
+def clean_cell(value) -> str:
+    return "" if value is None else str(value).strip()
+
+
+def clean_price(value) -> float | None:
+    """Get a price from a cell ("$1,200.00", 1200, ...), None if empty"""
+
+    if isinstance(value, (int, float)):
+        return float(value)
+    value = clean_cell(value).replace("$", "").replace(",", "").strip()
+    return float(value) if value else None
+
+
+def import_pricing(
+    file,
+    file_format: str,
+    spec: dict = None,
+    dry_run: bool = True,
+) -> dict:
+    """Import the prices of a csv or xlsx file, read as a stream
+
+    The file replaces the price of each location for the vehicles and
+    service types of the spec: prices missing from the file are deleted.
+    Nothing is saved in dry run mode or when a row has errors.
+
+    Args:
+        file (file): Binary file
+        file_format (str): "csv" or "xlsx"
+        spec (dict): Columns of the file (DEFAULT_PRICING_SPEC by default):
+            header_rows, zone_column, location_column and price_columns
+            (column, vehicle name and service type name of each price)
+        dry_run (bool): Only report the changes
+
+    Returns:
+        dict: Report with the rows read, the number of created, updated
+            and deleted prices, the changes and the errors
+    """
+
+    # Keys missing from the spec keep the pricing.csv layout
+    spec = {**DEFAULT_PRICING_SPEC, **(spec or {})}
+
+    # Get DB models (one query per table)
+    vehicles = dict(models.Vehicle.objects.values_list("name", "id"))
+    service_types = dict(models.ServiceType.objects.values_list("name", "id"))
+    locations = {
+        (zone_name, location_name): location_id
+        for location_id, location_name, zone_name in (
+            models.Location.objects.values_list("id", "name", "zone__name")
+        )
+    }
+
+    # Resolve the price columns
+    errors = []
+    columns = []
+    for price_column in spec["price_columns"]:
+        vehicle_id = vehicles.get(price_column["vehicle"])
+        service_type_id = service_types.get(price_column["service_type"])
+        if vehicle_id is None or service_type_id is None:
+            errors.append(
+                f"Unknown vehicle or service type: {price_column['vehicle']} "
+                f"- {price_column['service_type']}"
+            )
+            continue
+        columns.append((price_column["column"], vehicle_id, service_type_id))
+
+    # Build the price matrix
+    prices = {}
+    rows = 0
+    for row_number, row in enumerate(iter_file_rows(file, file_format), 1):
+        if row_number <= spec["header_rows"] or not any(row):
+            continue
+        rows += 1
+        zone_name = clean_cell(get_cell(row, spec["zone_column"])).strip(" -")
+        location_name = clean_cell(get_cell(row, spec["location_column"]))
+        location_id = locations.get((zone_name, location_name))
+        if location_id is None:
+            errors.append(
+                f"Row {row_number}: unknown location {zone_name} - {location_name}"
+            )
+            continue
+        for column, vehicle_id, service_type_id in columns:
+            value = get_cell(row, column)
+            try:
+                price = clean_price(value)
+            except ValueError:
+                errors.append(f"Row {row_number}: invalid price {value}")
+                continue
+            if price is not None:
+                prices[(location_id, vehicle_id, service_type_id)] = price
+
+    # Only replace the pricing of the imported columns
+    scope = Q(pk__in=[])
+    for _, vehicle_id, service_type_id in columns:
+        scope |= Q(vehicle_id=vehicle_id, service_type_id=service_type_id)
+
+    if dry_run or errors:
+        diff = diff_prices(prices, scope)
+    else:
+        diff = sync_prices(prices, scope)
+
+    return {
+        "dry_run": dry_run,
+        "applied": not dry_run and not errors,
+        "rows": rows,
+        "created": len(diff["created"]),
+        "updated": len(diff["updated"]),
+        "deleted": len(diff["deleted"]),
+        "changes": get_report_changes(diff, locations, vehicles, service_types),
+        "errors": errors,
+    }
+
+
+def get_report_changes(
+    diff: dict, locations: dict, vehicles: dict, service_types: dict
+) -> list[dict]:
+    """Get the changes of a diff with the names of the rows"""
+
+    location_names = {
+        location_id: f"{zone_name} - {location_name}"
+        for (zone_name, location_name), location_id in locations.items()
+    }
+    vehicle_names = {vehicle_id: name for name, vehicle_id in vehicles.items()}
+    service_type_names = {
+        service_type_id: name for name, service_type_id in service_types.items()
+    }
+
+    def get_change(action, key, old_price, price):
+        location_id, vehicle_id, service_type_id = key
+        return {
+            "action": action,
+            "location": location_names.get(location_id, location_id),
+            "vehicle": vehicle_names.get(vehicle_id, vehicle_id),
+            "service_type": service_type_names.get(
+                service_type_id, service_type_id
+            ),
+            "old_price": old_price,
+            "price": price,
+        }
+
+    changes = []
+    for key, price in diff["created"]:
+        changes.append(get_change("create", key, None, price))
+    for key, old_price, price in diff["updated"]:
+        changes.append(get_change("update", key, old_price, price))
+    for key, old_price in diff["deleted"]:
+        changes.append(get_change("delete", key, old_price, None))
+    return changes[:MAX_REPORT_CHANGES]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('travels', '0038_vehicle_passengers'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletedRecord',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('model', models.CharField(max_length=100, verbose_name='Modelo')),
+                ('object_id', models.IntegerField(verbose_name='ID del objeto')),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Fecha de eliminación')),
+            ],
+            options={
+                'verbose_name': 'Registro eliminado',
+                'verbose_name_plural': 'Registros eliminados',
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('travels', '0039_deletedrecord'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sale',
+            name='payment_link',
+            field=models.URLField(blank=True, max_length=2000, null=True, verbose_name='Link de pago'),
+        ),
+        migrations.AddField(
+            model_name='sale',
+            name='payment_link_status',
+            field=models.CharField(choices=[('pending', 'Pendiente'), ('ready', 'Listo'), ('error', 'Error')], default='pending', max_length=20, verbose_name='Estado del link de pago'),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:54
+
+from django.db import migrations, transaction
+from django.db.models import Case, Count, F, Min, Value, When
+from django.db.models.functions import Lower, Trim
+
+
+def merge_clients(apps, schema_editor, batch_size=500):
+    # Frozen copy of travels.clients.merge_duplicate_clients
+    Client = apps.get_model('travels', 'Client')
+    Sale = apps.get_model('travels', 'Sale')
+    email_key = Lower(Trim('email'))
+
+    # Get duplicated emails (with the client to keep, the oldest)
+    duplicated = list(
+        Client.objects.annotate(email_key=email_key)
+        .values('email_key')
+        .annotate(clients=Count('id'), keep_id=Min('id'))
+        .filter(clients__gt=1)
+        .values_list('email_key', 'keep_id')
+        .order_by('email_key')
+    )
+
+    for start in range(0, len(duplicated), batch_size):
+        keep_ids = dict(duplicated[start : start + batch_size])
+
+        with transaction.atomic():
+            clients = (
+                Client.objects.annotate(email_key=email_key)
+                .filter(email_key__in=keep_ids.keys())
+                .order_by('id')
+            )
+
+            # Map duplicates to the client to keep, filling its missing data
+            keep_clients = {}
+            duplicates = {}
+            for client in clients:
+                keep_id = keep_ids[client.email_key]
+                if client.id == keep_id:
+                    keep_clients[keep_id] = client
+                    continue
+                duplicates[client.id] = keep_id
+                keep_client = keep_clients[keep_id]
+                keep_client.last_name = client.last_name or keep_client.last_name
+                keep_client.phone = client.phone or keep_client.phone
+
+            # Move sales to the clients kept (single update)
+            Sale.objects.filter(client_id__in=duplicates.keys()).update(
+                client_id=Case(
+                    *[
+                        When(client_id=duplicate_id, then=Value(keep_id))
+                        for duplicate_id, keep_id in duplicates.items()
+                    ]
+                )
+            )
+
+            Client.objects.bulk_update(keep_clients.values(), ['last_name', 'phone'])
+            Client.objects.filter(id__in=duplicates.keys()).delete()
+
+    # Normalize the remaining emails
+    Client.objects.annotate(email_key=email_key).exclude(
+        email=F('email_key')
+    ).update(email=email_key)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('travels', '0040_sale_payment_link_sale_payment_link_status'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_clients, migrations.RunPython.noop),
+    ]
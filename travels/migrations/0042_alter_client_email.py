@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('travels', '0041_merge_duplicate_clients'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='client',
+            name='email',
+            field=models.EmailField(max_length=254, unique=True, verbose_name='Correo'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:01
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import travels.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('travels', '0042_alter_client_email'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('running', 'En proceso'), ('done', 'Terminado'), ('error', 'Error')], default='pending', max_length=20, verbose_name='Estado')),
+                ('sale_ids', models.JSONField(default=list, verbose_name='Ventas')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Total')),
+                ('processed', models.PositiveIntegerField(default=0, verbose_name='Procesadas')),
+                ('file', models.FileField(blank=True, null=True, storage=travels.models.get_private_storage, upload_to='exports/', verbose_name='Archivo')),
+                ('error', models.TextField(blank=True, null=True, verbose_name='Error')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Fecha de actualización')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Exportación',
+                'verbose_name_plural': 'Exportaciones',
+            },
+        ),
+    ]
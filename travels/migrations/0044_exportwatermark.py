@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('travels', '0043_exportjob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sale',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Fecha de actualización'),
+        ),
+        migrations.CreateModel(
+            name='ExportWatermark',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('destination', models.CharField(max_length=100, verbose_name='Destino')),
+                ('exported_until', models.DateTimeField(verbose_name='Exportado hasta')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Fecha de actualización')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Marca de exportación',
+                'verbose_name_plural': 'Marcas de exportación',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='exportwatermark',
+            constraint=models.UniqueConstraint(fields=('user', 'destination'), name='unique_export_watermark'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:17
+
+from django.db import migrations, models
+
+# Trigram indexes for the admin "contains" search on Postgres, built on the
+# same expression the icontains lookup compares: UPPER(column::text)
+TRIGRAM_INDEXES = (
+    ('travels_client_name_trgm', 'travels_client', 'name'),
+    ('travels_client_last_name_trgm', 'travels_client', 'last_name'),
+    ('travels_client_email_trgm', 'travels_client', 'email'),
+    ('travels_location_name_trgm', 'travels_location', 'name'),
+    ('travels_vehicle_name_trgm', 'travels_vehicle', 'name'),
+)
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for index, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {index} ON {table} '
+            f'USING gin ((UPPER({column}::text)) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for index, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {index}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('travels', '0044_exportwatermark'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='client',
+            name='last_name',
+            field=models.CharField(blank=True, db_index=True, max_length=100, null=True, verbose_name='Apellido'),
+        ),
+        migrations.AlterField(
+            model_name='client',
+            name='name',
+            field=models.CharField(db_index=True, max_length=100, verbose_name='Nombre'),
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:24
+
+from django.conf import settings
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+import travels.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('travels', '0045_client_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PricingImport',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('file', models.FileField(help_text='Archivo csv o xlsx', storage=travels.models.get_private_storage, upload_to='imports/', validators=[django.core.validators.FileExtensionValidator(['csv', 'xlsx'])], verbose_name='Archivo')),
+                ('spec', models.JSONField(blank=True, default=dict, help_text='Vacío para usar el formato de pricing.csv', verbose_name='Columnas')),
+                ('dry_run', models.BooleanField(default=True, help_text='Mostrar los cambios sin guardarlos', verbose_name='Solo simular')),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('running', 'En proceso'), ('done', 'Terminado'), ('error', 'Error')], default='pending', max_length=20, verbose_name='Estado')),
+                ('report', models.JSONField(blank=True, null=True, verbose_name='Reporte')),
+                ('error', models.TextField(blank=True, null=True, verbose_name='Error')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Fecha de actualización')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Importación de precios',
+                'verbose_name_plural': 'Importaciones de precios',
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('travels', '0046_pricingimport'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='pricing',
+            options={'verbose_name': 'Precio por ubicación', 'verbose_name_plural': 'Precios por ubicación'},
+        ),
+        migrations.CreateModel(
+            name='ZonePricing',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('price', models.FloatField(verbose_name='Precio')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Fecha de actualización')),
+                ('service_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='travels.servicetype', verbose_name='Tipo de Servicio')),
+                ('vehicle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='travels.vehicle', verbose_name='Vehículo')),
+                ('zone', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='travels.zone', verbose_name='Zona')),
+            ],
+            options={
+                'verbose_name': 'Precio por zona',
+                'verbose_name_plural': 'Precios por zona',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='zonepricing',
+            constraint=models.UniqueConstraint(fields=('zone', 'vehicle', 'service_type'), name='unique_zone_pricing'),
+        ),
+    ]
@@ -0,0 +1,146 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:40
+
+from collections import Counter
+
+from django.db import migrations
+
+
+# Frozen copies of travels.catalog.get_zone_locations and compress_prices
+def get_zone_locations(locations):
+    """Group location ids by zone"""
+
+    zone_locations = {}
+    for location_id, zone_id in locations:
+        zone_locations.setdefault(zone_id, []).append(location_id)
+    return zone_locations
+
+
+def compress_prices(prices, zone_locations):
+    """Split the prices of each location in zone default prices (when all
+    the locations of the zone have a price, the most common one) and the
+    location prices that differ from them"""
+
+    location_zones = {
+        location_id: zone_id
+        for zone_id, location_ids in zone_locations.items()
+        for location_id in location_ids
+    }
+
+    # Group prices by zone, vehicle and service type
+    groups = {}
+    location_prices = {}
+    for key, price in prices.items():
+        location_id, vehicle_id, service_type_id = key
+        zone_id = location_zones.get(location_id)
+        if zone_id is None:
+            location_prices[key] = price
+            continue
+        groups.setdefault((zone_id, vehicle_id, service_type_id), {})[
+            location_id
+        ] = price
+
+    zone_prices = {}
+    for zone_key, group in groups.items():
+        zone_id, vehicle_id, service_type_id = zone_key
+        if len(group) == len(zone_locations[zone_id]):
+            # Most common price (the lowest one on ties)
+            counts = Counter(group.values())
+            default = min(counts, key=lambda price: (-counts[price], price))
+            zone_prices[zone_key] = default
+        else:
+            default = None
+
+        for location_id, price in group.items():
+            if price != default:
+                location_prices[(location_id, vehicle_id, service_type_id)] = price
+
+    return zone_prices, location_prices
+
+
+def compress_pricing(apps, schema_editor):
+    """Move the prices shared by all the locations of a zone to zone prices"""
+
+    Location = apps.get_model('travels', 'Location')
+    Pricing = apps.get_model('travels', 'Pricing')
+    ZonePricing = apps.get_model('travels', 'ZonePricing')
+    DeletedRecord = apps.get_model('travels', 'DeletedRecord')
+
+    # Current prices (the last row of duplicated prices wins)
+    prices = {}
+    pricing_ids = {}
+    for pricing_id, location_id, vehicle_id, service_type_id, price in (
+        Pricing.objects.values_list(
+            'id', 'location_id', 'vehicle_id', 'service_type_id', 'price'
+        ).order_by('id')
+    ):
+        key = (location_id, vehicle_id, service_type_id)
+        prices[key] = price
+        pricing_ids[key] = pricing_id
+
+    zone_prices, location_prices = compress_prices(
+        prices, get_zone_locations(Location.objects.values_list('id', 'zone_id'))
+    )
+    ZonePricing.objects.bulk_create(
+        [
+            ZonePricing(
+                zone_id=zone_id,
+                vehicle_id=vehicle_id,
+                service_type_id=service_type_id,
+                price=price,
+            )
+            for (zone_id, vehicle_id, service_type_id), price in zone_prices.items()
+        ],
+        batch_size=500,
+    )
+
+    # Delete the location prices now given by the zone (with tombstones
+    # for delta syncs)
+    kept_ids = {pricing_ids[key] for key in location_prices}
+    deleted_ids = list(
+        Pricing.objects.exclude(id__in=kept_ids).values_list('id', flat=True)
+    )
+    DeletedRecord.objects.bulk_create(
+        [DeletedRecord(model='pricing', object_id=pricing_id) for pricing_id in deleted_ids],
+        batch_size=500,
+    )
+    Pricing.objects.filter(id__in=deleted_ids).delete()
+
+
+def expand_pricing(apps, schema_editor):
+    """Copy the zone prices to the locations without their own price"""
+
+    Location = apps.get_model('travels', 'Location')
+    Pricing = apps.get_model('travels', 'Pricing')
+    ZonePricing = apps.get_model('travels', 'ZonePricing')
+
+    zone_locations = get_zone_locations(Location.objects.values_list('id', 'zone_id'))
+    existing = set(
+        Pricing.objects.values_list('location_id', 'vehicle_id', 'service_type_id')
+    )
+    Pricing.objects.bulk_create(
+        [
+            Pricing(
+                location_id=location_id,
+                vehicle_id=zone_pricing.vehicle_id,
+                service_type_id=zone_pricing.service_type_id,
+                price=zone_pricing.price,
+            )
+            for zone_pricing in ZonePricing.objects.all()
+            for location_id in zone_locations.get(zone_pricing.zone_id, [])
+            if (location_id, zone_pricing.vehicle_id, zone_pricing.service_type_id)
+            not in existing
+        ],
+        batch_size=500,
+    )
+    ZonePricing.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('travels', '0047_zonepricing'),
+    ]
+
+    operations = [
+        migrations.RunPython(compress_pricing, expand_pricing),
+    ]
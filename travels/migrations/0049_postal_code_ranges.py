@@ -0,0 +1,76 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:41
+
+import re
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_postal_code_ranges(apps, schema_editor):
+    """Compress the postal code locations to postal code ranges: adjacent
+    postal codes with the same locations, a row per location"""
+
+    Location = apps.get_model('travels', 'Location')
+    PostalCodeRange = apps.get_model('travels', 'PostalCodeRange')
+
+    # Locations of each postal code ("<postal code>, <neighborhood>")
+    code_locations = {}
+    for location_id, name in Location.objects.filter(
+        zone__name='Codigo Postal'
+    ).values_list('id', 'name'):
+        match = re.match(r'^\s*(\d{5})\b', name)
+        if match:
+            code_locations.setdefault(match.group(1), set()).add(location_id)
+
+    ranges = []
+    for code in sorted(code_locations):
+        location_ids = code_locations[code]
+        if ranges:
+            start, end, last_location_ids = ranges[-1]
+            if int(code) == int(end) + 1 and location_ids == last_location_ids:
+                ranges[-1] = (start, code, location_ids)
+                continue
+        ranges.append((code, code, location_ids))
+
+    PostalCodeRange.objects.bulk_create(
+        [
+            PostalCodeRange(start=start, end=end, location_id=location_id)
+            for start, end, location_ids in ranges
+            for location_id in sorted(location_ids)
+        ]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('travels', '0048_compress_pricing'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostalCodeRange',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('start', models.CharField(max_length=5, validators=[django.core.validators.RegexValidator('^\\d{5}$', 'El código postal debe tener 5 dígitos')], verbose_name='Código postal inicial')),
+                ('end', models.CharField(max_length=5, validators=[django.core.validators.RegexValidator('^\\d{5}$', 'El código postal debe tener 5 dígitos')], verbose_name='Código postal final')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Fecha de actualización')),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='travels.location', verbose_name='Ubicación')),
+            ],
+            options={
+                'verbose_name': 'Rango de códigos postales',
+                'verbose_name_plural': 'Rangos de códigos postales',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='postalcoderange',
+            constraint=models.CheckConstraint(check=models.Q(('start__lte', models.F('end'))), name='postal_code_range_start_lte_end'),
+        ),
+        migrations.AddConstraint(
+            model_name='postalcoderange',
+            constraint=models.UniqueConstraint(fields=('start', 'location'), name='unique_postal_code_range_location'),
+        ),
+        migrations.RunPython(create_postal_code_ranges, migrations.RunPython.noop),
+    ]
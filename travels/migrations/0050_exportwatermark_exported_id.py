@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('travels', '0049_postal_code_ranges'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportwatermark',
+            name='exported_id',
+            field=models.IntegerField(default=0, verbose_name='Última venta exportada'),
+        ),
+    ]
@@ -0,0 +1,104 @@
+# Generated by Django 4.2.7 on 2026-10-17 21:05
+
+import re
+
+from django.db import migrations
+
+
+def build_price_ranges(apps, schema_editor):
+    """Merge the consecutive postal codes with the same prices in a single
+    range (frozen copy of travels.postal_codes.sync_postal_code_ranges)"""
+
+    Location = apps.get_model('travels', 'Location')
+    Pricing = apps.get_model('travels', 'Pricing')
+    ZonePricing = apps.get_model('travels', 'ZonePricing')
+    PostalCodeRange = apps.get_model('travels', 'PostalCodeRange')
+    DeletedRecord = apps.get_model('travels', 'DeletedRecord')
+
+    locations = list(
+        Location.objects.filter(zone__name='Codigo Postal').values_list(
+            'id', 'name', 'zone_id'
+        )
+    )
+
+    # Prices of each location: its own price, or the price of its zone
+    zone_prices = {}
+    for zone_id, vehicle_id, service_type_id, price in ZonePricing.objects.filter(
+        zone_id__in={zone_id for _, _, zone_id in locations}
+    ).values_list('zone_id', 'vehicle_id', 'service_type_id', 'price'):
+        zone_prices.setdefault(zone_id, {})[(vehicle_id, service_type_id)] = price
+    location_prices = {
+        location_id: dict(zone_prices.get(zone_id, {}))
+        for location_id, _, zone_id in locations
+    }
+    for location_id, vehicle_id, service_type_id, price in Pricing.objects.filter(
+        location_id__in=location_prices
+    ).values_list('location_id', 'vehicle_id', 'service_type_id', 'price'):
+        location_prices[location_id][(vehicle_id, service_type_id)] = price
+
+    # Location of each pricing result of each postal code (the first one)
+    code_results = {}
+    for location_id, name, _ in sorted(locations):
+        match = re.match(r'^\s*(\d{5})\b', name)
+        if match:
+            result = frozenset(
+                (vehicle_id, service_type_id, price)
+                for (vehicle_id, service_type_id), price in location_prices[
+                    location_id
+                ].items()
+            )
+            code_results.setdefault(match.group(1), {}).setdefault(
+                result, location_id
+            )
+
+    # Merge consecutive postal codes with the same pricing results
+    ranges = []
+    for code in sorted(code_results):
+        results = code_results[code]
+        if ranges:
+            start, _, last_results = ranges[-1]
+            if results.keys() == last_results.keys():
+                ranges[-1] = (start, code, last_results)
+                continue
+        ranges.append((code, code, results))
+    desired = {
+        (start, end, location_id)
+        for start, end, results in ranges
+        for location_id in results.values()
+    }
+
+    # Only write the rows that change (with tombstones for delta syncs)
+    current = {
+        (start, end, location_id): range_id
+        for range_id, start, end, location_id in PostalCodeRange.objects.values_list(
+            'id', 'start', 'end', 'location_id'
+        )
+    }
+    deleted_ids = [
+        range_id for key, range_id in current.items() if key not in desired
+    ]
+    DeletedRecord.objects.bulk_create(
+        [
+            DeletedRecord(model='postalcoderange', object_id=range_id)
+            for range_id in deleted_ids
+        ],
+        batch_size=500,
+    )
+    PostalCodeRange.objects.filter(id__in=deleted_ids).delete()
+    PostalCodeRange.objects.bulk_create(
+        [
+            PostalCodeRange(start=start, end=end, location_id=location_id)
+            for start, end, location_id in sorted(desired - current.keys())
+        ]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('travels', '0051_catalogversion'),
+    ]
+
+    operations = [
+        migrations.RunPython(build_price_ranges, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,13 @@
 import uuid
 
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.exceptions import ValidationError
+from django.core.validators import FileExtensionValidator, RegexValidator
 from django.db import models
+from django.utils.module_loading import import_string
+
+from travels.clients import normalize_email
 
 
 class Zone(models.Model):
@@ -22,8 +29,8 @@ class Zone(models.Model):
 
     @property
     def locations(self):
-        locations_match = Location.objects.filter(zone=self)
-        return locations_match
+        # Uses the prefetched locations when available
+        return self.location_set.all()
 
 
 class Location(models.Model):
@@ -48,14 +55,15 @@ class Location(models.Model):
 
 class Client(models.Model):
     id = models.AutoField(primary_key=True)
-    name = models.CharField(max_length=100, verbose_name="Nombre")
+    name = models.CharField(max_length=100, db_index=True, verbose_name="Nombre")
     last_name = models.CharField(
         max_length=100,
+        db_index=True,
         verbose_name="Apellido",
         null=True,
         blank=True,
     )
-    email = models.EmailField(verbose_name="Correo")
+    email = models.EmailField(unique=True, verbose_name="Correo")
     phone = models.CharField(
         max_length=15,
         verbose_name="Teléfono",
@@ -72,6 +80,17 @@ class Client(models.Model):
     def __str__(self):
         return f"{self.email} - {self.phone}"
 
+    def clean(self):
+        # Normalized before the unique validation of forms, so the same
+        # email in another case is a form error
+        if self.email:
+            self.email = normalize_email(self.email)
+
+    def save(self, *args, **kwargs):
+        # Clients are matched by normalized email
+        self.email = normalize_email(self.email)
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = "Cliente"
         verbose_name_plural = "Clientes"
@@ -134,6 +153,14 @@ class ServiceType(models.Model):
 
 
 class Sale(models.Model):
+    # Options
+    PAYMENT_LINK_STATUS_OPTIONS = (
+        ("pending", "Pendiente"),
+        ("ready", "Listo"),
+        ("error", "Error"),
+    )
+
+    # Fields
     id = models.AutoField(primary_key=True)
     client = models.ForeignKey(Client, on_delete=models.CASCADE, verbose_name="Cliente")
     vehicle = models.ForeignKey(
@@ -157,7 +184,7 @@ class Sale(models.Model):
         auto_now_add=True, verbose_name="Fecha de creación"
     )
     updated_at = models.DateTimeField(
-        auto_now=True, verbose_name="Fecha de actualización"
+        auto_now=True, db_index=True, verbose_name="Fecha de actualización"
     )
     stripe_code = models.UUIDField(
         default=uuid.uuid4,
@@ -167,6 +194,15 @@ class Sale(models.Model):
     )
     total = models.FloatField(verbose_name="Total")
     paid = models.BooleanField(default=False, verbose_name="Pagado")
+    payment_link = models.URLField(
+        max_length=2000, null=True, blank=True, verbose_name="Link de pago"
+    )
+    payment_link_status = models.CharField(
+        max_length=20,
+        choices=PAYMENT_LINK_STATUS_OPTIONS,
+        default="pending",
+        verbose_name="Estado del link de pago",
+    )
 
     def __str__(self):
         return f"{self.client} - {self.vehicle.name} - {self.created_at}"
@@ -245,5 +281,298 @@ class Pricing(models.Model):
         return f"{self.location.name} - {self.price}"
 
     class Meta:
-        verbose_name = "Precio"
-        verbose_name_plural = "Precios"
\ No newline at end of file
+        verbose_name = "Precio por ubicación"
+        verbose_name_plural = "Precios por ubicación"
+
+
+class ZonePricing(models.Model):
+    """Default price of the locations of a zone (locations with a Pricing
+    row for the same vehicle and service type use that price instead)"""
+
+    id = models.AutoField(primary_key=True)
+    zone = models.ForeignKey(Zone, on_delete=models.CASCADE, verbose_name="Zona")
+    vehicle = models.ForeignKey(
+        Vehicle, on_delete=models.CASCADE, verbose_name="Vehículo"
+    )
+    service_type = models.ForeignKey(
+        ServiceType, on_delete=models.CASCADE, verbose_name="Tipo de Servicio"
+    )
+    price = models.FloatField(verbose_name="Precio")
+    created_at = models.DateTimeField(
+        auto_now_add=True, verbose_name="Fecha de creación"
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True, verbose_name="Fecha de actualización"
+    )
+
+    def __str__(self):
+        return f"{self.zone.name} - {self.price}"
+
+    class Meta:
+        verbose_name = "Precio por zona"
+        verbose_name_plural = "Precios por zona"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["zone", "vehicle", "service_type"],
+                name="unique_zone_pricing",
+            )
+        ]
+
+
+class PostalCodeRange(models.Model):
+    """Range of postal codes (from start to end, both included) with the
+    prices of a location. Built from the postal code locations: consecutive
+    postal codes with the same prices share a range, and a range whose
+    locations have different prices has a row per price (a location of
+    each), all with the same start and end"""
+
+    postal_code_validator = RegexValidator(
+        r"^\d{5}$", "El código postal debe tener 5 dígitos"
+    )
+
+    id = models.AutoField(primary_key=True)
+    start = models.CharField(
+        max_length=5,
+        validators=[postal_code_validator],
+        verbose_name="Código postal inicial",
+    )
+    end = models.CharField(
+        max_length=5,
+        validators=[postal_code_validator],
+        verbose_name="Código postal final",
+    )
+    location = models.ForeignKey(
+        Location, on_delete=models.CASCADE, verbose_name="Ubicación"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True, verbose_name="Fecha de creación"
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True, verbose_name="Fecha de actualización"
+    )
+
+    def __str__(self):
+        return f"{self.start} - {self.end}"
+
+    def clean(self):
+        if not self.start or not self.end:
+            return
+
+        if self.start > self.end:
+            raise ValidationError(
+                {"end": "El código final debe ser mayor o igual al inicial"}
+            )
+
+        # Ranges can only overlap with the same range (other prices)
+        overlapping = (
+            PostalCodeRange.objects.filter(start__lte=self.end, end__gte=self.start)
+            .exclude(pk=self.pk)
+            .exclude(start=self.start, end=self.end)
+            .first()
+        )
+        if overlapping is not None:
+            raise ValidationError(f"El rango se cruza con el rango {overlapping}")
+
+    class Meta:
+        verbose_name = "Rango de códigos postales"
+        verbose_name_plural = "Rangos de códigos postales"
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(start__lte=models.F("end")),
+                name="postal_code_range_start_lte_end",
+            ),
+            models.UniqueConstraint(
+                fields=["start", "location"],
+                name="unique_postal_code_range_location",
+            ),
+        ]
+
+
+class CatalogVersion(models.Model):
+    """Current version of the catalog tables (a single row), changed on
+    every catalog change so every process reloads its catalog snapshot"""
+
+    id = models.AutoField(primary_key=True)
+    version = models.CharField(max_length=32, verbose_name="Versión")
+    updated_at = models.DateTimeField(
+        auto_now=True, verbose_name="Fecha de actualización"
+    )
+
+    def __str__(self):
+        return self.version
+
+    class Meta:
+        verbose_name = "Versión del catálogo"
+        verbose_name_plural = "Versiones del catálogo"
+
+
+class DeletedRecord(models.Model):
+    """Deletion log of catalog tables, used to sync deletes to clients"""
+
+    id = models.AutoField(primary_key=True)
+    model = models.CharField(max_length=100, verbose_name="Modelo")
+    object_id = models.IntegerField(verbose_name="ID del objeto")
+    deleted_at = models.DateTimeField(
+        auto_now_add=True, db_index=True, verbose_name="Fecha de eliminación"
+    )
+
+    def __str__(self):
+        return f"{self.model} - {self.object_id} - {self.deleted_at}"
+
+    class Meta:
+        verbose_name = "Registro eliminado"
+        verbose_name_plural = "Registros eliminados"
+
+
+def get_private_storage():
+    """Storage of private files: private S3 bucket folder with STORAGE_AWS,
+    local MEDIA_ROOT otherwise"""
+    if settings.STORAGE_AWS:
+        return import_string(settings.PRIVATE_FILE_STORAGE)()
+    return default_storage
+
+
+class ExportJob(models.Model):
+    """Sales export generated in background"""
+
+    # Options
+    STATUS_OPTIONS = (
+        ("pending", "Pendiente"),
+        ("running", "En proceso"),
+        ("done", "Terminado"),
+        ("error", "Error"),
+    )
+
+    # Fields
+    id = models.AutoField(primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name="Usuario",
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_OPTIONS,
+        default="pending",
+        verbose_name="Estado",
+    )
+    sale_ids = models.JSONField(default=list, verbose_name="Ventas")
+    total = models.PositiveIntegerField(default=0, verbose_name="Total")
+    processed = models.PositiveIntegerField(default=0, verbose_name="Procesadas")
+    file = models.FileField(
+        upload_to="exports/",
+        storage=get_private_storage,
+        null=True,
+        blank=True,
+        verbose_name="Archivo",
+    )
+    error = models.TextField(null=True, blank=True, verbose_name="Error")
+    created_at = models.DateTimeField(
+        auto_now_add=True, verbose_name="Fecha de creación"
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True, verbose_name="Fecha de actualización"
+    )
+
+    def __str__(self):
+        return f"Exportación {self.id} - {self.get_status_display()}"
+
+    class Meta:
+        verbose_name = "Exportación"
+        verbose_name_plural = "Exportaciones"
+
+
+class PricingImport(models.Model):
+    """Pricing file imported in background"""
+
+    # Options
+    STATUS_OPTIONS = (
+        ("pending", "Pendiente"),
+        ("running", "En proceso"),
+        ("done", "Terminado"),
+        ("error", "Error"),
+    )
+
+    # Fields
+    id = models.AutoField(primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name="Usuario",
+    )
+    file = models.FileField(
+        upload_to="imports/",
+        storage=get_private_storage,
+        validators=[FileExtensionValidator(["csv", "xlsx"])],
+        verbose_name="Archivo",
+        help_text="Archivo csv o xlsx",
+    )
+    spec = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name="Columnas",
+        help_text="Vacío para usar el formato de pricing.csv",
+    )
+    dry_run = models.BooleanField(
+        default=True,
+        verbose_name="Solo simular",
+        help_text="Mostrar los cambios sin guardarlos",
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_OPTIONS,
+        default="pending",
+        verbose_name="Estado",
+    )
+    report = models.JSONField(null=True, blank=True, verbose_name="Reporte")
+    error = models.TextField(null=True, blank=True, verbose_name="Error")
+    created_at = models.DateTimeField(
+        auto_now_add=True, verbose_name="Fecha de creación"
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True, verbose_name="Fecha de actualización"
+    )
+
+    def __str__(self):
+        return f"Importación {self.id} - {self.get_status_display()}"
+
+    class Meta:
+        verbose_name = "Importación de precios"
+        verbose_name_plural = "Importaciones de precios"
+
+
+class ExportWatermark(models.Model):
+    """Last incremental export of sales of a user to a destination"""
+
+    id = models.AutoField(primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, verbose_name="Usuario"
+    )
+    destination = models.CharField(max_length=100, verbose_name="Destino")
+    # Keyset cursor: (updated_at, id) of the last exported sale
+    exported_until = models.DateTimeField(verbose_name="Exportado hasta")
+    exported_id = models.IntegerField(
+        default=0, verbose_name="Última venta exportada"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True, verbose_name="Fecha de creación"
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True, verbose_name="Fecha de actualización"
+    )
+
+    def __str__(self):
+        return f"{self.user} - {self.destination} - {self.exported_until}"
+
+    class Meta:
+        verbose_name = "Marca de exportación"
+        verbose_name_plural = "Marcas de exportación"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "destination"], name="unique_export_watermark"
+            )
+        ]
@@ -0,0 +1,177 @@
+import re
+
+from django.db import transaction
+
+from travels import models
+from travels.catalog import (
+    delete_catalog_rows,
+    get_zone_locations,
+    invalidate_catalog,
+    resolve_prices,
+)
+
+POSTAL_CODE_ZONE = "Codigo Postal"
+
+# Postal code locations are named "<postal code>, <neighborhood>"
+POSTAL_CODE_NAME_RE = re.compile(r"^\s*(\d{5})\b")
+
+
+def get_location_postal_code(name: str) -> str | None:
+    """Get the postal code of a postal code location name
+
+    Args:
+        name (str): Location name, like "23400, San Jose Downtown"
+
+    Returns:
+        str | None: Postal code, or None if the name has no postal code
+    """
+
+    match = POSTAL_CODE_NAME_RE.match(name)
+    return match.group(1) if match else None
+
+
+def build_postal_code_ranges(locations, prices: dict) -> list[tuple]:
+    """Compress postal code locations to ranges of postal codes with the
+    same prices
+
+    Consecutive postal codes (of the ones with locations) whose locations
+    have the same prices are merged in a single range, mapped to a
+    location with those prices: the postal codes between them (without
+    locations) get the prices of the range too. A postal code whose
+    locations have different prices gets a row per price.
+
+    Args:
+        locations (iterable): (location id, location name) pairs
+        prices (dict): Price by (location id, vehicle id, service type id)
+
+    Returns:
+        list[tuple]: (start, end, location id) rows, sorted by start and
+            location id
+    """
+
+    # Prices of each location
+    location_prices = {}
+    for (location_id, vehicle_id, service_type_id), price in prices.items():
+        location_prices.setdefault(location_id, set()).add(
+            (vehicle_id, service_type_id, price)
+        )
+
+    # Location of each pricing result of each postal code (the first one)
+    code_results = {}
+    for location_id, name in sorted(locations):
+        code = get_location_postal_code(name)
+        if code is not None:
+            result = frozenset(location_prices.get(location_id, ()))
+            code_results.setdefault(code, {}).setdefault(result, location_id)
+
+    ranges = []
+    for code in sorted(code_results):
+        results = code_results[code]
+        if ranges:
+            start, _, last_results = ranges[-1]
+            if results.keys() == last_results.keys():
+                ranges[-1] = (start, code, last_results)
+                continue
+        ranges.append((code, code, results))
+
+    return sorted(
+        (start, end, location_id)
+        for start, end, results in ranges
+        for location_id in results.values()
+    )
+
+
+def get_postal_code_ranges() -> list[tuple]:
+    """Build the postal code ranges of the current postal code locations
+    and their prices (own or zone prices)
+
+    Returns:
+        list[tuple]: (start, end, location id) rows
+    """
+
+    locations = list(
+        models.Location.objects.filter(zone__name=POSTAL_CODE_ZONE).values_list(
+            "id", "name", "zone_id"
+        )
+    )
+    location_ids = [location_id for location_id, _, _ in locations]
+    zone_ids = {zone_id for _, _, zone_id in locations}
+
+    prices = resolve_prices(
+        {
+            (zone_id, vehicle_id, service_type_id): price
+            for (
+                zone_id,
+                vehicle_id,
+                service_type_id,
+                price,
+            ) in models.ZonePricing.objects.filter(zone_id__in=zone_ids).values_list(
+                "zone_id", "vehicle_id", "service_type_id", "price"
+            )
+        },
+        {
+            (location_id, vehicle_id, service_type_id): price
+            for (
+                location_id,
+                vehicle_id,
+                service_type_id,
+                price,
+            ) in models.Pricing.objects.filter(
+                location_id__in=location_ids
+            ).values_list("location_id", "vehicle_id", "service_type_id", "price")
+        },
+        get_zone_locations(
+            (location_id, zone_id) for location_id, _, zone_id in locations
+        ),
+    )
+    return build_postal_code_ranges(
+        [(location_id, name) for location_id, name, _ in locations], prices
+    )
+
+
+def sync_postal_code_ranges() -> dict:
+    """Make the postal code ranges match the current postal code locations
+    and their prices in one transaction, only writing the rows that change
+
+    Returns:
+        dict: Number of range rows, and of rows created and deleted
+    """
+
+    ranges = set(get_postal_code_ranges())
+
+    with transaction.atomic():
+        current = {
+            (start, end, location_id): range_id
+            for range_id, start, end, location_id in (
+                models.PostalCodeRange.objects.select_for_update().values_list(
+                    "id", "start", "end", "location_id"
+                )
+            )
+        }
+        deleted_ids = [
+            range_id for key, range_id in current.items() if key not in ranges
+        ]
+        created = sorted(ranges - current.keys())
+
+        # Rows first deleted, so the new ones can reuse their start
+        delete_catalog_rows(models.PostalCodeRange, deleted_ids)
+        models.PostalCodeRange.objects.bulk_create(
+            [
+                models.PostalCodeRange(start=start, end=end, location_id=location_id)
+                for start, end, location_id in created
+            ]
+        )
+        if created:
+            invalidate_catalog()
+
+    return {
+        "ranges": len(ranges),
+        "created": len(created),
+        "deleted": len(deleted_ids),
+    }
+
+
+def sync_postal_code_ranges_on_commit():
+    """Sync the postal code ranges once the current transaction is
+    committed (after the prices or the locations changed)"""
+    transaction.on_commit(sync_postal_code_ranges)
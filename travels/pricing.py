@@ -0,0 +1,384 @@
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Round
+from django.utils import timezone
+
+from travels import models
+from travels.catalog import (
+    compress_prices,
+    delete_catalog_rows,
+    get_zone_locations,
+    invalidate_catalog,
+    resolve_prices,
+)
+from travels.postal_codes import sync_postal_code_ranges_on_commit
+
+
+def get_price_grid(zone: models.Zone = None) -> dict:
+    """Get the pricing as a grid: a row per zone (its default prices) and
+    per location, and a column per (vehicle, service type) pair
+
+    Args:
+        zone (models.Zone): Only include this zone
+
+    Returns:
+        dict: columns (vehicle and service type names) and zones (name,
+            default cells and location rows). Each cell has its input
+            name, its price and if it is a location price
+    """
+
+    zone_scope = Q()
+    location_scope = Q()
+    locations = models.Location.objects.all()
+    if zone is not None:
+        zone_scope = Q(zone=zone)
+        location_scope = Q(location__zone=zone)
+        locations = locations.filter(zone=zone)
+    zone_prices = _get_prices(models.ZonePricing, "zone_id", zone_scope)
+    location_prices = _get_prices(models.Pricing, "location_id", location_scope)
+
+    # Columns sorted by vehicle and service type names
+    vehicle_names = dict(models.Vehicle.objects.values_list("id", "name"))
+    service_type_names = dict(models.ServiceType.objects.values_list("id", "name"))
+    columns = sorted(
+        {key[1:] for key in zone_prices} | {key[1:] for key in location_prices},
+        key=lambda column: (vehicle_names[column[0]], service_type_names[column[1]]),
+    )
+
+    # Locations grouped by zone
+    zones = {}
+    location_rows = locations.values_list(
+        "id", "name", "zone_id", "zone__name"
+    ).order_by("zone__name", "name", "id")
+    for location_id, location_name, zone_id, zone_name in location_rows:
+        zones.setdefault(zone_id, {"id": zone_id, "name": zone_name, "rows": []})[
+            "rows"
+        ].append({"id": location_id, "name": location_name})
+    prices = resolve_prices(
+        zone_prices,
+        location_prices,
+        get_zone_locations(
+            (row["id"], zone_id)
+            for zone_id, zone_row in zones.items()
+            for row in zone_row["rows"]
+        ),
+    )
+
+    # Cells
+    for zone_id, zone_row in zones.items():
+        zone_row["defaults"] = [
+            {
+                "name": f"zone-{zone_id}-{vehicle_id}-{service_type_id}",
+                "price": zone_prices.get((zone_id, vehicle_id, service_type_id)),
+            }
+            for vehicle_id, service_type_id in columns
+        ]
+        for row in zone_row["rows"]:
+            row["cells"] = [
+                {
+                    "name": f"price-{row['id']}-{vehicle_id}-{service_type_id}",
+                    "price": prices.get((row["id"], vehicle_id, service_type_id)),
+                    "override": (row["id"], vehicle_id, service_type_id)
+                    in location_prices,
+                }
+                for vehicle_id, service_type_id in columns
+            ]
+
+    return {
+        "columns": [
+            {
+                "vehicle": vehicle_names[vehicle_id],
+                "service_type": service_type_names[service_type_id],
+            }
+            for vehicle_id, service_type_id in columns
+        ],
+        "zones": list(zones.values()),
+    }
+
+
+def update_prices(zone_prices: dict, location_prices: dict) -> int:
+    """Save the changed zone and location prices of the grid with bulk
+    statements in one transaction
+
+    A location price only changes when it differs from the price the
+    location had, and it is removed when it equals the (new) zone price,
+    so the location follows the zone price again
+
+    Args:
+        zone_prices (dict): Price by (zone id, vehicle id, service type id)
+        location_prices (dict): Price by (location id, vehicle id,
+            service type id)
+
+    Returns:
+        int: Number of zone and location prices changed
+    """
+
+    with transaction.atomic():
+        location_zones = dict(
+            models.Location.objects.filter(
+                id__in={key[0] for key in location_prices}
+            ).values_list("id", "zone_id")
+        )
+        location_prices = {
+            key: price
+            for key, price in location_prices.items()
+            if key[0] in location_zones
+        }
+
+        # Current prices of the cells and of the zones of the locations
+        zone_keys = set(zone_prices) | {
+            (location_zones[location_id], vehicle_id, service_type_id)
+            for location_id, vehicle_id, service_type_id in location_prices
+        }
+        current_zone_prices = {
+            key: row
+            for key, row in _get_rows(
+                models.ZonePricing,
+                "zone_id",
+                Q(zone_id__in={key[0] for key in zone_keys}),
+                lock=True,
+            ).items()
+            if key in zone_keys
+        }
+        current_location_prices = {
+            key: row
+            for key, row in _get_rows(
+                models.Pricing,
+                "location_id",
+                Q(location_id__in=location_zones),
+                lock=True,
+            ).items()
+            if key in location_prices
+        }
+
+        # New location prices
+        desired_location_prices = {
+            key: price for key, (_, price) in current_location_prices.items()
+        }
+        for key, price in location_prices.items():
+            location_id, vehicle_id, service_type_id = key
+            zone_key = (location_zones[location_id], vehicle_id, service_type_id)
+            old_zone_price = current_zone_prices.get(zone_key, (None, None))[1]
+            if price == desired_location_prices.get(key, old_zone_price):
+                continue
+            if price == zone_prices.get(zone_key, old_zone_price):
+                desired_location_prices.pop(key, None)
+            else:
+                desired_location_prices[key] = price
+
+        changed = _sync_rows(
+            models.ZonePricing,
+            "zone_id",
+            {
+                key: row
+                for key, row in current_zone_prices.items()
+                if key in zone_prices
+            },
+            zone_prices,
+        ) + _sync_rows(
+            models.Pricing,
+            "location_id",
+            current_location_prices,
+            desired_location_prices,
+        )
+        if changed:
+            invalidate_catalog()
+            sync_postal_code_ranges_on_commit()
+
+    return changed
+
+
+def adjust_prices(percentage: float, zone: models.Zone = None) -> int:
+    """Raise (or lower, with a negative percentage) the zone and location
+    prices with a single update per table, rounded to cents
+
+    Args:
+        percentage (float): Percentage to add to the prices
+        zone (models.Zone): Only change the prices of this zone
+
+    Returns:
+        int: Number of zone and location prices changed
+    """
+
+    zone_queryset = models.ZonePricing.objects.all()
+    location_queryset = models.Pricing.objects.all()
+    if zone is not None:
+        zone_queryset = zone_queryset.filter(zone=zone)
+        location_queryset = location_queryset.filter(location__zone=zone)
+
+    price = Round(F("price") * (1 + percentage / 100), 2)
+    now = timezone.now()
+    with transaction.atomic():
+        updated = zone_queryset.update(price=price, updated_at=now)
+        updated += location_queryset.update(price=price, updated_at=now)
+        if updated:
+            invalidate_catalog()
+            sync_postal_code_ranges_on_commit()
+    return updated
+
+
+def get_location_prices(scope: Q = None) -> dict:
+    """Get the price of each location, resolved from the zone prices and
+    the location prices
+
+    Args:
+        scope (Q): Zone and location prices filter (all by default)
+
+    Returns:
+        dict: Price by (location id, vehicle id, service type id)
+    """
+
+    scope = scope or Q()
+    return resolve_prices(
+        _get_prices(models.ZonePricing, "zone_id", scope),
+        _get_prices(models.Pricing, "location_id", scope),
+        get_zone_locations(models.Location.objects.values_list("id", "zone_id")),
+    )
+
+
+def diff_prices(prices: dict, scope: Q = None) -> dict:
+    """Compare a price matrix with the current price of each location
+
+    Args:
+        prices (dict): Price by (location id, vehicle id, service type id)
+        scope (Q): Zone and location prices the matrix replaces (all by
+            default)
+
+    Returns:
+        dict: created (key and price), updated (key, old and new price)
+            and deleted (key and old price) location prices
+    """
+
+    current = get_location_prices(scope)
+    created = []
+    updated = []
+    for key, price in prices.items():
+        if key not in current:
+            created.append((key, price))
+        elif current[key] != price:
+            updated.append((key, current[key], price))
+    deleted = [
+        (key, old_price) for key, old_price in current.items() if key not in prices
+    ]
+    return {"created": created, "updated": updated, "deleted": deleted}
+
+
+def sync_prices(prices: dict, scope: Q = None, batch_size: int = 500) -> dict:
+    """Make the price of each location match the given matrix in one
+    transaction, only writing the zone and location prices that change
+
+    The matrix is stored as zone prices plus the location prices that
+    differ from them (see compress_prices)
+
+    Args:
+        prices (dict): Price by (location id, vehicle id, service type id)
+        scope (Q): Zone and location prices the matrix replaces (all by
+            default)
+        batch_size (int): Rows per insert and update statement
+
+    Returns:
+        dict: Location price changes (same as diff_prices)
+    """
+
+    scope = scope or Q()
+    with transaction.atomic():
+        current_zone_prices = _get_rows(
+            models.ZonePricing, "zone_id", scope, lock=True
+        )
+        current_location_prices = _get_rows(
+            models.Pricing, "location_id", scope, lock=True
+        )
+        diff = diff_prices(prices, scope)
+
+        zone_prices, location_prices = compress_prices(
+            prices,
+            get_zone_locations(models.Location.objects.values_list("id", "zone_id")),
+        )
+        changed = _sync_rows(
+            models.ZonePricing,
+            "zone_id",
+            current_zone_prices,
+            zone_prices,
+            batch_size,
+        ) + _sync_rows(
+            models.Pricing,
+            "location_id",
+            current_location_prices,
+            location_prices,
+            batch_size,
+        )
+        if changed:
+            invalidate_catalog()
+            sync_postal_code_ranges_on_commit()
+
+    return diff
+
+
+def _get_rows(model, key_field: str, scope: Q, lock: bool = False) -> dict:
+    """Get the id and price of zone or location prices, by (zone or
+    location id, vehicle id, service type id)"""
+
+    queryset = model.objects.filter(scope)
+    if lock:
+        queryset = queryset.select_for_update()
+    return {
+        (key_id, vehicle_id, service_type_id): (row_id, price)
+        for row_id, key_id, vehicle_id, service_type_id, price in queryset.values_list(
+            "id", key_field, "vehicle_id", "service_type_id", "price"
+        )
+    }
+
+
+def _get_prices(model, key_field: str, scope: Q) -> dict:
+    """Get zone or location prices, by (zone or location id, vehicle id,
+    service type id)"""
+    return {
+        key: price
+        for key, (_, price) in _get_rows(model, key_field, scope).items()
+    }
+
+
+def _sync_rows(
+    model, key_field: str, current: dict, desired: dict, batch_size: int = 500
+) -> int:
+    """Insert, update and delete zone or location prices (bulk statements)
+    so the current rows match the desired prices
+
+    Args:
+        model (Model): ZonePricing or Pricing
+        key_field (str): "zone_id" or "location_id"
+        current (dict): Current id and price by key
+        desired (dict): Desired price by key
+        batch_size (int): Rows per insert and update statement
+
+    Returns:
+        int: Number of rows changed
+    """
+
+    now = timezone.now()
+    created = [
+        model(
+            **{key_field: key_id},
+            vehicle_id=vehicle_id,
+            service_type_id=service_type_id,
+            price=price,
+        )
+        for (key_id, vehicle_id, service_type_id), price in desired.items()
+        if (key_id, vehicle_id, service_type_id) not in current
+    ]
+    updated = [
+        model(id=current[key][0], price=price, updated_at=now)
+        for key, price in desired.items()
+        if key in current and current[key][1] != price
+    ]
+    deleted_ids = [
+        row_id for key, (row_id, _) in current.items() if key not in desired
+    ]
+
+    model.objects.bulk_create(created, batch_size=batch_size)
+    model.objects.bulk_update(updated, ["price", "updated_at"], batch_size=batch_size)
+
+    # Tombstones for delta syncs saved in bulk too
+    delete_catalog_rows(model, deleted_ids, batch_size)
+
+    return len(created) + len(updated) + len(deleted_ids)
@@ -0,0 +1,95 @@
+import uuid
+
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from travels import models
+from travels.catalog import get_catalog_version
+
+SALE_DATA_KEY = "travels:sale:{stripe_code}"
+SALE_DATA_TIMEOUT = 60 * 10
+
+
+def _get_sale_data_key(stripe_code) -> str:
+    return SALE_DATA_KEY.format(stripe_code=stripe_code)
+
+
+def get_sale_data(stripe_code: str) -> dict | None:
+    """Get the rendered data of a sale, cached by stripe code
+
+    Cached data is discarded when the sale, its client or the catalog
+    (names of the location, vehicle and service type) changes
+
+    Args:
+        stripe_code (str): Sale stripe code
+
+    Returns:
+        dict | None: Sale data, or None if the sale does not exist
+    """
+
+    try:
+        stripe_code = uuid.UUID(str(stripe_code))
+    except ValueError:
+        return None
+
+    key = _get_sale_data_key(stripe_code)
+    catalog_version = get_catalog_version()
+    cached = cache.get(key)
+    if cached is not None and cached["catalog_version"] == catalog_version:
+        return cached["data"]
+
+    # Load sale with its relations (single query)
+    sale = (
+        models.Sale.objects.select_related(
+            "service_type", "location", "vehicle", "client"
+        )
+        .filter(stripe_code=stripe_code)
+        .first()
+    )
+    if sale is None:
+        return None
+
+    data = {
+        "id": sale.id,
+        "service_type": {
+            "id": sale.service_type.id,
+            "name": sale.service_type.name,
+        },
+        "location": {
+            "id": sale.location.id,
+            "name": sale.location.name,
+        },
+        "vehicle": {
+            "id": sale.vehicle.id,
+            "name": sale.vehicle.name,
+            "passengers": sale.vehicle.passengers,
+        },
+        "total": sale.total,
+        "stripe_code": sale.stripe_code,
+        "client": {
+            "name": sale.client.name,
+            "last_name": sale.client.last_name,
+            "email": sale.client.email,
+        },
+    }
+
+    # Data loaded inside a transaction could be rolled back later
+    if not connection.in_atomic_block:
+        cache.set(
+            key,
+            {"catalog_version": catalog_version, "data": data},
+            SALE_DATA_TIMEOUT,
+        )
+    return data
+
+
+def invalidate_sale_data(*stripe_codes):
+    """Drop the cached data of the given sales, right away and again after
+    commit (data cached by other requests before the commit is discarded)
+    """
+
+    keys = [_get_sale_data_key(stripe_code) for stripe_code in stripe_codes]
+    if not keys:
+        return
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
@@ -1,6 +1,8 @@
 from rest_framework import serializers
 
 from travels import models
+from travels.catalog import get_catalog
+from travels.clients import normalize_email
 
 
 class LocationSerializer(serializers.ModelSerializer):
@@ -45,6 +47,25 @@ class PricingSerializer(serializers.ModelSerializer):
         )
 
 
+class ZonePricingSerializer(serializers.ModelSerializer):
+    zone = serializers.SerializerMethodField()
+    vehicle = VehicleSerializer(read_only=True)
+    service_type = ServiceTypeSerializer(read_only=True)
+
+    class Meta:
+        model = models.ZonePricing
+        fields = (
+            "id",
+            "zone",
+            "vehicle",
+            "service_type",
+            "price",
+        )
+
+    def get_zone(self, obj) -> dict:
+        return {"id": obj.zone_id, "name": obj.zone.name}
+
+
 # class VipCodeValidationSerializer(serializers.Serializer):
 #     vip_code = serializers.CharField(max_length=10, required=True)
 
@@ -76,22 +97,47 @@ class SaleSerializer(serializers.Serializer):
         queryset=models.Vehicle.objects.all(), source="sale.vehicle"
     )
 
-    def create(self, validated_data):
+    def validate(self, data):
+
+        # Get total from the in-process pricing matrix
+        price = get_catalog().get_price(
+            data["sale"]["location"].id,
+            data["sale"]["vehicle"].id,
+            data["sale"]["service_type"].id,
+        )
+        if price is None:
+            raise serializers.ValidationError(
+                "There is no pricing for the selected location, vehicle "
+                "and service type"
+            )
+        data["sale"]["total"] = price
+
+        return data
 
-        # Create client
-        client = models.Client.objects.create(**validated_data["client"])
+    def create(self, validated_data):
 
-        # Get total from pricing
-        pricing = models.Pricing.objects.get(
-            location=validated_data["sale"]["location"],
-            vehicle=validated_data["sale"]["vehicle"],
-            service_type=validated_data["sale"]["service_type"],
+        # Get client by email (or create it)
+        client_data = validated_data["client"]
+        client, created = models.Client.objects.get_or_create(
+            email=normalize_email(client_data.pop("email")),
+            defaults=client_data,
         )
 
+        # Fill the missing data of an existing client (anyone can book
+        # with an email, so its names are not overwritten)
+        if not created:
+            client_data = {
+                field: value
+                for field, value in client_data.items()
+                if value and not getattr(client, field)
+            }
+            if client_data:
+                for field, value in client_data.items():
+                    setattr(client, field, value)
+                client.save(update_fields=[*client_data.keys(), "updated_at"])
+
         # Create sale
         validated_data["sale"]["client"] = client
-
-        validated_data["sale"]["total"] = pricing.price
         sale = models.Sale.objects.create(**validated_data["sale"])
 
         return sale
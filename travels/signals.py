@@ -0,0 +1,70 @@
+from django.db.models.signals import post_delete, post_save
+
+from travels import models
+from travels.catalog import invalidate_catalog
+from travels.postal_codes import sync_postal_code_ranges_on_commit
+from travels.sales import invalidate_sale_data
+
+CATALOG_MODELS = (
+    models.Zone,
+    models.Location,
+    models.Vehicle,
+    models.ServiceType,
+    models.Pricing,
+    models.ZonePricing,
+    models.PostalCodeRange,
+)
+
+# Tables the postal code ranges are built from
+POSTAL_CODE_MODELS = (
+    models.Location,
+    models.Pricing,
+    models.ZonePricing,
+)
+
+
+def invalidate_catalog_cache(sender, **kwargs):
+    """Drop the in-process catalog snapshots when a catalog table changes"""
+    invalidate_catalog()
+
+
+def log_catalog_delete(sender, instance, **kwargs):
+    """Save a tombstone of the deleted catalog row for delta syncs"""
+    models.DeletedRecord.objects.create(
+        model=sender._meta.model_name, object_id=instance.pk
+    )
+
+
+for catalog_model in CATALOG_MODELS:
+    post_save.connect(invalidate_catalog_cache, sender=catalog_model)
+    post_delete.connect(invalidate_catalog_cache, sender=catalog_model)
+    post_delete.connect(log_catalog_delete, sender=catalog_model)
+
+
+def sync_postal_codes(sender, **kwargs):
+    """Rebuild the postal code ranges after a location or price change"""
+    sync_postal_code_ranges_on_commit()
+
+
+for postal_code_model in POSTAL_CODE_MODELS:
+    post_save.connect(sync_postal_codes, sender=postal_code_model)
+    post_delete.connect(sync_postal_codes, sender=postal_code_model)
+
+
+def invalidate_sale_cache(sender, instance, **kwargs):
+    """Drop the cached data of the changed sale"""
+    invalidate_sale_data(instance.stripe_code)
+
+
+def invalidate_client_sales_cache(sender, instance, **kwargs):
+    """Drop the cached data of the sales of the changed client"""
+    invalidate_sale_data(
+        *models.Sale.objects.filter(client=instance).values_list(
+            "stripe_code", flat=True
+        )
+    )
+
+
+post_save.connect(invalidate_sale_cache, sender=models.Sale)
+post_delete.connect(invalidate_sale_cache, sender=models.Sale)
+post_save.connect(invalidate_client_sales_cache, sender=models.Client)
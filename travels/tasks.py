@@ -0,0 +1,151 @@
+import datetime
+import os
+
+from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
+
+from travels import exports, importers, models
+from utils.stripe import get_payment_link
+
+BASE_FILE = os.path.basename(__file__)
+
+
+def create_payment_link(sale_id: int) -> str | None:
+    """Generate the stripe payment link of a sale and save it
+
+    Args:
+        sale_id (int): Sale id
+
+    Returns:
+        str | None: Stripe checkout link, or None if it could not be generated
+    """
+
+    sale = models.Sale.objects.select_related(
+        "client", "vehicle", "service_type", "location__zone"
+    ).get(id=sale_id)
+
+    try:
+        payment_link = get_payment_link(
+            product_name="Mar Co. Cabo Transportation",
+            total=sale.total,
+            description=sale.get_summary(),
+            email=sale.client.email,
+            sale_id=sale.stripe_code,
+        )
+    except Exception as e:
+        print(f"Error in {BASE_FILE} creating payment link of sale {sale_id}: {e}")
+        models.Sale.objects.filter(id=sale_id).update(payment_link_status="error")
+        return None
+
+    models.Sale.objects.filter(id=sale_id).update(
+        payment_link=payment_link, payment_link_status="ready"
+    )
+    return payment_link
+
+
+def fail_stale_jobs(model) -> int:
+    """Mark as failed the pending and running jobs (exports or pricing
+    imports) without progress in BACKGROUND_JOB_TIMEOUT seconds, whose
+    task was lost when its process died
+
+    Args:
+        model (Model): ExportJob or PricingImport
+
+    Returns:
+        int: Number of jobs marked as failed
+    """
+
+    now = timezone.now()
+    stale = now - datetime.timedelta(seconds=settings.BACKGROUND_JOB_TIMEOUT)
+    return model.objects.filter(
+        status__in=["pending", "running"], updated_at__lt=stale
+    ).update(
+        status="error",
+        error="Proceso interrumpido, vuelve a intentarlo",
+        updated_at=now,
+    )
+
+
+def run_export_job(job_id: int, chunk_size: int = 2000):
+    """Write the sales export workbook of a job to storage, saving the
+    progress after each chunk of sales
+
+    Args:
+        job_id (int): Export job id
+        chunk_size (int): Sales loaded per chunk
+    """
+
+    job = models.ExportJob.objects.get(id=job_id)
+    models.ExportJob.objects.filter(id=job_id).update(
+        status="running", processed=0, updated_at=timezone.now()
+    )
+
+    def iter_rows():
+        # Load the sales by chunks of ids, keeping the selection order
+        sale_ids = job.sale_ids
+        for start in range(0, len(sale_ids), chunk_size):
+            chunk_ids = sale_ids[start : start + chunk_size]
+            sales = exports.with_export_relations(models.Sale.objects).in_bulk(
+                chunk_ids
+            )
+            for sale_id in chunk_ids:
+                if sale_id in sales:
+                    yield exports.get_sale_row(sales[sale_id])
+            models.ExportJob.objects.filter(id=job_id).update(
+                processed=start + len(chunk_ids), updated_at=timezone.now()
+            )
+
+    try:
+        with exports.write_sales_workbook(iter_rows()) as output:
+            job.refresh_from_db()
+            job.file.save(
+                f"ventas-{job.id}-"
+                f"{timezone.localtime().strftime('%Y%m%d_%H%M%S')}.xlsx",
+                File(output),
+                save=False,
+            )
+    except Exception as e:
+        print(f"Error in {BASE_FILE} running export job {job_id}: {e}")
+        models.ExportJob.objects.filter(id=job_id).update(
+            status="error", error=str(e), updated_at=timezone.now()
+        )
+        return
+
+    job.status = "done"
+    job.save(update_fields=["file", "status", "updated_at"])
+
+
+def run_pricing_import(import_id: int):
+    """Import the pricing file of an import, saving its report
+
+    Args:
+        import_id (int): Pricing import id
+    """
+
+    pricing_import = models.PricingImport.objects.get(id=import_id)
+    models.PricingImport.objects.filter(id=import_id).update(
+        status="running", updated_at=timezone.now()
+    )
+
+    try:
+        with pricing_import.file.open("rb") as file:
+            report = importers.import_pricing(
+                file,
+                importers.get_file_format(pricing_import.file.name),
+                spec=pricing_import.spec or None,
+                dry_run=pricing_import.dry_run,
+            )
+    except Exception as e:
+        print(f"Error in {BASE_FILE} running pricing import {import_id}: {e}")
+        models.PricingImport.objects.filter(id=import_id).update(
+            status="error", error=str(e), updated_at=timezone.now()
+        )
+        return
+
+    models.PricingImport.objects.filter(id=import_id).update(
+        status="error" if report["errors"] else "done",
+        report=report,
+        error="\n".join(report["errors"]) or None,
+        updated_at=timezone.now(),
+    )
@@ -1,12 +1,23 @@
+import csv
 import datetime
 import io
+import json
+import tempfile
 import uuid
+from unittest.mock import patch
 
 import openpyxl
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from openpyxl.styles import numbers
 
 from core.tests_base.test_admin import TestAdminBase
-from travels import models
+from core.tests_base.test_models import TestTravelsModelBase
+from travels import exports, models
+from travels import pricing as pricing_module
 
 
 class ClientAdminTestCase(TestAdminBase):
@@ -21,6 +32,19 @@ class ClientAdminTestCase(TestAdminBase):
 
         self.submit_search_bar(self.endpoint)
 
+    def test_add_duplicated_email(self):
+        """Validate an email already used in another case is a form error"""
+
+        models.Client.objects.create(name="John", email="john@example.com")
+
+        response = self.client.post(
+            f"{self.endpoint}add/",
+            {"name": "Johnny", "email": " John@Example.com "},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("email", response.context["adminform"].form.errors)
+        self.assertEqual(models.Client.objects.count(), 1)
+
 
 class VipCodeAdminTestCase(TestAdminBase):
     """Testing code admin"""
@@ -43,7 +67,7 @@ class VehicleAdminTestCase(TestAdminBase):
         self.endpoint = "/admin/travels/vehicle/"
 
 
-class SaleAdminTestCase(TestAdminBase):
+class SaleAdminTestCase(TestAdminBase, TestTravelsModelBase):
     """Testing sale admin"""
 
     def setUp(self):
@@ -158,6 +182,81 @@ class SaleAdminTestCase(TestAdminBase):
 
         self.submit_search_bar(self.endpoint)
 
+    def test_changelist_constant_queries(self):
+        """Validate the changelist queries do not grow with the page size"""
+
+        self.validate_constant_queries(self.endpoint, self.create_sale)
+
+    def get_search_results(self, search_term: str) -> list:
+        """Search in the changelist, returning the found sale ids"""
+
+        response = self.client.get(self.endpoint, {"q": search_term})
+        self.assertEqual(response.status_code, 200)
+        return sorted(sale.id for sale in response.context["cl"].result_list)
+
+    def test_search_stripe_code(self):
+        """Validate sales are found by their exact code"""
+
+        sale = self.create_sale()
+        self.create_sale()
+        self.assertEqual(self.get_search_results(str(sale.stripe_code)), [sale.id])
+
+    def test_search_total(self):
+        """Validate sales are found by their exact total"""
+
+        sale = self.create_sale(total=1234.5)
+        self.create_sale(total=12345)
+        self.assertEqual(self.get_search_results("1234.5"), [sale.id])
+
+    def test_search_client_prefix(self):
+        """Validate sales are found by the start of the client data"""
+
+        client = self.create_client(name="Searchable", last_name="Client")
+        sale = self.create_sale(client=client)
+        self.create_sale()
+        self.assertEqual(self.get_search_results("search"), [sale.id])
+        self.assertEqual(self.get_search_results("Searchable Cli"), [sale.id])
+        self.assertEqual(self.get_search_results("nomatch"), [])
+
+    def test_changelist_single_count(self):
+        """Validate the changelist only counts the rows once"""
+
+        self.create_sale()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.endpoint)
+        self.assertEqual(response.status_code, 200)
+        count_queries = [
+            query for query in queries if "COUNT(" in query["sql"].upper()
+        ]
+        self.assertEqual(len(count_queries), 1)
+
+    def test_client_autocomplete_filter(self):
+        """Validate the client filter only loads the selected client"""
+
+        sales = [self.create_sale() for _ in range(3)]
+        selected_client = sales[0].client
+
+        response = self.client.get(
+            self.endpoint, {"client__id__exact": selected_client.id}
+        )
+        self.assertContains(
+            response,
+            "/admin/autocomplete/?app_label=travels&amp;model_name=sale"
+            "&amp;field_name=client",
+        )
+        self.assertContains(response, str(selected_client))
+        for sale in sales[1:]:
+            self.assertNotContains(response, str(sale.client))
+
+    def test_change_form_autocomplete_fields(self):
+        """Validate foreign keys use autocomplete widgets in the change form"""
+
+        sale = self.create_sale()
+        response = self.client.get(f"{self.endpoint}{sale.id}/change/")
+        self.assertEqual(response.status_code, 200)
+        for field_name in ["client", "vehicle", "service_type", "location"]:
+            self.assertContains(response, f'data-field-name="{field_name}"')
+
     def test_custom_links(self):
         """Validate custom custom links"""
 
@@ -372,6 +471,234 @@ class SaleAdminTestCase(TestAdminBase):
                     arrival.hour if column == 11 else departure.hour,
                 )
 
+    def test_export_constant_queries(self):
+        """Ensure the export query count does not grow with the sales"""
+
+        def create_sales(count: int) -> list[int]:
+            sale_ids = []
+            for index in range(count):
+                sale, *_ = self._create_export_sale(
+                    client_name=f"Client {index}",
+                    client_last_name="Queries",
+                    email=f"queries-{uuid.uuid4().hex}@example.com",
+                    phone="5550001234",
+                    passengers=2,
+                    arrival_date=datetime.date(2025, 12, 1),
+                    arrival_time=datetime.time(9, 45),
+                    arrival_airline="ArrivalAir",
+                    arrival_flight="ARR123",
+                    departure_date=datetime.date(2025, 12, 2),
+                    departure_time=datetime.time(18, 30),
+                    departure_airline="DepartAir",
+                    departure_flight="DEP456",
+                )
+                sale_ids.append(sale.id)
+            return sale_ids
+
+        def get_queries_count(sale_ids: list[int]) -> int:
+            with CaptureQueriesContext(connection) as queries:
+                workbook = self._run_export_action(sale_ids)
+            self.assertEqual(workbook.active.max_row, 5 + len(sale_ids))
+            return len(queries)
+
+        sale_ids = create_sales(2)
+        queries_count = get_queries_count(sale_ids)
+        sale_ids += create_sales(8)
+        self.assertEqual(get_queries_count(sale_ids), queries_count)
+
+    def test_export_to_excel_background(self):
+        """Ensure the background export saves the workbook for download"""
+
+        sale, client, *_ = self._create_export_sale(
+            client_name="Background",
+            client_last_name="Export",
+            email="background@example.com",
+            phone="5550001234",
+            passengers=3,
+            arrival_date=datetime.date(2025, 12, 1),
+            arrival_time=datetime.time(9, 45),
+            arrival_airline="ArrivalAir",
+            arrival_flight="ARR123",
+            departure_date=datetime.date(2025, 12, 2),
+            departure_time=datetime.time(18, 30),
+            departure_airline="DepartAir",
+            departure_flight="DEP456",
+        )
+
+        with tempfile.TemporaryDirectory() as media_root, override_settings(
+            MEDIA_ROOT=media_root
+        ):
+            # Run export action (job runs inline in tests)
+            response = self.client.post(
+                self.endpoint,
+                {
+                    "action": "export_to_excel_background",
+                    "_selected_action": [str(sale.id)],
+                },
+            )
+            self.assertEqual(response.status_code, 302)
+
+            # Validate job done
+            job = models.ExportJob.objects.get()
+            self.assertEqual(job.status, "done")
+            self.assertEqual(job.user, self.admin)
+            self.assertEqual(job.processed, 1)
+            self.assertEqual(job.total, 1)
+
+            # Validate job list and download
+            response = self.client.get("/admin/travels/exportjob/")
+            download_url = f"/admin/travels/exportjob/{job.id}/download/"
+            self.assertContains(response, download_url)
+
+            response = self.client.get(download_url)
+            self.assertEqual(response.status_code, 200)
+            content = b"".join(response.streaming_content)
+            sheet = openpyxl.load_workbook(io.BytesIO(content)).active
+            self.assertEqual(sheet.cell(row=6, column=1).value, client.last_name)
+            self.assertEqual(sheet.cell(row=6, column=3).value, client.email)
+
+    def test_export_job_stale_failed(self):
+        """Ensure exports without progress are marked as failed when listed"""
+
+        stale_job = models.ExportJob.objects.create(status="running", total=1)
+        running_job = models.ExportJob.objects.create(status="running", total=1)
+        models.ExportJob.objects.filter(id=stale_job.id).update(
+            updated_at=timezone.now() - datetime.timedelta(hours=1)
+        )
+
+        response = self.client.get("/admin/travels/exportjob/")
+        self.assertEqual(response.status_code, 200)
+        stale_job.refresh_from_db()
+        running_job.refresh_from_db()
+        self.assertEqual(stale_job.status, "error")
+        self.assertEqual(running_job.status, "running")
+
+    def test_export_to_csv_select_across(self):
+        """Ensure the csv export includes all the rows with select all"""
+
+        sale_ids = []
+        for index in range(3):
+            sale, *_ = self._create_export_sale(
+                client_name=f"Csv {index}",
+                client_last_name="Export",
+                email=f"csv-{index}@example.com",
+                phone="5550001234",
+                passengers=2,
+                arrival_date=datetime.date(2025, 12, 1),
+                arrival_time=datetime.time(9, 45),
+                arrival_airline="ArrivalAir",
+                arrival_flight="ARR123",
+                departure_date=datetime.date(2025, 12, 2),
+                departure_time=datetime.time(18, 30),
+                departure_airline="DepartAir",
+                departure_flight="DEP456",
+            )
+            sale_ids.append(sale.id)
+
+        response = self.client.post(
+            self.endpoint,
+            {
+                "action": "export_to_csv",
+                "select_across": "1",
+                "_selected_action": [str(sale_ids[0])],
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/csv")
+
+        content = b"".join(response.streaming_content).decode()
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual([int(row["id"]) for row in rows], sale_ids)
+        self.assertEqual(rows[0]["zone"], self.export_zone.name)
+
+    def test_export_new_since_watermark(self):
+        """Ensure the incremental export only writes sales changed since
+        the last export, then moves the watermark"""
+
+        old_sale, *_ = self._create_export_sale(
+            client_name="Old",
+            client_last_name="Sale",
+            email="old-sale@example.com",
+            phone="5550001234",
+            passengers=2,
+            arrival_date=datetime.date(2025, 12, 1),
+            arrival_time=datetime.time(9, 45),
+            arrival_airline="ArrivalAir",
+            arrival_flight="ARR123",
+            departure_date=datetime.date(2025, 12, 2),
+            departure_time=datetime.time(18, 30),
+            departure_airline="DepartAir",
+            departure_flight="DEP456",
+        )
+        new_sale, new_client, *_ = self._create_export_sale(
+            client_name="New",
+            client_last_name="Sale",
+            email="new-sale@example.com",
+            phone="5550001234",
+            passengers=2,
+            arrival_date=datetime.date(2025, 12, 1),
+            arrival_time=datetime.time(9, 45),
+            arrival_airline="ArrivalAir",
+            arrival_flight="ARR123",
+            departure_date=datetime.date(2025, 12, 2),
+            departure_time=datetime.time(18, 30),
+            departure_airline="DepartAir",
+            departure_flight="DEP456",
+        )
+
+        # Sale exported in the last run
+        now = timezone.now()
+        models.Sale.objects.filter(id=old_sale.id).update(
+            updated_at=now - datetime.timedelta(days=2)
+        )
+        models.ExportWatermark.objects.create(
+            user=self.admin,
+            destination="excel",
+            exported_until=now - datetime.timedelta(days=1),
+        )
+
+        # Validate button in changelist
+        export_new_url = "/admin/travels/sale/export-new/"
+        response = self.client.get(self.endpoint)
+        self.assertContains(response, export_new_url)
+
+        # Validate only the new sale exported
+        response = self.client.post(export_new_url)
+        self.assertEqual(response.status_code, 200)
+        content = b"".join(response.streaming_content)
+        sheet = openpyxl.load_workbook(io.BytesIO(content)).active
+        self.assertEqual(sheet.max_row, 6)
+        self.assertEqual(sheet.cell(row=6, column=3).value, new_client.email)
+
+        # Validate watermark moved to the last exported sale
+        new_sale.refresh_from_db()
+        watermark = models.ExportWatermark.objects.get(user=self.admin)
+        self.assertEqual(
+            (watermark.exported_until, watermark.exported_id),
+            (new_sale.updated_at, new_sale.id),
+        )
+
+        # Validate sales changed right before the last run are not exported
+        # again
+        response = self.client.post(export_new_url)
+        self.assertRedirects(response, self.endpoint)
+
+        # Validate links (GET) do not export nor move the watermark
+        response = self.client.get(export_new_url)
+        self.assertEqual(response.status_code, 405)
+
+    def test_export_new_nothing_to_export(self):
+        """Ensure the incremental export redirects when there is no change"""
+
+        models.ExportWatermark.objects.create(
+            user=self.admin,
+            destination="excel",
+            exported_until=timezone.now() + datetime.timedelta(hours=1),
+        )
+
+        response = self.client.post("/admin/travels/sale/export-new/")
+        self.assertRedirects(response, self.endpoint)
+
 
 class ServiceTypeAdminTestCase(TestAdminBase):
     """Testing transfer type admin"""
@@ -381,7 +708,7 @@ class ServiceTypeAdminTestCase(TestAdminBase):
         self.endpoint = "/admin/travels/servicetype/"
 
 
-class TransferAdminTestCase(TestAdminBase):
+class TransferAdminTestCase(TestAdminBase, TestTravelsModelBase):
     """Testing transfer admin"""
 
     def setUp(self):
@@ -393,6 +720,98 @@ class TransferAdminTestCase(TestAdminBase):
 
         self.submit_search_bar(self.endpoint)
 
+    def test_changelist_constant_queries(self):
+        """Validate the changelist queries do not grow with the page size"""
+
+        self.validate_constant_queries(self.endpoint, self.create_transfer)
+
+    def test_sale_autocomplete_search(self):
+        """Validate the sale filter choices are searched by client"""
+
+        transfer = self.create_transfer()
+        self.create_transfer()
+
+        response = self.client.get(
+            "/admin/autocomplete/",
+            {
+                "app_label": "travels",
+                "model_name": "transfer",
+                "field_name": "sale",
+                "term": transfer.sale.client.email,
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [result["id"] for result in response.json()["results"]],
+            [str(transfer.sale.id)],
+        )
+
+    def test_export_dispatch(self):
+        """Ensure the dispatch export has a sheet per date sorted by time"""
+
+        zone = models.Zone.objects.create(name="Dispatch zone")
+        location = models.Location.objects.create(name="Dispatch hotel", zone=zone)
+        client = models.Client.objects.create(
+            name="Dispatch", last_name="Client", email="dispatch@example.com"
+        )
+        sale = models.Sale.objects.create(
+            client=client,
+            vehicle=models.Vehicle.objects.create(name="Dispatch van"),
+            passengers=4,
+            service_type=models.ServiceType.objects.create(name="Dispatch trip"),
+            location=location,
+            total=100,
+        )
+        first_date = datetime.date(2025, 12, 1)
+        second_date = datetime.date(2025, 12, 3)
+        transfers = [
+            (second_date, datetime.time(8, 0), "departure"),
+            (first_date, datetime.time(15, 30), "arrival"),
+            (first_date, datetime.time(7, 15), "arrival"),
+        ]
+        for date, hour, transfer_type in transfers:
+            models.Transfer.objects.create(
+                date=date,
+                hour=hour,
+                type=transfer_type,
+                sale=sale,
+                airline=f"Airline {hour}",
+                flight_number=f"FL{hour.hour}",
+            )
+
+        template_loads = exports.get_export_template.cache_info().misses
+        response = self.client.post(
+            self.endpoint,
+            {
+                "action": "export_dispatch",
+                "select_across": "1",
+                "_selected_action": [str(models.Transfer.objects.first().id)],
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        workbook = openpyxl.load_workbook(
+            io.BytesIO(b"".join(response.streaming_content))
+        )
+
+        # Validate a sheet per date, with the template headers
+        self.assertEqual(workbook.sheetnames, ["2025-12-01", "2025-12-03"])
+        first_sheet = workbook["2025-12-01"]
+        self.assertEqual(first_sheet.cell(row=5, column=1).value, "Last Name")
+        self.assertEqual(first_sheet.max_row, 7)
+
+        # Validate transfers sorted by time, in the columns of their type
+        self.assertEqual(first_sheet.cell(row=6, column=11).value, datetime.time(7, 15))
+        self.assertEqual(first_sheet.cell(row=7, column=11).value, datetime.time(15, 30))
+        self.assertEqual(first_sheet.cell(row=6, column=5).value, location.name)
+        second_sheet = workbook["2025-12-03"]
+        self.assertIsNone(second_sheet.cell(row=6, column=11).value)
+        self.assertEqual(second_sheet.cell(row=6, column=15).value, datetime.time(8, 0))
+
+        # Validate template parsed at most once
+        self.assertLessEqual(
+            exports.get_export_template.cache_info().misses, max(template_loads, 1)
+        )
+
 
 class ZoneAdminTestCase(TestAdminBase):
     """Testing zone admin"""
@@ -407,7 +826,7 @@ class ZoneAdminTestCase(TestAdminBase):
         self.submit_search_bar(self.endpoint)
 
 
-class LocationAdminTestCase(TestAdminBase):
+class LocationAdminTestCase(TestAdminBase, TestTravelsModelBase):
     """Testing location admin"""
 
     def setUp(self):
@@ -419,8 +838,13 @@ class LocationAdminTestCase(TestAdminBase):
 
         self.submit_search_bar(self.endpoint)
 
+    def test_changelist_constant_queries(self):
+        """Validate the changelist queries do not grow with the page size"""
+
+        self.validate_constant_queries(self.endpoint, self.create_location)
+
 
-class PricingAdminTestCase(TestAdminBase):
+class PricingAdminTestCase(TestAdminBase, TestTravelsModelBase):
     """Testing pricing admin"""
 
     def setUp(self):
@@ -431,3 +855,297 @@ class PricingAdminTestCase(TestAdminBase):
         """Validate search bar working"""
 
         self.submit_search_bar(self.endpoint)
+
+    def test_changelist_constant_queries(self):
+        """Validate the changelist queries do not grow with the page size"""
+
+        self.validate_constant_queries(self.endpoint, self.create_pricing)
+
+    def get_cell_name(self, pricing: models.Pricing) -> str:
+        """Grid input name of a location price"""
+        return (
+            f"price-{pricing.location_id}-{pricing.vehicle_id}-"
+            f"{pricing.service_type_id}"
+        )
+
+    def post_grid(self, cells: dict, url: str = None):
+        """Save grid cells like the grid form does (changed cells as json)
+
+        Args:
+            cells (dict): Price by grid input name
+            url (str): Grid url
+
+        Returns:
+            HttpResponse: Response
+        """
+        return self.client.post(
+            url or f"{self.endpoint}grid/",
+            {"action": "save", "prices": json.dumps(cells)},
+        )
+
+    def test_grid_view(self):
+        """Validate the grid shows a price input per location price"""
+
+        pricing = self.create_pricing(price=150.5)
+        response = self.client.get(f"{self.endpoint}grid/")
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, f'data-cell="{self.get_cell_name(pricing)}"')
+        self.assertContains(response, 'value="150.5"')
+
+    def test_grid_save_prices(self):
+        """Validate changed prices are saved in one update"""
+
+        changed_pricing = self.create_pricing(price=100)
+        same_pricing = self.create_pricing(price=200)
+        updated_at = same_pricing.updated_at
+
+        with patch("travels.pricing.invalidate_catalog") as invalidate_catalog:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.post_grid(
+                    {
+                        self.get_cell_name(changed_pricing): "120.5",
+                        self.get_cell_name(same_pricing): "200",
+                    }
+                )
+        self.assertEqual(response.status_code, 302)
+        invalidate_catalog.assert_called_once()
+        updates = [
+            query
+            for query in queries
+            if query["sql"].startswith('UPDATE "travels_pricing"')
+        ]
+        self.assertEqual(len(updates), 1)
+
+        changed_pricing.refresh_from_db()
+        same_pricing.refresh_from_db()
+        self.assertEqual(changed_pricing.price, 120.5)
+        self.assertEqual(same_pricing.updated_at, updated_at)
+
+    def test_grid_save_zone_price(self):
+        """Validate a zone price change is a single row update, and
+        locations with their own price keep it"""
+
+        zone = self.create_zone()
+        location = self.create_location(zone=zone)
+        other_location = self.create_location(zone=zone)
+        vehicle = self.create_vehicle()
+        service_type = self.create_service_type()
+        zone_pricing = models.ZonePricing.objects.create(
+            zone=zone, vehicle=vehicle, service_type=service_type, price=100
+        )
+        pricing = self.create_pricing(
+            location=location, vehicle=vehicle, service_type=service_type, price=120
+        )
+        other_cell_name = f"price-{other_location.id}-{vehicle.id}-{service_type.id}"
+
+        response = self.post_grid(
+            {
+                f"zone-{zone.id}-{vehicle.id}-{service_type.id}": "150",
+                self.get_cell_name(pricing): "120",
+                other_cell_name: "100",
+            }
+        )
+        self.assertEqual(response.status_code, 302)
+        zone_pricing.refresh_from_db()
+        self.assertEqual(zone_pricing.price, 150)
+        prices = pricing_module.get_location_prices()
+        self.assertEqual(prices[(location.id, vehicle.id, service_type.id)], 120)
+        self.assertEqual(prices[(other_location.id, vehicle.id, service_type.id)], 150)
+
+        # A location price equal to the zone price follows the zone again
+        self.post_grid({self.get_cell_name(pricing): "150"})
+        self.assertFalse(models.Pricing.objects.filter(id=pricing.id).exists())
+
+    def test_grid_invalid_price(self):
+        """Validate no price is saved when one is invalid"""
+
+        pricing = self.create_pricing(price=100)
+        other_pricing = self.create_pricing(price=100)
+        self.post_grid(
+            {
+                self.get_cell_name(pricing): "120",
+                self.get_cell_name(other_pricing): "-1",
+            }
+        )
+        pricing.refresh_from_db()
+        self.assertEqual(pricing.price, 100)
+
+    def test_grid_save_fixture_size(self):
+        """Validate a grid the size of the fixtures (316 locations, 3
+        vehicles and 2 service types) is saved in a single request, even
+        with every cell changed"""
+
+        zone = self.create_zone()
+        models.Location.objects.bulk_create(
+            [
+                models.Location(name=f"grid location {index}", zone=zone)
+                for index in range(316)
+            ]
+        )
+        vehicles = [self.create_vehicle() for _ in range(3)]
+        service_types = [self.create_service_type() for _ in range(2)]
+        columns = [
+            (vehicle.id, service_type.id)
+            for vehicle in vehicles
+            for service_type in service_types
+        ]
+
+        # Zone price 100, and 120 for the first location
+        location_ids = list(
+            models.Location.objects.filter(zone=zone)
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        cells = {
+            f"zone-{zone.id}-{vehicle_id}-{service_type_id}": "100"
+            for vehicle_id, service_type_id in columns
+        }
+        for location_id in location_ids:
+            for vehicle_id, service_type_id in columns:
+                price = "120" if location_id == location_ids[0] else "100"
+                cells[f"price-{location_id}-{vehicle_id}-{service_type_id}"] = price
+        self.assertGreater(len(cells), 1000)
+
+        response = self.post_grid(cells)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            models.ZonePricing.objects.filter(zone=zone, price=100).count(), 6
+        )
+        self.assertEqual(
+            models.Pricing.objects.filter(
+                location_id=location_ids[0], price=120
+            ).count(),
+            6,
+        )
+        self.assertEqual(models.Pricing.objects.filter(location__zone=zone).count(), 6)
+
+    def test_grid_adjust_zone_prices(self):
+        """Validate a percentage changes only the prices of the zone"""
+
+        zone = self.create_zone()
+        zone_pricing = self.create_pricing(
+            location=self.create_location(zone=zone), price=100
+        )
+        other_pricing = self.create_pricing(price=100)
+
+        response = self.client.post(
+            f"{self.endpoint}grid/?zone={zone.id}",
+            {"action": "adjust", "percentage": "10"},
+        )
+        self.assertRedirects(
+            response,
+            f"{self.endpoint}grid/?zone={zone.id}",
+            fetch_redirect_response=False,
+        )
+        zone_pricing.refresh_from_db()
+        other_pricing.refresh_from_db()
+        self.assertEqual(zone_pricing.price, 110)
+        self.assertEqual(other_pricing.price, 100)
+
+
+class PricingImportAdminTestCase(TestAdminBase, TestTravelsModelBase):
+    """Testing pricing import admin"""
+
+    def setUp(self):
+        super().setUp()
+        self.endpoint = "/admin/travels/pricingimport/"
+        self.location = self.create_location()
+        self.vehicle = self.create_vehicle()
+        self.service_type = self.create_service_type()
+        self.pricing = self.create_pricing(
+            location=self.location,
+            vehicle=self.vehicle,
+            service_type=self.service_type,
+            price=100,
+        )
+        self.spec = {
+            "header_rows": 1,
+            "zone_column": 0,
+            "location_column": 1,
+            "price_columns": [
+                {
+                    "column": 2,
+                    "vehicle": self.vehicle.name,
+                    "service_type": self.service_type.name,
+                },
+            ],
+        }
+
+    def upload(self, content: str, dry_run: bool):
+        """Upload a csv file in the admin add form"""
+
+        data = {
+            "file": SimpleUploadedFile("pricing.csv", content.encode()),
+            "spec": json.dumps(self.spec),
+        }
+        if dry_run:
+            data["dry_run"] = "on"
+        response = self.client.post(f"{self.endpoint}add/", data)
+        self.assertEqual(response.status_code, 302)
+        return models.PricingImport.objects.latest("id")
+
+    def test_dry_run_and_apply(self):
+        """Validate a dry run reports the diff and the apply action saves it"""
+
+        content = (
+            "zone,location,price\n"
+            f'{self.location.zone.name},{self.location.name},"$1,200.00"\n'
+        )
+        with tempfile.TemporaryDirectory() as media_root, override_settings(
+            MEDIA_ROOT=media_root
+        ):
+            # Dry run (runs inline in tests)
+            pricing_import = self.upload(content, dry_run=True)
+            self.assertEqual(pricing_import.status, "done")
+            self.assertEqual(pricing_import.user, self.admin)
+            self.assertEqual(pricing_import.report["updated"], 1)
+            self.assertEqual(pricing_import.report["changes"][0]["price"], 1200)
+            self.pricing.refresh_from_db()
+            self.assertEqual(self.pricing.price, 100)
+
+            response = self.client.get(
+                f"{self.endpoint}{pricing_import.id}/change/"
+            )
+            self.assertContains(response, "Actualizado")
+
+            # Apply the dry run
+            response = self.client.post(
+                self.endpoint,
+                {
+                    "action": "apply_imports",
+                    "_selected_action": [str(pricing_import.id)],
+                },
+            )
+            self.assertEqual(response.status_code, 302)
+            applied_import = models.PricingImport.objects.latest("id")
+            self.assertFalse(applied_import.dry_run)
+            self.assertEqual(applied_import.status, "done")
+            price_key = (self.location.id, self.vehicle.id, self.service_type.id)
+            self.assertEqual(pricing_module.get_location_prices()[price_key], 1200)
+
+    def test_unknown_location(self):
+        """Validate nothing is saved when a row has errors"""
+
+        content = "zone,location,price\nUnknown zone,Unknown location,50\n"
+        with tempfile.TemporaryDirectory() as media_root, override_settings(
+            MEDIA_ROOT=media_root
+        ):
+            pricing_import = self.upload(content, dry_run=False)
+        self.assertEqual(pricing_import.status, "error")
+        self.assertIn("unknown location", pricing_import.error)
+        self.assertTrue(models.Pricing.objects.filter(id=self.pricing.id).exists())
+
+    def test_stale_import_failed(self):
+        """Validate imports without progress are marked as failed when listed"""
+
+        pricing_import = models.PricingImport.objects.create(
+            file="imports/pricing.csv", status="running"
+        )
+        models.PricingImport.objects.filter(id=pricing_import.id).update(
+            updated_at=timezone.now() - datetime.timedelta(hours=1)
+        )
+
+        response = self.client.get(self.endpoint)
+        self.assertEqual(response.status_code, 200)
+        pricing_import.refresh_from_db()
+        self.assertEqual(pricing_import.status, "error")
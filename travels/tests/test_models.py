@@ -1,6 +1,11 @@
 import uuid
 
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
 from travels import models
+from travels.catalog import compress_prices, resolve_prices
+from travels.postal_codes import build_postal_code_ranges
 from core.tests_base.test_models import TestTravelsModelBase
 
 
@@ -21,6 +26,41 @@ class ZoneTestCase(TestTravelsModelBase):
         self.assertTrue(isinstance(zone.locations[0], models.Location))
 
 
+class ClientTestCase(TestTravelsModelBase):
+    """Test travels models"""
+
+    def setUp(self):
+        super().setUp()
+
+    def test_save_normalize_email(self):
+        """Test client save normalizes the email"""
+
+        client = self.create_client(email=" Test.Client@Test.com ")
+        self.assertEqual(client.email, "test.client@test.com")
+
+    def test_merge_clients(self):
+        """Test merge clients command with emails only different in case"""
+
+        # Create duplicated clients (bulk create skips email normalization)
+        clients = models.Client.objects.bulk_create(
+            [
+                models.Client(name="Old", email="Dup@Test.com", phone=""),
+                models.Client(name="New", email="dup@test.com ", phone="123"),
+            ]
+        )
+        for client in clients:
+            self.create_sale(client=client)
+
+        call_command("merge_clients")
+
+        # Validate single client with both sales
+        client = models.Client.objects.get()
+        self.assertEqual(client.id, clients[0].id)
+        self.assertEqual(client.email, "dup@test.com")
+        self.assertEqual(client.phone, "123")
+        self.assertEqual(models.Sale.objects.filter(client=client).count(), 2)
+
+
 class SaleTestCase(TestTravelsModelBase):
     """Test travels models"""
 
@@ -52,4 +92,64 @@ class SaleTestCase(TestTravelsModelBase):
         # Create a sale
         sale = self.create_sale()
         self.assertIsNotNone(sale.stripe_code)
-        self.assertTrue(isinstance(sale.stripe_code, uuid.UUID))
\ No newline at end of file
+        self.assertTrue(isinstance(sale.stripe_code, uuid.UUID))
+
+
+class ZonePricingTestCase(SimpleTestCase):
+    """Test zone and location prices resolution"""
+
+    def test_compress_and_resolve(self):
+        """Validate prices shared by a whole zone are stored once"""
+
+        zone_locations = {1: [10, 11, 12], 2: [20, 21]}
+        prices = {
+            (10, 1, 1): 100,
+            (11, 1, 1): 100,
+            (12, 1, 1): 120,
+            # Zone 2 without a price for location 21
+            (20, 1, 1): 90,
+        }
+
+        zone_prices, location_prices = compress_prices(prices, zone_locations)
+        self.assertEqual(zone_prices, {(1, 1, 1): 100})
+        self.assertEqual(location_prices, {(12, 1, 1): 120, (20, 1, 1): 90})
+        self.assertEqual(
+            resolve_prices(zone_prices, location_prices, zone_locations), prices
+        )
+
+
+class PostalCodeRangeTestCase(SimpleTestCase):
+    """Test postal code locations compression"""
+
+    def test_build_postal_code_ranges(self):
+        """Validate consecutive postal codes with the same prices are merged,
+        with a row per price"""
+
+        locations = [
+            (1, "23400, San Jose Downtown"),
+            (2, "23403, Puerto Los Cabos"),
+            (3, "23403, Colonia La Playa"),
+            (4, "23405, Palmilla"),
+            (5, "23405, Cabo Real"),
+            (6, "23500, Santiago"),
+            (7, "Without postal code"),
+        ]
+        prices = {
+            (1, 1, 1): 90,
+            (2, 1, 1): 90,
+            (3, 1, 1): 90,
+            (4, 1, 1): 90,
+            (5, 1, 1): 105,
+            (6, 1, 1): 230,
+            (7, 1, 1): 90,
+        }
+
+        self.assertEqual(
+            build_postal_code_ranges(locations, prices),
+            [
+                ("23400", "23403", 1),
+                ("23405", "23405", 4),
+                ("23405", "23405", 5),
+                ("23500", "23500", 6),
+            ],
+        )
@@ -1,15 +1,32 @@
+import csv
+import datetime
+import gzip
+import io
 import json
+import uuid
 from time import sleep
+from unittest.mock import patch
 
+from django.core.cache import cache
 from django.core.management import call_command
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
 from rest_framework import status
 
+import requests
+
 from core.tests_base.test_models import TestTravelsModelBase
-from core.tests_base.test_views import TestApiViewsMethods, TestSeleniumBase
-from travels import models
+from core.tests_base.test_views import (
+    TestApiViewsMethods,
+    TestCachedApiViewsBase,
+    TestSeleniumBase,
+)
+from travels import exports, models
+from travels.catalog import CATALOG_VERSION_KEY
 
 
 class HotelsViewSetTestCase(TestApiViewsMethods, TestTravelsModelBase):
@@ -64,6 +81,34 @@ class HotelsViewSetTestCase(TestApiViewsMethods, TestTravelsModelBase):
         self.assertEqual(results[0]["id"], zone.id)
         self.assertEqual(len(results[0]["locations"]), 0)
 
+    def test_get_hotels_constant_queries(self):
+        """Test get hotels query count does not grow with zones and hotels"""
+
+        def get_queries_count():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(self.endpoint, {"page-size": 100})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return len(queries)
+
+        # Create a zone with a single location
+        self.create_location(zone=self.create_zone())
+        queries_count = get_queries_count()
+
+        # Create more zones with many locations
+        for _ in range(5):
+            zone = self.create_zone()
+            for _ in range(10):
+                self.create_location(zone=zone)
+
+        # Validate same number of queries
+        self.assertEqual(get_queries_count(), queries_count)
+
+        # Validate all locations returned
+        response = self.client.get(self.endpoint, {"page-size": 100})
+        results = response.json()["results"]
+        self.assertEqual(len(results), 6)
+        self.assertEqual(sum(len(zone["locations"]) for zone in results), 51)
+
 
 class PostalCodeViewSetTestCase(TestApiViewsMethods, TestTravelsModelBase):
     """Test postal code views"""
@@ -112,6 +157,90 @@ class PostalCodeViewSetTestCase(TestApiViewsMethods, TestTravelsModelBase):
         results = response_json["results"]
         self.assertEqual(len(results), 0)
 
+    def get_lookup_data(self, code: str) -> dict:
+        """Lookup a postal code and validate status code"""
+
+        response = self.client.get(f"{self.endpoint}lookup/", {"code": code})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()["data"]
+
+    def test_lookup_inside_range(self):
+        """Test get the location of a postal code that is not the first of
+        its range, with its current prices"""
+
+        zone = self.create_zone(name="Codigo Postal")
+        location = self.create_location(zone=zone, name="23406, Costa Azul")
+        pricing = self.create_pricing(location=location, price=90)
+        models.PostalCodeRange.objects.create(
+            start="23406", end="23407", location=location
+        )
+        models.PostalCodeRange.objects.create(
+            start="23450", end="23450", location=self.create_location(zone=zone)
+        )
+
+        data = self.get_lookup_data("23407")
+        self.assertEqual(
+            (data["code"], data["start"], data["end"]), ("23407", "23406", "23407")
+        )
+        self.assertEqual(
+            [(row["id"], row["name"]) for row in data["locations"]],
+            [(location.id, location.name)],
+        )
+        self.assertEqual(
+            [
+                (row["vehicle"]["id"], row["service_type"]["id"], row["price"])
+                for row in data["locations"][0]["pricing"]
+            ],
+            [(pricing.vehicle_id, pricing.service_type_id, 90.0)],
+        )
+
+        # Prices are resolved when looked up
+        pricing.price = 95
+        pricing.save()
+        data = self.get_lookup_data("23407")
+        self.assertEqual(data["locations"][0]["pricing"][0]["price"], 95.0)
+
+    def test_lookup_many_prices(self):
+        """Test get a location of each price of a postal code"""
+
+        zone = self.create_zone(name="Codigo Postal")
+        locations = [
+            self.create_location(zone=zone, name="23405, Palmilla"),
+            self.create_location(zone=zone, name="23405, Cabo Real"),
+        ]
+        for location, price in zip(locations, [105, 120]):
+            models.PostalCodeRange.objects.create(
+                start="23405", end="23405", location=location
+            )
+            self.create_pricing(location=location, price=price)
+
+        data = self.get_lookup_data("23405")
+        self.assertEqual(
+            [
+                (row["id"], [price["price"] for price in row["pricing"]])
+                for row in data["locations"]
+            ],
+            [(locations[0].id, [105.0]), (locations[1].id, [120.0])],
+        )
+
+    def test_lookup_not_found(self):
+        """Test postal codes outside the ranges and invalid postal codes"""
+
+        zone = self.create_zone(name="Codigo Postal")
+        models.PostalCodeRange.objects.create(
+            start="23406", end="23444", location=self.create_location(zone=zone)
+        )
+
+        for code in ("23400", "23445"):
+            response = self.client.get(f"{self.endpoint}lookup/", {"code": code})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+            self.assertEqual(response.json()["message"], "Postal code not found")
+
+        for code in ("", "234", "2340a", "234000"):
+            response = self.client.get(f"{self.endpoint}lookup/", {"code": code})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.json()["message"], "Invalid postal code")
+
 
 class VehicleViewSetTestCase(TestApiViewsMethods, TestTravelsModelBase):
     """Test vehicle views"""
@@ -338,6 +467,462 @@ class PricingViewSetTestCase(TestApiViewsMethods, TestTravelsModelBase):
         self.assertEqual(results[0]["service_type"]["name"], service_type1.name)
         self.assertEqual(results[0]["price"], 100.00)
 
+    def test_get_pricing_updated_price(self):
+        """Test get pricing after a price change (cache invalidated)"""
+
+        # Create pricing and load it
+        pricing = self.create_pricing(price=100)
+        response = self.client.get(self.endpoint)
+        self.assertEqual(response.json()["results"][0]["price"], 100.00)
+
+        # Update price
+        pricing.price = 150
+        pricing.save()
+
+        # Validate new price returned
+        response = self.client.get(self.endpoint)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["results"][0]["price"], 150.00)
+
+    def test_get_pricing_filter_invalid(self):
+        """Test get pricing with a location that does not exist"""
+
+        self.create_pricing()
+
+        # Get data and validate status code
+        response = self.client.get(self.endpoint, {"location": 999})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # Validate error
+        response_json = response.json()
+        self.assertEqual(response_json["status"], "error")
+        self.assertIn("location", response_json["data"])
+
+    def test_get_pricing_matrix_layout(self):
+        """Test get pricing with the matrix layout"""
+
+        # Create pricing for 2 locations, 2 vehicles and 1 service type
+        zone = self.create_zone()
+        location1 = self.create_location(name="location 1", zone=zone)
+        location2 = self.create_location(name="location 2", zone=zone)
+        vehicle1 = self.create_vehicle(name="vehicle 1")
+        vehicle2 = self.create_vehicle(name="vehicle 2")
+        service_type = self.create_service_type(name="service type 1")
+        self.create_pricing(location1, vehicle1, service_type, 90)
+        self.create_pricing(location1, vehicle2, service_type, 100)
+        self.create_pricing(location2, vehicle1, service_type, 120)
+
+        # Get data and validate status code
+        response = self.client.get(self.endpoint, {"layout": "matrix"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Validate data
+        self.assertEqual(
+            response.json(),
+            {
+                "locations": {
+                    str(location1.id): location1.name,
+                    str(location2.id): location2.name,
+                },
+                "vehicles": {
+                    str(vehicle1.id): vehicle1.name,
+                    str(vehicle2.id): vehicle2.name,
+                },
+                "service_types": {str(service_type.id): service_type.name},
+                "prices": [[[90.0], [100.0]], [[120.0], [None]]],
+            },
+        )
+
+        # Validate filters
+        response = self.client.get(
+            self.endpoint, {"layout": "matrix", "vehicle": vehicle2.id}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.json(),
+            {
+                "locations": {str(location1.id): location1.name},
+                "vehicles": {str(vehicle2.id): vehicle2.name},
+                "service_types": {str(service_type.id): service_type.name},
+                "prices": [[[100.0]]],
+            },
+        )
+
+
+class PricingMatrixTestCase(TestCachedApiViewsBase):
+    """Test pricing served from the in-process pricing matrix"""
+
+    def setUp(self):
+        super().setUp(endpoint="/api/pricing/")
+
+        # Create pricing
+        zone = models.Zone.objects.create(name="zone 1")
+        self.location = models.Location.objects.create(name="location 1", zone=zone)
+        self.vehicle = models.Vehicle.objects.create(name="vehicle 1")
+        self.service_type = models.ServiceType.objects.create(name="service type 1")
+        self.pricing = models.Pricing.objects.create(
+            location=self.location,
+            vehicle=self.vehicle,
+            service_type=self.service_type,
+            price=100,
+        )
+
+    def test_pricing_loaded_once(self):
+        """Validate the pricing matrix is only loaded in the first request"""
+
+        _, catalog_queries = self.get_travels_queries()
+        self.assertNotEqual(catalog_queries, [])
+
+        response_json, catalog_queries = self.get_travels_queries(
+            {"location": self.location.id}
+        )
+        self.assertEqual(catalog_queries, [])
+        self.assertEqual(len(response_json["results"]), 1)
+        self.assertEqual(response_json["results"][0]["price"], 100.00)
+
+    def test_pricing_invalidated(self):
+        """Validate the pricing matrix is loaded again after a price change"""
+
+        self.get_travels_queries()
+
+        # Update price
+        self.pricing.price = 150
+        self.pricing.save()
+
+        response_json, catalog_queries = self.get_travels_queries()
+        self.assertNotEqual(catalog_queries, [])
+        self.assertEqual(response_json["results"][0]["price"], 150.00)
+
+        # Delete vehicle (and its pricing)
+        self.vehicle.delete()
+
+        response_json, _ = self.get_travels_queries()
+        self.assertEqual(response_json["results"], [])
+
+    def test_pricing_invalidated_by_other_process(self):
+        """Validate the pricing matrix is loaded again after another
+        process (like load_pricing) changed the catalog"""
+
+        self.get_travels_queries()
+
+        # Other process: prices and version saved in the database, its
+        # cache not shared with this process
+        models.Pricing.objects.filter(id=self.pricing.id).update(price=150)
+        models.CatalogVersion.objects.filter(id=1).update(version="other")
+
+        # Served from the snapshot until the cached version expires
+        response_json, _ = self.get_travels_queries()
+        self.assertEqual(response_json["results"][0]["price"], 100.00)
+
+        cache.delete(CATALOG_VERSION_KEY)
+        response_json, catalog_queries = self.get_travels_queries()
+        self.assertNotEqual(catalog_queries, [])
+        self.assertEqual(response_json["results"][0]["price"], 150.00)
+
+
+class CatalogViewTestCase(TestApiViewsMethods, TestTravelsModelBase):
+    """Test catalog view"""
+
+    def setUp(self):
+        super().setUp(endpoint="/api/catalog/")
+
+        # Create catalog data
+        self.zone = self.create_zone()
+        self.location = self.create_location(zone=self.zone)
+        self.vehicle = self.create_vehicle(passengers=4)
+        self.service_type = self.create_service_type()
+        self.pricing = self.create_pricing(
+            location=self.location,
+            vehicle=self.vehicle,
+            service_type=self.service_type,
+            price=90,
+        )
+
+    def test_get_catalog(self):
+        """Test get catalog data"""
+
+        # Get data and validate status code
+        response = self.client.get(self.endpoint)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["ETag"])
+
+        # Validate data
+        response_json = json.loads(response.content)
+        self.assertEqual(response_json["status"], "success")
+        data = response_json["data"]
+        self.assertEqual(
+            data["zones"],
+            [
+                {
+                    "id": self.zone.id,
+                    "name": self.zone.name,
+                    "locations": [
+                        {"id": self.location.id, "name": self.location.name}
+                    ],
+                }
+            ],
+        )
+        self.assertEqual(
+            data["vehicles"],
+            [{"id": self.vehicle.id, "name": self.vehicle.name, "passengers": 4}],
+        )
+        self.assertEqual(
+            data["service_types"],
+            [{"id": self.service_type.id, "name": self.service_type.name}],
+        )
+        self.assertEqual(
+            data["pricing"],
+            [[self.location.id, self.vehicle.id, self.service_type.id, 90.0]],
+        )
+
+    def test_get_catalog_zone_pricing(self):
+        """Test zone prices are sent once per zone, and resolved for each
+        location by the pricing matrix"""
+
+        other_location = self.create_location(zone=self.zone)
+        zone_pricing = models.ZonePricing.objects.create(
+            zone=self.zone,
+            vehicle=self.vehicle,
+            service_type=self.service_type,
+            price=100,
+        )
+
+        # Catalog: zone price and location price
+        data = self.client.get(self.endpoint).json()["data"]
+        self.assertEqual(
+            data["zone_pricing"],
+            [[self.zone.id, self.vehicle.id, self.service_type.id, 100.0]],
+        )
+        self.assertEqual(
+            data["pricing"],
+            [[self.location.id, self.vehicle.id, self.service_type.id, 90.0]],
+        )
+
+        # Pricing api: location prices, with their id
+        results = self.client.get("/api/pricing/").json()["results"]
+        self.assertEqual(
+            [(row["id"], row["location"]["id"], row["price"]) for row in results],
+            [(self.pricing.id, self.location.id, 90.0)],
+        )
+        row = self.client.get(f"/api/pricing/{self.pricing.id}/").json()
+        self.assertEqual(row, results[0])
+
+        # Zone pricing api: zone prices, with their id
+        results = self.client.get("/api/zone-pricing/").json()["results"]
+        self.assertEqual(
+            [(row["id"], row["zone"], row["price"]) for row in results],
+            [
+                (
+                    zone_pricing.id,
+                    {"id": self.zone.id, "name": self.zone.name},
+                    100.0,
+                )
+            ],
+        )
+        row = self.client.get(f"/api/zone-pricing/{zone_pricing.id}/").json()
+        self.assertEqual(row, results[0])
+
+        # Matrix layout: resolved price of each location
+        matrix = self.client.get("/api/pricing/", {"layout": "matrix"}).json()
+        self.assertEqual(
+            list(matrix["locations"]),
+            [str(self.location.id), str(other_location.id)],
+        )
+        self.assertEqual(matrix["prices"], [[[90.0]], [[100.0]]])
+
+    def test_get_catalog_gzip(self):
+        """Test get catalog data compressed"""
+
+        response = self.client.get(self.endpoint, HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+
+        # Validate same data as uncompressed
+        uncompressed = self.client.get(self.endpoint)
+        self.assertEqual(gzip.decompress(response.content), uncompressed.content)
+
+    def test_get_catalog_not_modified(self):
+        """Test get catalog again with the same etag"""
+
+        response = self.client.get(self.endpoint)
+        etag = response["ETag"]
+
+        # Get data again and validate not modified
+        response = self.client.get(self.endpoint, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["ETag"], etag)
+
+    def test_get_catalog_changed(self):
+        """Test get catalog with an old etag after a price change"""
+
+        response = self.client.get(self.endpoint)
+        etag = response["ETag"]
+
+        # Update price
+        self.pricing.price = 95
+        self.pricing.save()
+
+        # Validate new data returned
+        response = self.client.get(self.endpoint, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        data = json.loads(response.content)["data"]
+        self.assertEqual(data["pricing"][0][3], 95.0)
+
+
+class CatalogChangesViewTestCase(TestApiViewsMethods, TestTravelsModelBase):
+    """Test catalog changes (delta sync) view"""
+
+    def setUp(self):
+        super().setUp(endpoint="/api/catalog/changes/")
+
+        # Create catalog data
+        self.zone = self.create_zone()
+        self.location = self.create_location(zone=self.zone)
+        self.vehicle = self.create_vehicle()
+        self.pricing = self.create_pricing(location=self.location, vehicle=self.vehicle)
+
+    def test_get_all_rows(self):
+        """Test get changes without since (full sync)"""
+
+        # Get data and validate status code
+        response = self.client.get(self.endpoint)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Validate data
+        data = response.json()["data"]
+        self.assertEqual(data["zones"], [{"id": self.zone.id, "name": self.zone.name}])
+        self.assertEqual(len(data["locations"]), 1)
+        self.assertEqual(data["locations"][0]["zone"], self.zone.id)
+        self.assertEqual(len(data["pricing"]), 1)
+        self.assertEqual(data["pricing"][0]["location"], self.location.id)
+        self.assertEqual(data["deleted"]["vehicle"], [])
+        self.assertIsNotNone(data["until"])
+
+    def test_get_changes_since(self):
+        """Test get only the rows changed and deleted after since"""
+
+        since = timezone.now()
+
+        # Update location and delete vehicle (and its pricing)
+        self.location.name = "updated location"
+        self.location.save()
+        vehicle_id = self.vehicle.id
+        self.vehicle.delete()
+
+        # Get data and validate status code
+        response = self.client.get(self.endpoint, {"since": since.isoformat()})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Validate only changed rows
+        data = response.json()["data"]
+        self.assertEqual(data["zones"], [])
+        self.assertEqual(data["vehicles"], [])
+        self.assertEqual(data["pricing"], [])
+        self.assertEqual(
+            data["locations"],
+            [{"id": self.location.id, "name": "updated location", "zone": self.zone.id}],
+        )
+
+        # Validate tombstones
+        self.assertEqual(data["deleted"]["vehicle"], [vehicle_id])
+        self.assertEqual(data["deleted"]["pricing"], [self.pricing.id])
+        self.assertEqual(data["deleted"]["location"], [])
+
+    def test_get_changes_invalid_since(self):
+        """Test get changes with an invalid since"""
+
+        response = self.client.get(self.endpoint, {"since": "yesterday"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()["message"], "Invalid since timestamp")
+
+
+class FlatExportViewTestCase(TestApiViewsMethods, TestTravelsModelBase):
+    """Test csv and ndjson export views"""
+
+    def setUp(self):
+        super().setUp(endpoint="/api/exports/sales/")
+
+        # Create sales with transfers
+        self.sales = [self.create_sale() for _ in range(5)]
+        for sale in self.sales:
+            self.create_transfer(sale=sale)
+
+    def get_content(self, endpoint: str, params: dict) -> str:
+        """Get the streamed export content"""
+        response = self.client.get(endpoint, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("attachment;", response["Content-Disposition"])
+        return b"".join(response.streaming_content).decode()
+
+    def test_get_sales_csv(self):
+        """Test export sales to csv, with client, location and zone"""
+
+        content = self.get_content(self.endpoint, {"file_format": "csv"})
+        rows = list(csv.DictReader(io.StringIO(content)))
+
+        self.assertEqual(len(rows), 5)
+        for row, sale in zip(rows, self.sales):
+            self.assertEqual(row["id"], str(sale.id))
+            self.assertEqual(row["stripe_code"], str(sale.stripe_code))
+            self.assertEqual(row["client_email"], sale.client.email)
+            self.assertEqual(row["location"], sale.location.name)
+            self.assertEqual(row["zone"], sale.location.zone.name)
+            self.assertEqual(row["vehicle"], sale.vehicle.name)
+
+    def test_get_transfers_ndjson(self):
+        """Test export transfers to ndjson, with the sale data"""
+
+        content = self.get_content(
+            "/api/exports/transfers/", {"file_format": "ndjson"}
+        )
+        rows = [json.loads(line) for line in content.splitlines()]
+
+        self.assertEqual(len(rows), 5)
+        for row, sale in zip(rows, self.sales):
+            self.assertEqual(row["type"], "arrival")
+            self.assertEqual(row["sale_id"], sale.id)
+            self.assertEqual(row["client_name"], sale.client.name)
+            self.assertEqual(row["zone"], sale.location.zone.name)
+
+    def test_get_since(self):
+        """Test export only the sales updated after since"""
+
+        since = timezone.now()
+        models.Sale.objects.filter(id=self.sales[0].id).update(
+            updated_at=since + datetime.timedelta(seconds=1)
+        )
+
+        content = self.get_content(
+            self.endpoint, {"file_format": "ndjson", "since": since.isoformat()}
+        )
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([row["id"] for row in rows], [self.sales[0].id])
+
+    def test_get_invalid_format(self):
+        """Test export with an unknown format"""
+
+        response = self.client.get(self.endpoint, {"file_format": "pdf"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()["message"], "Invalid file format")
+
+    def test_keyset_chunks(self):
+        """Test rows are loaded by chunks with one query each"""
+
+        with CaptureQueriesContext(connection) as queries:
+            rows = list(
+                exports.stream_flat_export(
+                    "sales", models.Sale.objects.all(), "ndjson", chunk_size=2
+                )
+            )
+
+        self.assertEqual(len(queries), 3)
+        self.assertEqual(
+            [json.loads(row)["id"] for row in rows],
+            [sale.id for sale in self.sales],
+        )
+
 
 # class VipCodeValidationViewTestCase(TestApiViewsMethods, TestTravelsModelBase):
 #     """Test vip code validation views"""
@@ -443,7 +1028,7 @@ class SaleViewSetTestCase(TestApiViewsMethods, TestTravelsModelBase):
     @classmethod
     def setUpTestData(cls):
         # Create db
-        call_command("apps_loaddata")
+        call_command("apps_loaddata", verbosity=0)
         call_command("load_pricing")
 
     def setUp(self):
@@ -577,6 +1162,91 @@ class SaleViewSetTestCase(TestApiViewsMethods, TestTravelsModelBase):
         # Validate no data created
         self.validate_no_data_created()
 
+    def test_post_no_pricing(self):
+        """Test post with a location, vehicle and service type without pricing
+        Expected: error, no pricing found
+        """
+
+        # Delete pricing of the sale options (location and zone prices)
+        models.Pricing.objects.filter(
+            location=self.data["location"],
+            vehicle=self.data["vehicle"],
+            service_type=self.data["service_type"],
+        ).delete()
+        models.ZonePricing.objects.filter(
+            zone__location=self.data["location"],
+            vehicle=self.data["vehicle"],
+            service_type=self.data["service_type"],
+        ).delete()
+
+        # Send json post data and validate status code
+        response = self.client.post(
+            self.endpoint, json.dumps(self.data), content_type="application/json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # Validate data
+        response_json = response.json()
+        self.assertEqual(response_json["status"], "error")
+        self.assertEqual(response_json["message"], "Invalid sale data")
+        self.assertIn("non_field_errors", response_json["errors"])
+
+        # Validate no data created
+        self.validate_no_data_created()
+
+    def test_post_payment_link_error(self):
+        """Test post when the payment host is down
+        Expected: sale created, payment link pending retry (error status)
+        """
+
+        # Send json post data with stripe failing and validate status code
+        with patch(
+            "travels.tasks.get_payment_link",
+            side_effect=requests.ConnectionError("Payment host down"),
+        ):
+            response = self.client.post(
+                self.endpoint, json.dumps(self.data), content_type="application/json"
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        # Validate data
+        response_json = response.json()
+        self.assertEqual(response_json["status"], "success")
+        self.assertIsNone(response_json["data"]["payment_link"])
+        sale = models.Sale.objects.get(client__email=self.data["client_email"])
+        self.assertEqual(response_json["data"]["stripe_code"], str(sale.stripe_code))
+        self.assertEqual(sale.payment_link_status, "error")
+
+    def test_post_existing_client(self):
+        """Test post two sales with the same email (different case)
+        Expected: single client with both sales, names not overwritten
+        """
+
+        # Send json post data twice, payment link errors are ignored
+        with patch(
+            "travels.tasks.get_payment_link",
+            side_effect=requests.ConnectionError("Payment host down"),
+        ):
+            for email, name, last_name in [
+                ("John.Doe@example.com ", "John", None),
+                ("john.doe@example.com", "Someone", "Doe"),
+            ]:
+                self.data["client_email"] = email
+                self.data["client_name"] = name
+                self.data["client_last_name"] = last_name
+                response = self.client.post(
+                    self.endpoint,
+                    json.dumps(self.data),
+                    content_type="application/json",
+                )
+                self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        # Validate data
+        client = models.Client.objects.get()
+        self.assertEqual(client.email, "john.doe@example.com")
+        self.assertEqual((client.name, client.last_name), ("John", "Doe"))
+        self.assertEqual(models.Sale.objects.filter(client=client).count(), 2)
+
     def test_post_ok_one_way(self):
         """Test post ok one way
         Expected: ok
@@ -722,6 +1392,63 @@ class SaleViewSetTestCase(TestApiViewsMethods, TestTravelsModelBase):
         self.assertEqual(response_json["data"]["client"]["email"], sale.client.email)
 
 
+class SaleDataCacheTestCase(TestCachedApiViewsBase):
+    """Test sale data served from cache"""
+
+    def setUp(self):
+        super().setUp(endpoint="/api/sales/")
+
+        # Create sale
+        zone = models.Zone.objects.create(name="zone 1")
+        client = models.Client.objects.create(name="John", email="john@example.com")
+        self.sale = models.Sale.objects.create(
+            client=client,
+            vehicle=models.Vehicle.objects.create(name="vehicle 1"),
+            service_type=models.ServiceType.objects.create(name="service type 1"),
+            location=models.Location.objects.create(name="location 1", zone=zone),
+            total=100,
+        )
+
+    def get_sale_queries(self) -> tuple[dict, list]:
+        """Get sale data and the queries to travels tables used to get it"""
+        return self.get_travels_queries({"stripe_code": self.sale.stripe_code})
+
+    def test_sale_single_query_cached(self):
+        """Validate the sale is loaded in a single query, only once"""
+
+        response_json, sale_queries = self.get_sale_queries()
+        self.assertEqual(len(sale_queries), 1)
+        self.assertEqual(response_json["data"]["client"]["name"], "John")
+
+        response_json, sale_queries = self.get_sale_queries()
+        self.assertEqual(sale_queries, [])
+        self.assertEqual(response_json["data"]["id"], self.sale.id)
+
+    def test_sale_invalidated(self):
+        """Validate the sale data is loaded again after a change"""
+
+        self.get_sale_queries()
+
+        # Update sale
+        self.sale.total = 150
+        self.sale.save()
+        response_json, sale_queries = self.get_sale_queries()
+        self.assertEqual(len(sale_queries), 1)
+        self.assertEqual(response_json["data"]["total"], 150)
+
+        # Update client
+        self.sale.client.name = "Jane"
+        self.sale.client.save()
+        response_json, _ = self.get_sale_queries()
+        self.assertEqual(response_json["data"]["client"]["name"], "Jane")
+
+        # Update location (catalog)
+        self.sale.location.name = "location 2"
+        self.sale.location.save()
+        response_json, _ = self.get_sale_queries()
+        self.assertEqual(response_json["data"]["location"]["name"], "location 2")
+
+
 class SaleViewSetLiveTestCase(TestSeleniumBase):
     """Test sale view set live"""
 
@@ -740,7 +1467,7 @@ class SaleViewSetLiveTestCase(TestSeleniumBase):
         self.client.login(username=username, password=password)
 
         # Create db
-        call_command("apps_loaddata")
+        call_command("apps_loaddata", verbosity=0)
         call_command("load_pricing")
 
         # Create sale
@@ -849,13 +1576,86 @@ class SaleViewSetLiveTestCase(TestSeleniumBase):
         self.assertIn(settings.LANDING_HOST, self.driver.current_url)
 
 
+class SalePaymentLinkViewTestCase(TestApiViewsMethods, TestTravelsModelBase):
+    """Test sale payment link view"""
+
+    def setUp(self):
+        super().setUp(endpoint="/api/sales/payment-link/")
+        self.sale = self.create_sale()
+        self.payment_link = "https://checkout.stripe.com/c/pay/test"
+
+    def get_payment_link_data(self, stripe_code: str) -> dict:
+        """Get payment link data and validate status code"""
+
+        response = self.client.get(self.endpoint, {"stripe_code": stripe_code})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response_json = response.json()
+        self.assertEqual(response_json["status"], "success")
+        return response_json["data"]
+
+    def test_get_pending(self):
+        """Test get payment link while it is being generated"""
+
+        data = self.get_payment_link_data(self.sale.stripe_code)
+        self.assertEqual(data, {"status": "pending", "payment_link": None})
+
+    def test_get_ready(self):
+        """Test get payment link already generated"""
+
+        self.sale.payment_link = self.payment_link
+        self.sale.payment_link_status = "ready"
+        self.sale.save()
+
+        data = self.get_payment_link_data(self.sale.stripe_code)
+        self.assertEqual(data, {"status": "ready", "payment_link": self.payment_link})
+
+    def test_get_error_retried(self):
+        """Test get payment link after a failure generates it again"""
+
+        self.sale.payment_link_status = "error"
+        self.sale.save()
+
+        with patch(
+            "travels.tasks.get_payment_link", return_value=self.payment_link
+        ) as get_payment_link:
+            data = self.get_payment_link_data(self.sale.stripe_code)
+        get_payment_link.assert_called_once()
+        self.assertEqual(data, {"status": "ready", "payment_link": self.payment_link})
+
+    def test_get_stale_pending_retried(self):
+        """Test get payment link pending for too long (lost task) generates
+        it again"""
+
+        models.Sale.objects.filter(id=self.sale.id).update(
+            updated_at=timezone.now()
+            - datetime.timedelta(seconds=settings.PAYMENT_LINK_PENDING_TIMEOUT + 1)
+        )
+
+        with patch(
+            "travels.tasks.get_payment_link", return_value=self.payment_link
+        ) as get_payment_link:
+            data = self.get_payment_link_data(self.sale.stripe_code)
+
+            # Recent pending payment links are not generated again
+            self.get_payment_link_data(self.create_sale().stripe_code)
+        get_payment_link.assert_called_once()
+        self.assertEqual(data, {"status": "ready", "payment_link": self.payment_link})
+
+    def test_get_not_found(self):
+        """Test get payment link of a sale that does not exist"""
+
+        response = self.client.get(self.endpoint, {"stripe_code": "invalid"})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.json()["message"], "Sale not found")
+
+
 class SaleDoneViewTestCase(TestApiViewsMethods, TestTravelsModelBase):
     """Test sale done view"""
 
     @classmethod
     def setUpTestData(cls):
         """Load fixtures only once"""
-        call_command("apps_loaddata")
+        call_command("apps_loaddata", verbosity=0)
         call_command("load_pricing")
 
     def setUp(self):
@@ -1133,6 +1933,56 @@ class SaleDoneViewTestCase(TestApiViewsMethods, TestTravelsModelBase):
         # Valdiate no transfer created
         self.assertEqual(models.Transfer.objects.count(), 0)
 
+    def test_post_sale_not_found(self):
+        """Test get sale done with a stripe code without sale
+        Expected: error redirect
+        """
+
+        # Change stripe code in data
+        self.data["sale_stripe_code"] = str(uuid.uuid4())
+        self.data.update(self.arrival_data)
+
+        # Get data and validate status code
+        response = self.client.post(self.endpoint, self.data)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        # Validate error
+        response_json = response.json()
+        self.assertEqual(response_json["status"], "error")
+        self.assertEqual(response_json["message"], "Invalid sale data")
+        self.assertEqual(models.Transfer.objects.count(), 0)
+
+    def test_post_single_write_per_table(self):
+        """Submit round trip sale data
+        Expected ok: sale read once, one write per table
+        """
+
+        # Update sale service type in db
+        self.sale.service_type = models.ServiceType.objects.get(name="Round Trip")
+        self.sale.save()
+
+        departing_data = self.data.copy()
+        departing_data.update(self.arrival_data)
+        departing_data.update(self.departure_data)
+
+        # Get data and validate status code
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.endpoint, departing_data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Validate writes (transaction and cache invalidation queries excluded)
+        statements = [
+            query["sql"].split()[0]
+            for query in queries.captured_queries
+            if "travels_" in query["sql"]
+        ]
+        self.assertEqual(statements[0], "SELECT")
+        self.assertEqual(
+            [statement for statement in statements if statement != "SELECT"],
+            ["UPDATE", "UPDATE", "INSERT"],
+        )
+        self.assertEqual(models.Transfer.objects.filter(sale=self.sale).count(), 2)
+
     def test_post_sale_already_paid(self):
         """Test get sale done with sale already paid
         Expected: error redirect
@@ -1,23 +1,97 @@
+import datetime
+
 from rest_framework import viewsets
+from rest_framework.decorators import action
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework import status
+from rest_framework import permissions, status
+from rest_framework.exceptions import ValidationError
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch, Q
+from django.forms import ModelChoiceField
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.dateparse import parse_datetime
 
 from django_filters.rest_framework import DjangoFilterBackend
 
+from travels import exports
 from travels import models
 from travels import serializers
-from utils.stripe import get_payment_link
+from travels.catalog import get_catalog
+from travels.sales import get_sale_data
+from travels.tasks import create_payment_link
+from utils.tasks import enqueue
 
 
 class HotelsViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = models.Zone.objects.exclude(name="Codigo Postal").order_by("id")
+    queryset = (
+        models.Zone.objects.exclude(name="Codigo Postal")
+        .prefetch_related(
+            Prefetch("location_set", queryset=models.Location.objects.order_by("id"))
+        )
+        .order_by("id")
+    )
     serializer_class = serializers.ZoneSerializer
 
 
 class PostalCodeViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = models.Location.objects.filter(zone__name="Codigo Postal").order_by("id")
-    serializer_class = serializers.ZoneSerializer
+    serializer_class = serializers.LocationSerializer
+
+    @action(detail=False, methods=["get"])
+    def lookup(self, request):
+        """Get the range of a postal code (?code=) and the locations whose
+        current prices apply to it (one per price), found in the
+        in-process postal code ranges (no db queries)"""
+
+        code = request.query_params.get("code", "").strip()
+        if not models.PostalCodeRange.postal_code_validator.regex.match(code):
+            return Response(
+                {
+                    "status": "error",
+                    "message": "Invalid postal code",
+                    "data": {},
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        catalog = get_catalog()
+        postal_code_range = catalog.find_postal_code(code)
+        if postal_code_range is None:
+            return Response(
+                {
+                    "status": "error",
+                    "message": "Postal code not found",
+                    "data": {},
+                },
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        start, end, location_ids = postal_code_range
+        return Response(
+            {
+                "status": "success",
+                "message": "Postal code retrieved successfully",
+                "data": {
+                    "code": code,
+                    "start": start,
+                    "end": end,
+                    "locations": [
+                        {
+                            "id": location_id,
+                            "name": catalog.locations[location_id]["name"],
+                            "pricing": catalog.location_prices.get(location_id, []),
+                        }
+                        for location_id in location_ids
+                    ],
+                },
+            },
+            status=status.HTTP_200_OK,
+        )
 
 
 class VehicleViewSet(viewsets.ReadOnlyModelViewSet):
@@ -30,12 +104,212 @@ class ServiceTypeViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = serializers.ServiceTypeSerializer
 
 
+def get_catalog_filters(request, catalog_ids: dict) -> dict:
+    """Get the id filters of the query params, validated against the
+    catalog ids like the filterset would do
+
+    Args:
+        request (Request): Api request
+        catalog_ids (dict): Catalog rows by id, by filter field
+
+    Raises:
+        ValidationError: Filter id not in the catalog
+
+    Returns:
+        dict: Id by filter field
+    """
+
+    filters = {}
+    for field, ids in catalog_ids.items():
+        value = request.query_params.get(field)
+        if value in (None, ""):
+            continue
+        try:
+            value = int(value)
+        except ValueError:
+            value = None
+        if value not in ids:
+            raise ValidationError(
+                {field: [ModelChoiceField.default_error_messages["invalid_choice"]]}
+            )
+        filters[field] = value
+    return filters
+
+
 class PricingViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = models.Pricing.objects.all().order_by("id")
     serializer_class = serializers.PricingSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ["location", "vehicle", "service_type"]
 
+    def list(self, request, *args, **kwargs):
+        """List the location prices from the in-process pricing matrix (no
+        db queries). Locations without their own price use the price of
+        their zone (see /api/zone-pricing/)
+
+        Use ?layout=matrix to get the resolved price of every location in
+        a columnar layout (not paginated)
+        """
+
+        catalog = get_catalog()
+        filters = get_catalog_filters(
+            request,
+            {
+                "location": catalog.locations,
+                "vehicle": catalog.vehicles,
+                "service_type": catalog.service_types,
+            },
+        )
+
+        # Columnar layout: names once and a dense price array
+        if request.query_params.get("layout") == "matrix":
+            if filters:
+                return Response(catalog.get_pricing_matrix(**filters))
+            return Response(catalog.pricing_matrix)
+
+        rows = catalog.filter_pricing(**filters)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(rows)
+
+
+class ZonePricingViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = models.ZonePricing.objects.select_related(
+        "zone", "vehicle", "service_type"
+    ).order_by("id")
+    serializer_class = serializers.ZonePricingSerializer
+
+    def list(self, request, *args, **kwargs):
+        """List the default prices of the zones from the in-process
+        pricing matrix (no db queries)"""
+
+        catalog = get_catalog()
+        filters = get_catalog_filters(
+            request,
+            {
+                "zone": catalog.zones,
+                "vehicle": catalog.vehicles,
+                "service_type": catalog.service_types,
+            },
+        )
+
+        rows = catalog.filter_zone_pricing(**filters)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(rows)
+
+
+class CatalogView(APIView):
+    """
+    API endpoint to get all the catalog data (zones, locations, vehicles,
+    service types and pricing) in a single pre-compressed response
+
+    The price of a location is its "pricing" row, or the "zone_pricing"
+    row of its zone when it has none
+    """
+
+    def get(self, request):
+        blob = get_catalog().blob
+
+        # Return not modified if the client already has this version
+        if_none_match = request.headers.get("If-None-Match", "")
+        etags = [etag.strip().removeprefix("W/") for etag in if_none_match.split(",")]
+        if blob.etag in etags or "*" in etags:
+            response = HttpResponseNotModified()
+        else:
+            if "gzip" in request.headers.get("Accept-Encoding", ""):
+                response = HttpResponse(blob.compressed, content_type="application/json")
+                response["Content-Encoding"] = "gzip"
+            else:
+                response = HttpResponse(blob.content, content_type="application/json")
+
+        response["ETag"] = blob.etag
+        response["Cache-Control"] = "private, no-cache"
+        patch_vary_headers(response, ("Accept-Encoding",))
+        return response
+
+
+class CatalogChangesView(APIView):
+    """
+    API endpoint to get the catalog rows changed or deleted after a
+    timestamp (delta sync). Use the returned "until" as the next "since".
+    """
+
+    # Rows updated in this window are returned again in the next sync, so
+    # rows saved by transactions that commit late are not missed
+    overlap = datetime.timedelta(minutes=1)
+
+    tables = {
+        "zones": (models.Zone, ("id", "name")),
+        "locations": (models.Location, ("id", "name", "zone")),
+        "vehicles": (models.Vehicle, ("id", "name", "passengers")),
+        "service_types": (models.ServiceType, ("id", "name")),
+        "pricing": (
+            models.Pricing,
+            ("id", "location", "vehicle", "service_type", "price"),
+        ),
+        "zone_pricing": (
+            models.ZonePricing,
+            ("id", "zone", "vehicle", "service_type", "price"),
+        ),
+        "postal_code_ranges": (
+            models.PostalCodeRange,
+            ("id", "start", "end", "location"),
+        ),
+    }
+
+    def get(self, request):
+        """Get rows updated after ?since (all rows if missing) and
+        the ids deleted after it"""
+
+        # Validate since
+        since = request.query_params.get("since")
+        if since:
+            since = parse_datetime(since)
+            if since is None:
+                return Response(
+                    {
+                        "status": "error",
+                        "message": "Invalid since timestamp",
+                        "data": {},
+                    },
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+        until = timezone.now() - self.overlap
+
+        data = {"since": since, "until": until}
+
+        # Get changed rows
+        for table, (model, fields) in self.tables.items():
+            queryset = model.objects.all()
+            if since:
+                queryset = queryset.filter(updated_at__gt=since)
+            data[table] = list(queryset.order_by("id").values(*fields))
+
+        # Get deleted ids
+        data["deleted"] = {
+            model._meta.model_name: [] for model, _ in self.tables.values()
+        }
+        if since:
+            deleted_records = models.DeletedRecord.objects.filter(
+                deleted_at__gt=since
+            ).values_list("model", "object_id")
+            for model_name, object_id in deleted_records:
+                data["deleted"].setdefault(model_name, []).append(object_id)
+
+        return Response(
+            {
+                "status": "success",
+                "message": "Catalog changes retrieved successfully",
+                "data": data,
+            },
+            status=status.HTTP_200_OK,
+        )
+
 
 # class VipCodeValidationView(APIView):
 #     """
@@ -60,6 +334,51 @@ class PricingViewSet(viewsets.ReadOnlyModelViewSet):
 #             )
 
 
+class FlatExportView(APIView):
+    """
+    API endpoint to download all the sales or transfers as csv or ndjson
+    (?file_format), optionally only the rows updated after ?since
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, kind):
+        """Stream the export"""
+
+        # Validate format
+        file_format = request.query_params.get("file_format", "csv")
+        if file_format not in exports.FLAT_EXPORT_CONTENT_TYPES:
+            return Response(
+                {
+                    "status": "error",
+                    "message": "Invalid file format",
+                    "data": {},
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # Validate since
+        model, _ = exports.FLAT_EXPORTS[kind]
+        queryset = model.objects.all()
+        since = request.query_params.get("since")
+        if since:
+            since = parse_datetime(since)
+            if since is None:
+                return Response(
+                    {
+                        "status": "error",
+                        "message": "Invalid since timestamp",
+                        "data": {},
+                    },
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+            queryset = queryset.filter(updated_at__gt=since)
+
+        return exports.get_flat_export_response(kind, queryset, file_format)
+
+
 class SaleViewSet(APIView):
     """
     API endpoint to create sales
@@ -68,11 +387,10 @@ class SaleViewSet(APIView):
     def get(self, request):
         """Get already saved sale data"""
 
-        try:
-            # Get stripe code from query params
-            stripe_code = request.query_params.get("stripe_code")
-            sale = models.Sale.objects.get(stripe_code=stripe_code)
-        except Exception:
+        # Get stripe code from query params
+        stripe_code = request.query_params.get("stripe_code")
+        sale_data = get_sale_data(stripe_code)
+        if sale_data is None:
             return Response(
                 {
                     "status": "error",
@@ -86,29 +404,7 @@ class SaleViewSet(APIView):
             {
                 "status": "success",
                 "message": "Sale data retrieved successfully",
-                "data": {
-                    "id": sale.id,
-                    "service_type": {
-                        "id": sale.service_type.id,
-                        "name": sale.service_type.name,
-                    },
-                    "location": {
-                        "id": sale.location.id,
-                        "name": sale.location.name,
-                    },
-                    "vehicle": {
-                        "id": sale.vehicle.id,
-                        "name": sale.vehicle.name,
-                        "passengers": sale.vehicle.passengers,
-                    },
-                    "total": sale.total,
-                    "stripe_code": sale.stripe_code,
-                    "client": {
-                        "name": sale.client.name,
-                        "last_name": sale.client.last_name,
-                        "email": sale.client.email,
-                    },
-                },
+                "data": sale_data,
             },
             status=status.HTTP_200_OK,
         )
@@ -118,22 +414,21 @@ class SaleViewSet(APIView):
 
         if serializer.is_valid():
             # Create data
-            sale = serializer.save()
-
-            # if not sale.vip_code:
-            payment_link = get_payment_link(
-                product_name="Mar Co. Cabo Transportation",
-                total=sale.total,
-                description=sale.get_summary(),
-                email=sale.client.email,
-                sale_id=sale.stripe_code,
-            )
+            with transaction.atomic():
+                sale = serializer.save()
+
+            # Generate payment link in background (get it from
+            # /api/sales/payment-link/ with the stripe code)
+            payment_link = enqueue(create_payment_link, sale.id)
 
             return Response(
                 {
                     "status": "success",
                     "message": "Sale created successfully",
-                    "data": {"payment_link": payment_link},
+                    "data": {
+                        "stripe_code": sale.stripe_code,
+                        "payment_link": payment_link,
+                    },
                 },
                 status=status.HTTP_201_CREATED,
             )
@@ -148,6 +443,64 @@ class SaleViewSet(APIView):
             )
 
 
+class SalePaymentLinkView(APIView):
+    """
+    API endpoint to get the payment link of a sale, generated in background
+    """
+
+    def get(self, request):
+        """Get payment link status and link (when ready)"""
+
+        try:
+            # Get stripe code from query params
+            stripe_code = request.query_params.get("stripe_code")
+            sale = models.Sale.objects.only(
+                "id", "payment_link", "payment_link_status", "updated_at"
+            ).get(stripe_code=stripe_code)
+        except Exception:
+            return Response(
+                {
+                    "status": "error",
+                    "message": "Sale not found",
+                    "data": {},
+                },
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+
+        # Retry failed payment links, and pending ones whose task was lost
+        # (only once if requested at the same time)
+        now = timezone.now()
+        stale = now - datetime.timedelta(
+            seconds=settings.PAYMENT_LINK_PENDING_TIMEOUT
+        )
+        if sale.payment_link_status == "error" or (
+            sale.payment_link_status == "pending" and sale.updated_at < stale
+        ):
+            retried = (
+                models.Sale.objects.filter(id=sale.id)
+                .filter(
+                    Q(payment_link_status="error")
+                    | Q(payment_link_status="pending", updated_at__lt=stale)
+                )
+                .update(payment_link_status="pending", updated_at=now)
+            )
+            if retried:
+                enqueue(create_payment_link, sale.id)
+            sale.refresh_from_db(fields=["payment_link", "payment_link_status"])
+
+        return Response(
+            {
+                "status": "success",
+                "message": "Payment link status retrieved successfully",
+                "data": {
+                    "status": sale.payment_link_status,
+                    "payment_link": sale.payment_link,
+                },
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
 class SaleDoneView(APIView):
     """
     API endpoint to confirm a sale
@@ -158,62 +511,72 @@ class SaleDoneView(APIView):
         serializer = serializers.SaleDoneSerializer(data=request.data)
 
         if serializer.is_valid():
-            try:
-                sale = models.Sale.objects.filter(
-                    stripe_code=serializer.validated_data["sale_stripe_code"]
-                ).first()
-            except Exception:
-                return Response(
-                    {
-                        "status": "error",
-                        "message": "Invalid sale data",
-                        "data": serializer.errors,
-                    },
-                    status=status.HTTP_401_UNAUTHORIZED,
-                )
-
-            # return error if sale already paid (already submited)
-            if sale.paid:
-                return Response(
-                    {
-                        "status": "error",
-                        "message": "Sale already paid",
-                        "data": [],
-                    },
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-
-            # Update sale
-            sale.passengers = serializer.validated_data["sale"]["passengers"]
-            sale.details = serializer.validated_data["sale"].get("details", None)
-            sale.save()
-
-            # Update client (only phone, not name or last_name)
-            client = sale.client
-            client.phone = serializer.validated_data["client"]["phone"]
-            client.save()
-
-            # Confirm sale
-            sale.paid = True
-            sale.save()
-            models.Transfer.objects.create(
-                sale=sale,
-                type="arrival",
-                date=serializer.validated_data["arrival"]["date"],
-                hour=serializer.validated_data["arrival"]["hour"],
-                airline=serializer.validated_data["arrival"]["airline"],
-                flight_number=serializer.validated_data["arrival"]["flight_number"],
-            )
-            if sale.service_type.name == "Round Trip":
-                models.Transfer.objects.create(
-                    sale=sale,
-                    type="departure",
-                    date=serializer.validated_data["departure"]["date"],
-                    hour=serializer.validated_data["departure"]["hour"],
-                    airline=serializer.validated_data["departure"]["airline"],
-                    flight_number=serializer.validated_data["departure"][
-                        "flight_number"
-                    ],
+            with transaction.atomic():
+                # Lock the sale, so concurrent submits wait for this one
+                try:
+                    sale = (
+                        models.Sale.objects.select_for_update(of=("self",))
+                        .select_related("client", "service_type")
+                        .filter(
+                            stripe_code=serializer.validated_data["sale_stripe_code"]
+                        )
+                        .first()
+                    )
+                except Exception:
+                    sale = None
+
+                if sale is None:
+                    return Response(
+                        {
+                            "status": "error",
+                            "message": "Invalid sale data",
+                            "data": serializer.errors,
+                        },
+                        status=status.HTTP_401_UNAUTHORIZED,
+                    )
+
+                # return error if sale already paid (already submited)
+                if sale.paid:
+                    return Response(
+                        {
+                            "status": "error",
+                            "message": "Sale already paid",
+                            "data": [],
+                        },
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+
+                # Update and confirm sale
+                sale.passengers = serializer.validated_data["sale"]["passengers"]
+                sale.details = serializer.validated_data["sale"].get("details", None)
+                sale.paid = True
+                sale.save(update_fields=["passengers", "details", "paid", "updated_at"])
+
+                # Update client (only phone, not name or last_name)
+                client = sale.client
+                client.phone = serializer.validated_data["client"]["phone"]
+                client.save(update_fields=["phone", "updated_at"])
+
+                # Create transfers (single insert)
+                transfers_types = ["arrival"]
+                if sale.service_type.name == "Round Trip":
+                    transfers_types.append("departure")
+                models.Transfer.objects.bulk_create(
+                    [
+                        models.Transfer(
+                            sale=sale,
+                            type=transfer_type,
+                            date=serializer.validated_data[transfer_type]["date"],
+                            hour=serializer.validated_data[transfer_type]["hour"],
+                            airline=serializer.validated_data[transfer_type][
+                                "airline"
+                            ],
+                            flight_number=serializer.validated_data[transfer_type][
+                                "flight_number"
+                            ],
+                        )
+                        for transfer_type in transfers_types
+                    ]
                 )
 
             # Check if sale is already confirmed
@@ -0,0 +1,271 @@
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRY_STATUS_CODES = {502, 503, 504}
+# Responses counted as circuit breaker failures (any server error)
+FAILURE_STATUS_CODE = 500
+
+# Shared clients of the current process, by name
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+class CircuitBreakerOpen(requests.RequestException):
+    """Request not sent because the host is failing (circuit open)"""
+
+
+class CircuitBreaker:
+    """Fail fast while a host is down: after `failure_threshold` failed
+    requests in a row the circuit opens, and requests are rejected until
+    `reset_timeout` seconds passed. Then a single trial request is allowed
+    (half open): if it works the circuit closes, otherwise it opens again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_started_at = None
+        self.lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow_request(self) -> bool:
+        """Check if a request can be sent, reserving the trial request when
+        the circuit is half open"""
+
+        with self.lock:
+            state = self.state
+            if state == "closed":
+                return True
+
+            # Single trial request (a new one if the last trial never ended)
+            now = time.monotonic()
+            if state == "half_open" and (
+                self.trial_started_at is None
+                or now - self.trial_started_at >= self.reset_timeout
+            ):
+                self.trial_started_at = now
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_started_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_started_at = None
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+    def get_stats(self) -> dict:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_timeout": self.reset_timeout,
+        }
+
+
+class HttpClient:
+    """HTTP client with a persistent connection pool, timeouts, bounded
+    retries with jittered backoff and a circuit breaker
+
+    Non idempotent requests (like POST) are only retried when the
+    connection could not be opened (the request was never sent)
+    """
+
+    def __init__(
+        self,
+        connect_timeout: float = 3,
+        read_timeout: float = 15,
+        max_retries: int = 2,
+        backoff_factor: float = 0.5,
+        pool_maxsize: int = 10,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30,
+    ):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+
+        # Persistent connections (retries are handled by the client)
+        self.adapter = HTTPAdapter(pool_maxsize=pool_maxsize, max_retries=0)
+        self.session = requests.Session()
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+
+        # Counters
+        self.stats_lock = threading.Lock()
+        self.counters = {
+            "requests": 0,
+            "retries": 0,
+            "failures": 0,
+            "rejected": 0,
+        }
+
+    def _count(self, counter: str):
+        with self.stats_lock:
+            self.counters[counter] += 1
+
+    def _is_retryable(self, error: Exception, idempotent: bool) -> bool:
+        """Check if a failed request can be sent again"""
+
+        if idempotent:
+            return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+        # Only retry requests that never reached the host
+        if isinstance(error, requests.ConnectTimeout):
+            return True
+        if isinstance(error, requests.ConnectionError) and error.args:
+            reason = getattr(error.args[0], "reason", None)
+            return isinstance(reason, NewConnectionError)
+        return False
+
+    def _sleep_backoff(self, attempt: int):
+        """Wait before a retry (exponential backoff with full jitter)"""
+        time.sleep(random.uniform(0, self.backoff_factor * 2**attempt))
+
+    def request(
+        self, method: str, url: str, idempotent: bool = None, **kwargs
+    ) -> requests.Response:
+        """Send a request
+
+        Args:
+            method (str): HTTP method
+            url (str): Request url
+            idempotent (bool): If the request can be safely sent twice.
+                Defaults to True for idempotent HTTP methods
+            **kwargs: requests.Session.request arguments
+
+        Raises:
+            CircuitBreakerOpen: Host failing, request not sent
+            requests.RequestException: Request failed after retries
+
+        Returns:
+            requests.Response: Response (status not validated)
+        """
+
+        method = method.upper()
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        kwargs.setdefault("timeout", self.timeout)
+
+        if not self.breaker.allow_request():
+            self._count("rejected")
+            raise CircuitBreakerOpen(f"Circuit open for {url}")
+
+        self._count("requests")
+        attempt = 0
+        while True:
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.RequestException as error:
+                if attempt < self.max_retries and self._is_retryable(
+                    error, idempotent
+                ):
+                    self._count("retries")
+                    self._sleep_backoff(attempt)
+                    attempt += 1
+                    continue
+                self._count("failures")
+                self.breaker.record_failure()
+                raise
+
+            if (
+                response.status_code in RETRY_STATUS_CODES
+                and idempotent
+                and attempt < self.max_retries
+            ):
+                response.close()
+                self._count("retries")
+                self._sleep_backoff(attempt)
+                attempt += 1
+                continue
+
+            if response.status_code >= FAILURE_STATUS_CODE:
+                self._count("failures")
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            return response
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def get_stats(self) -> dict:
+        """Get request counters, circuit breaker and connection pool stats"""
+
+        pools = []
+        poolmanager = self.adapter.poolmanager
+        for key in list(poolmanager.pools.keys()):
+            pool = poolmanager.pools.get(key)
+            if pool is None:
+                continue
+            pools.append(
+                {
+                    "host": pool.host,
+                    "port": pool.port,
+                    "connections": pool.num_connections,
+                    "requests": pool.num_requests,
+                    "maxsize": pool.pool.maxsize if pool.pool else 0,
+                }
+            )
+
+        with self.stats_lock:
+            counters = dict(self.counters)
+
+        return {
+            **counters,
+            "timeout": list(self.timeout),
+            "max_retries": self.max_retries,
+            "circuit": self.breaker.get_stats(),
+            "pools": pools,
+        }
+
+
+def get_client(name: str, **options) -> HttpClient:
+    """Get the shared client of the current process with the given name,
+    creating it with the options the first time
+
+    Args:
+        name (str): Client name
+        **options: HttpClient arguments
+
+    Returns:
+        HttpClient: Shared client
+    """
+
+    with _clients_lock:
+        if name not in _clients:
+            _clients[name] = HttpClient(**options)
+        return _clients[name]
+
+
+def get_clients_stats() -> dict:
+    """Get the stats of all the shared clients of the current process"""
+
+    with _clients_lock:
+        clients = dict(_clients)
+    return {name: client.get_stats() for name, client in clients.items()}
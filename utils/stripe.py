@@ -1,7 +1,19 @@
-import requests
-
 from django.conf import settings
 
+from utils.http_client import HttpClient, get_client
+
+
+def get_stripe_client() -> HttpClient:
+    """Get the shared (pooled) client of the stripe api host"""
+    return get_client(
+        "stripe",
+        connect_timeout=settings.STRIPE_API_CONNECT_TIMEOUT,
+        read_timeout=settings.STRIPE_API_READ_TIMEOUT,
+        max_retries=settings.STRIPE_API_MAX_RETRIES,
+        failure_threshold=settings.STRIPE_API_BREAKER_THRESHOLD,
+        reset_timeout=settings.STRIPE_API_BREAKER_RESET_TIMEOUT,
+    )
+
 
 def get_payment_link(
     product_name: str, total: float, description: str, email: str, sale_id: str
@@ -39,7 +51,7 @@ def get_payment_link(
         ),
     }
 
-    res = requests.post(settings.STRIPE_API_HOST, json=request_json)
+    res = get_stripe_client().post(settings.STRIPE_API_HOST, json=request_json)
     res.raise_for_status()
     res_data = res.json()
 
@@ -0,0 +1,62 @@
+import os
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+
+BASE_FILE = os.path.basename(__file__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Get the background thread pool of the current process"""
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.TASKS_MAX_WORKERS,
+                thread_name_prefix="tasks",
+            )
+        return _executor
+
+
+def run_task(func, *args, **kwargs):
+    """Run a task in the current thread, closing its db connections at the end"""
+
+    try:
+        return func(*args, **kwargs)
+    except Exception:
+        print(f"Error in {BASE_FILE} running {func.__name__}")
+        traceback.print_exc()
+    finally:
+        connections.close_all()
+
+
+def enqueue(func, *args, **kwargs):
+    """Run a function in a background thread once the current transaction
+    is committed (right away if there is no transaction)
+
+    With TASKS_ALWAYS_EAGER (testing) the function runs in the current
+    thread and its result is returned
+
+    Args:
+        func (callable): Function to run
+        *args: Function positional arguments
+        **kwargs: Function keyword arguments
+
+    Returns:
+        Any: Function result in eager mode, None otherwise
+    """
+
+    if settings.TASKS_ALWAYS_EAGER:
+        return func(*args, **kwargs)
+
+    transaction.on_commit(
+        lambda: get_executor().submit(run_task, func, *args, **kwargs)
+    )
+    return None